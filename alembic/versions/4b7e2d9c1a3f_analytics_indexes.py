@@ -0,0 +1,36 @@
+"""analytics indexes
+
+Revision ID: 4b7e2d9c1a3f
+Revises: cfadfd713a05
+Create Date: 2026-10-18 10:12:44.205118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2d9c1a3f'
+down_revision: Union[str, Sequence[str], None] = 'cfadfd713a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_subjects_teacher_id', 'subjects', ['teacher_id'], unique=False)
+    op.create_index('ix_students_group_id_full_name', 'students', ['group_id', 'full_name'], unique=False)
+    op.create_index('ix_grades_subject_student_value', 'grades', ['subject_id', 'student_id', 'value'], unique=False)
+    op.create_index('ix_grades_student_subject_created', 'grades', ['student_id', 'subject_id', 'created_at', 'value'], unique=False)
+    op.create_index('ix_grades_created_at', 'grades', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_grades_created_at', table_name='grades')
+    op.drop_index('ix_grades_student_subject_created', table_name='grades')
+    op.drop_index('ix_grades_subject_student_value', table_name='grades')
+    op.drop_index('ix_students_group_id_full_name', table_name='students')
+    op.drop_index('ix_subjects_teacher_id', table_name='subjects')
@@ -0,0 +1,41 @@
+"""grades autoincrement
+
+Revision ID: 5d2f8a1c7e94
+Revises: a7c41e9d2b60
+Create Date: 2026-10-18 23:05:41.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8a1c7e94'
+down_revision: Union[str, Sequence[str], None] = 'a7c41e9d2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Without AUTOINCREMENT SQLite hands the id of a deleted highest grade
+    # to the next insert, which the grades.id sync watermark never sees.
+    # Other backends use sequences, which do not reuse ids.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table(
+        'grades',
+        recreate='always',
+        table_kwargs={'sqlite_autoincrement': True},
+    ):
+        pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('grades', recreate='always'):
+        pass
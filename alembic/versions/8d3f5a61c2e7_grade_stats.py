@@ -0,0 +1,43 @@
+"""grade stats
+
+Revision ID: 8d3f5a61c2e7
+Revises: 4b7e2d9c1a3f
+Create Date: 2026-10-18 11:04:27.581630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f5a61c2e7'
+down_revision: Union[str, Sequence[str], None] = '4b7e2d9c1a3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('grade_stats',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Integer(), nullable=False),
+    sa.Column('value_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ),
+    sa.PrimaryKeyConstraint('student_id', 'subject_id')
+    )
+    op.create_index('ix_grade_stats_subject_id', 'grade_stats', ['subject_id'], unique=False)
+    op.execute(
+        "INSERT INTO grade_stats (student_id, subject_id, value_sum, value_count) "
+        "SELECT student_id, subject_id, sum(value), count(*) FROM grades "
+        "GROUP BY student_id, subject_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_grade_stats_subject_id', table_name='grade_stats')
+    op.drop_table('grade_stats')
@@ -0,0 +1,57 @@
+"""leaderboard stats
+
+Revision ID: a7c41e9d2b60
+Revises: e3a9c7d15b42
+Create Date: 2026-10-18 19:42:15.904118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c41e9d2b60'
+down_revision: Union[str, Sequence[str], None] = 'e3a9c7d15b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('grade_stats') as batch_op:
+        batch_op.add_column(sa.Column('avg_value', sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE grade_stats SET avg_value = CAST(value_sum AS FLOAT) / value_count"
+    )
+    with op.batch_alter_table('grade_stats') as batch_op:
+        batch_op.alter_column('avg_value', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_index('ix_grade_stats_subject_id')
+        batch_op.create_index('ix_grade_stats_subject_avg', ['subject_id', 'avg_value', 'student_id'], unique=False)
+
+    op.create_table('student_stats',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Integer(), nullable=False),
+    sa.Column('value_count', sa.Integer(), nullable=False),
+    sa.Column('avg_value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+    sa.PrimaryKeyConstraint('student_id')
+    )
+    op.create_index('ix_student_stats_avg', 'student_stats', ['avg_value', 'student_id'], unique=False)
+    op.execute(
+        "INSERT INTO student_stats (student_id, value_sum, value_count, avg_value) "
+        "SELECT student_id, sum(value_sum), sum(value_count), "
+        "CAST(sum(value_sum) AS FLOAT) / sum(value_count) FROM grade_stats "
+        "GROUP BY student_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_student_stats_avg', table_name='student_stats')
+    op.drop_table('student_stats')
+    with op.batch_alter_table('grade_stats') as batch_op:
+        batch_op.drop_index('ix_grade_stats_subject_avg')
+        batch_op.create_index('ix_grade_stats_subject_id', ['subject_id'], unique=False)
+        batch_op.drop_column('avg_value')
@@ -0,0 +1,39 @@
+"""grade changes
+
+Revision ID: b6c2e4f8a913
+Revises: 8d3f5a61c2e7
+Create Date: 2026-10-18 14:21:09.310472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c2e4f8a913'
+down_revision: Union[str, Sequence[str], None] = '8d3f5a61c2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('grade_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('grade_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('subject_id', sa.Integer(), nullable=True),
+    sa.Column('value', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("op IN ('update', 'delete')", name='ck_grade_change_op'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('grade_changes')
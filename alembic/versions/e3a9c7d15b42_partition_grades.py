@@ -0,0 +1,119 @@
+"""partition grades by month
+
+Revision ID: e3a9c7d15b42
+Revises: b6c2e4f8a913
+Create Date: 2026-10-18 16:02:44.918305
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c7d15b42'
+down_revision: Union[str, Sequence[str], None] = 'b6c2e4f8a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# months of partitions created after the current one
+MONTHS_AHEAD = 3
+
+GRADES_INDEXES = (
+    ('ix_grades_subject_student_value', ['subject_id', 'student_id', 'value']),
+    (
+        'ix_grades_student_subject_created',
+        ['student_id', 'subject_id', 'created_at', 'value'],
+    ),
+    ('ix_grades_created_at', ['created_at']),
+)
+
+
+def _month_after(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _months(first, last):
+    month = (first.year, first.month)
+    while month <= (last.year, last.month):
+        yield month
+        month = _month_after(*month)
+
+
+def _grades_ddl(name, suffix=''):
+    return (
+        f"CREATE TABLE {name} ("
+        " id integer NOT NULL DEFAULT nextval('grades_id_seq'),"
+        " student_id integer NOT NULL REFERENCES students (id),"
+        " subject_id integer NOT NULL REFERENCES subjects (id),"
+        " value integer NOT NULL,"
+        " created_at timestamp without time zone NOT NULL,"
+        " CONSTRAINT ck_grade_range CHECK (value BETWEEN 1 AND 100),"
+        f" {suffix})"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # partitioning is PostgreSQL-only: SQLite keeps a single grades
+        # table, and `cli grades archive` moves old rows to per-month tables
+        return
+    # a primary key of a partitioned table must include the partition key
+    op.execute(
+        _grades_ddl('grades_partitioned', 'PRIMARY KEY (id, created_at)')
+        + ' PARTITION BY RANGE (created_at)'
+    )
+    op.execute('CREATE TABLE grades_default PARTITION OF grades_partitioned DEFAULT')
+    first, last = bind.execute(
+        sa.text('SELECT min(created_at), max(created_at) FROM grades')
+    ).one()
+    now = datetime.utcnow()
+    ahead = (now.year, now.month)
+    for _ in range(MONTHS_AHEAD):
+        ahead = _month_after(*ahead)
+    first = min(first or now, now)
+    last = max(last or now, datetime(*ahead, 1))
+    for year, month in _months(first, last):
+        upper = datetime(*_month_after(year, month), 1)
+        op.execute(
+            f'CREATE TABLE grades_y{year:04d}m{month:02d} '
+            'PARTITION OF grades_partitioned FOR VALUES '
+            f"FROM ('{datetime(year, month, 1):%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+    op.execute(
+        'INSERT INTO grades_partitioned (id, student_id, subject_id, value, created_at) '
+        'SELECT id, student_id, subject_id, value, created_at FROM grades'
+    )
+    op.execute('ALTER SEQUENCE grades_id_seq OWNED BY grades_partitioned.id')
+    op.drop_table('grades')
+    op.rename_table('grades_partitioned', 'grades')
+    op.execute(
+        'ALTER TABLE grades RENAME CONSTRAINT grades_partitioned_pkey TO grades_pkey'
+    )
+    for name, columns in GRADES_INDEXES:
+        op.create_index(name, 'grades', columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    # made by `cli grades archive` in earlier versions; it depends on grades
+    op.execute('DROP VIEW IF EXISTS grades_all')
+    op.execute(_grades_ddl('grades_plain', 'PRIMARY KEY (id)'))
+    op.execute(
+        'INSERT INTO grades_plain (id, student_id, subject_id, value, created_at) '
+        'SELECT id, student_id, subject_id, value, created_at FROM grades'
+    )
+    op.execute('ALTER SEQUENCE grades_id_seq OWNED BY grades_plain.id')
+    # drops every attached partition; archived (detached) ones are kept
+    op.drop_table('grades')
+    op.rename_table('grades_plain', 'grades')
+    op.execute('ALTER TABLE grades RENAME CONSTRAINT grades_plain_pkey TO grades_pkey')
+    for name, columns in GRADES_INDEXES:
+        op.create_index(name, 'grades', columns, unique=False)
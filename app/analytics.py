@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+"""In-memory grade analytics on NumPy arrays.
+
+``GradeFrame.load()`` reads ``grades`` once into compact column arrays;
+grouped aggregations are then answered with ``bincount`` kernels instead
+of one SQL query per variant. Needs the ``analytics`` extra (numpy).
+"""
+
+import argparse
+import time
+
+from sqlalchemy import func, select
+
+from app import sync
+from app.db import SessionLocal
+from app.models import Grade, GradeChange, Group, Student, Subject
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+GROUPINGS = ("student", "group", "subject", "teacher")
+# grades are validated to 1..100, so per-group value histograms are dense
+MAX_VALUE = 100
+LOAD_BATCH_SIZE = 100_000
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("app.analytics needs numpy; install the 'analytics' extra")
+
+
+COLUMNS = ("id", "student_id", "subject_id", "value", "created_at")
+
+
+def _empty(size):
+    return [
+        np.empty(size, dtype=np.int64),
+        np.empty(size, dtype=np.int32),
+        np.empty(size, dtype=np.int32),
+        np.empty(size, dtype=np.int8),
+        np.empty(size, dtype=np.int64),
+    ]
+
+
+def _to_columns(rows):
+    """Column arrays from ``(id, student_id, subject_id, value, created_at)``
+    tuples."""
+    ids, student_ids, subject_ids, values, created = zip(*rows)
+    return [
+        np.array(ids, dtype=np.int64),
+        np.array(student_ids, dtype=np.int32),
+        np.array(subject_ids, dtype=np.int32),
+        np.array(values, dtype=np.int8),
+        np.array(created, dtype="datetime64[us]").view(np.int64),
+    ]
+
+
+def _dimensions(s):
+    """student -> group and subject -> teacher lookups, and display names."""
+    students = s.execute(
+        select(Student.id, Student.group_id, Student.full_name)
+    ).all()
+    subjects = s.execute(select(Subject.id, Subject.teacher_id, Subject.name)).all()
+    groups = s.execute(select(Group.id, Group.name)).all()
+    names = {
+        "student": {r.id: r.full_name for r in students},
+        "subject": {r.id: r.name for r in subjects},
+        "group": {r.id: r.name for r in groups},
+    }
+    return (
+        _lookup((r.id, r.group_id) for r in students),
+        _lookup((r.id, r.teacher_id) for r in subjects),
+        names,
+    )
+
+
+def _lookup(pairs):
+    """Dense ``id -> value`` array from ``(id, value)`` pairs, -1 where absent."""
+    pairs = list(pairs)
+    size = max((k for k, _ in pairs), default=0) + 1
+    table = np.full(size, -1, dtype=np.int32)
+    if pairs:
+        keys, values = zip(*pairs)
+        table[list(keys)] = values
+    return table
+
+
+class GradeFrame:
+    """Columns of ``grades``: int64 ids and timestamps (us), int32 foreign
+    keys and int8 values, plus student -> group and subject -> teacher maps.
+
+    Rows are kept in id order; ``mark`` is the sync watermark ``refresh()``
+    continues from.
+    """
+
+    def __init__(
+        self,
+        id,
+        student_id,
+        subject_id,
+        value,
+        created_at,
+        group_of,
+        teacher_of,
+        names,
+        mark=None,
+    ):
+        require_numpy()
+        self.id = id
+        self.student_id = student_id
+        self.subject_id = subject_id
+        self.value = value
+        self.created_at = created_at
+        self.group_of = group_of
+        self.teacher_of = teacher_of
+        self.names = names
+        self.mark = mark or sync.Watermark()
+
+    @classmethod
+    def load(cls, session_factory=SessionLocal, batch_size=LOAD_BATCH_SIZE):
+        require_numpy()
+        with session_factory() as s:
+            # the change log bound is read first, as in sync.pull()
+            change_max = s.scalar(select(func.max(GradeChange.id))) or 0
+            dimensions = _dimensions(s)
+            total = s.scalar(select(func.count()).select_from(Grade))
+            columns = _empty(total)
+            result = s.execute(
+                select(*(getattr(Grade, c) for c in COLUMNS))
+                .order_by(Grade.id)
+                .execution_options(yield_per=batch_size)
+            )
+            filled = 0
+            for rows in result.partitions():
+                # rows inserted after the count are left for refresh()
+                rows = rows[: total - filled]
+                if not rows:
+                    break
+                end = filled + len(rows)
+                for column, values in zip(columns, _to_columns(rows)):
+                    column[filled:end] = values
+                filled = end
+        columns = [column[:filled] for column in columns]
+        mark = sync.Watermark(
+            last_id=int(columns[0][-1]) if filled else 0,
+            last_change_id=change_max,
+        )
+        return cls(*columns, *dimensions, mark=mark)
+
+    def refresh(self, session_factory=SessionLocal):
+        """Apply grades inserted, updated or deleted since the last load or
+        refresh; returns the number of events applied."""
+        latest = {}
+        inserts = []
+        with session_factory() as s:
+            for op, record in sync.pull(s, self.mark):
+                if op == "insert":
+                    inserts.append(tuple(record[c] for c in COLUMNS))
+                else:
+                    latest[record["id"]] = record if op == "update" else None
+            self.group_of, self.teacher_of, self.names = _dimensions(s)
+
+        if latest:
+            ids = np.fromiter(latest, dtype=np.int64, count=len(latest))
+            positions = np.searchsorted(self.id, ids)
+            keep = np.ones(len(self), dtype=bool)
+            for grade_id, position in zip(ids.tolist(), positions.tolist()):
+                if position >= len(self) or self.id[position] != grade_id:
+                    continue
+                record = latest[grade_id]
+                if record is None:
+                    keep[position] = False
+                    continue
+                self.student_id[position] = record["student_id"]
+                self.subject_id[position] = record["subject_id"]
+                self.value[position] = record["value"]
+                self.created_at[position] = np.datetime64(
+                    record["created_at"], "us"
+                ).astype(np.int64)
+            if not keep.all():
+                for c in COLUMNS:
+                    setattr(self, c, getattr(self, c)[keep])
+        if inserts:
+            for c, values in zip(COLUMNS, _to_columns(inserts)):
+                setattr(self, c, np.concatenate([getattr(self, c), values]))
+        return len(latest) + len(inserts)
+
+    def __len__(self):
+        return len(self.value)
+
+    def keys(self, by):
+        if by == "student":
+            return self.student_id
+        if by == "subject":
+            return self.subject_id
+        if by == "group":
+            return self.group_of[self.student_id]
+        if by == "teacher":
+            return self.teacher_of[self.subject_id]
+        raise ValueError(f"by must be one of {', '.join(GROUPINGS)}")
+
+    def mask(self, since=None, until=None, **equal):
+        """Boolean row mask for ``since <= created_at < until`` and
+        ``by=id`` equality filters such as ``subject=3``."""
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.created_at >= np.datetime64(since, "us").astype(np.int64)
+        if until is not None:
+            mask &= self.created_at < np.datetime64(until, "us").astype(np.int64)
+        for by, key in equal.items():
+            mask &= self.keys(by) == key
+        return mask
+
+    def _grouped(self, by, mask):
+        values = self.value.astype(np.int64)
+        if by is None:
+            keys = np.zeros(len(self), dtype=np.int64)
+        else:
+            keys = self.keys(by).astype(np.int64)
+        if mask is not None:
+            keys, values = keys[mask], values[mask]
+        return keys, values
+
+    def value_counts(self, by=None, mask=None):
+        """``(keys, counts)`` where ``counts[i, v]`` is how many grades of
+        value ``v`` group ``keys[i]`` has."""
+        keys, values = self._grouped(by, mask)
+        size = int(keys.max()) + 1 if len(keys) else 0
+        counts = np.bincount(
+            keys * (MAX_VALUE + 1) + values, minlength=size * (MAX_VALUE + 1)
+        ).reshape(size, MAX_VALUE + 1)
+        present = np.flatnonzero(counts.sum(axis=1))
+        return present, counts[present]
+
+    def describe(self, by=None, percentiles=(50, 90), mask=None):
+        """Count, mean, population std, min, max and percentiles per group.
+
+        Percentiles use linear interpolation between the closest ranks,
+        like ``numpy.percentile``.
+        """
+        keys, counts = self.value_counts(by, mask)
+        scale = np.arange(MAX_VALUE + 1)
+        n = counts.sum(axis=1)
+        total = counts @ scale
+        mean = total / n
+        variance = (counts @ (scale * scale)) / n - mean * mean
+        cumulative = counts.cumsum(axis=1)
+
+        def value_at(rank):
+            # value of the rank-th (0-based) sorted grade in every group
+            return (cumulative <= rank[:, None]).sum(axis=1)
+
+        result = {
+            "key": keys,
+            "count": n,
+            "sum": total,
+            "mean": mean,
+            "std": np.sqrt(np.maximum(variance, 0)),
+            "min": value_at(np.zeros_like(n)),
+            "max": value_at(n - 1),
+        }
+        for q in percentiles:
+            position = (n - 1) * (q / 100)
+            lower = np.floor(position).astype(np.int64)
+            low, high = value_at(lower), value_at(np.ceil(position).astype(np.int64))
+            result[f"p{q:g}"] = low + (high - low) * (position - lower)
+        return result
+
+    def mean(self, by=None, mask=None):
+        result = self.describe(by, percentiles=(), mask=mask)
+        return result["key"], result["mean"]
+
+    def histogram(self, by=None, bins=10, mask=None):
+        """``(keys, edges, counts)`` with ``bins`` equal-width bins over 1..100."""
+        keys, counts = self.value_counts(by, mask)
+        edges = np.linspace(1, MAX_VALUE + 1, bins + 1)
+        bin_of = np.searchsorted(edges, np.arange(MAX_VALUE + 1), side="right") - 1
+        binned = np.zeros((len(keys), bins), dtype=np.int64)
+        for b in range(bins):
+            binned[:, b] = counts[:, (bin_of == b)].sum(axis=1)
+        return keys, edges, binned
+
+    # the same answers as the overlapping app.reports queries
+
+    def top_students(self, limit=5):
+        """``select_1``: the ``limit`` students with the highest average."""
+        keys, means = self.mean("student")
+        # ties go to the higher student id, as in select_1
+        order = np.lexsort((-keys, -means))[:limit]
+        names = self.names["student"]
+        return [(int(keys[i]), names[keys[i]], float(means[i])) for i in order]
+
+    def group_averages(self, subject_id):
+        """``select_3``: average per group for one subject, by group name."""
+        keys, means = self.mean("group", mask=self.mask(subject=subject_id))
+        names = self.names["group"]
+        rows = [(int(k), names[k], float(m)) for k, m in zip(keys, means)]
+        return sorted(rows, key=lambda row: row[1])
+
+    def average(self):
+        """``select_4``: the average over all grades."""
+        if not len(self):
+            return None
+        return float(self.value.mean(dtype=np.float64))
+
+    def teacher_average(self, teacher_id):
+        """``select_8``: the average over the grades of a teacher's subjects."""
+        keys, means = self.mean(mask=self.mask(teacher=teacher_id))
+        return float(means[0]) if len(keys) else None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Grade statistics from memory")
+    p.add_argument("--by", choices=GROUPINGS, help="Group by (default: overall)")
+    p.add_argument(
+        "--percentile",
+        type=float,
+        action="append",
+        help="Percentile to report, may be repeated (default: 50 and 90)",
+    )
+    p.add_argument("--since", help="Only grades created at or after this time")
+    p.add_argument("--until", help="Only grades created before this time")
+    p.add_argument("--limit", type=int, default=20, help="Groups to print")
+    return p
+
+
+def run():
+    args = build_parser().parse_args()
+    started = time.perf_counter()
+    frame = GradeFrame.load()
+    loaded = time.perf_counter()
+    result = frame.describe(
+        args.by,
+        percentiles=args.percentile or (50, 90),
+        mask=frame.mask(args.since, args.until),
+    )
+    done = time.perf_counter()
+    columns = [c for c in result if c != "sum"]
+    print(" ".join(f"{c:>10}" for c in columns))
+    for i in range(min(args.limit, len(result["key"]))):
+        print(" ".join(f"{result[c][i]:>10.4g}" for c in columns))
+    print(
+        f"{len(frame):,} grades loaded in {(loaded - started) * 1000:.0f} ms, "
+        f"aggregated in {(done - loaded) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    run()
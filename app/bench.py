@@ -0,0 +1,583 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import sqlalchemy
+from sqlalchemy import event, func, make_url, select, text
+from sqlalchemy.orm import Session
+from app import cache, cli, db, reports
+from app.db import Base, configure_engine
+from app.models import Group, Teacher, Subject, Student, Grade
+from app.seed import Scale
+from app.seeder import seed_bulk
+
+SCALES = {
+    "small": Scale(groups=5, teachers=5, subjects=10, students=200, grades_per_pair=10),
+    "medium": Scale(
+        groups=10, teachers=10, subjects=20, students=2000, grades_per_pair=20
+    ),
+    "large": Scale(
+        groups=50, teachers=20, subjects=50, students=10_000, grades_per_pair=20
+    ),
+}
+
+INDEXED_TABLES = (Subject.__table__, Student.__table__, Grade.__table__)
+
+
+def report_calls(conn):
+    """Pick ids that exist in the current dataset for every report."""
+    group_id = conn.scalar(select(func.min(Group.id)))
+    teacher_id = conn.scalar(select(func.min(Teacher.id)))
+    subject_id = conn.scalar(select(func.min(Subject.id)))
+    student_id = conn.scalar(select(func.min(Student.id)))
+    return [
+        ("select_1", ()),
+        ("select_2", (subject_id,)),
+        ("select_3", (subject_id,)),
+        ("select_4", ()),
+        ("select_5", (teacher_id,)),
+        ("select_6", (group_id,)),
+        ("select_7", (group_id, subject_id)),
+        ("select_8", (teacher_id,)),
+        ("select_9", (student_id,)),
+        ("select_10", (student_id, teacher_id)),
+    ]
+
+
+def capture_statements(fn, args):
+    seen = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        seen.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before)
+    try:
+        fn(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before)
+    return seen
+
+
+def explain(conn, statement, parameters):
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [r[-1] for r in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    return [r[0] for r in rows]
+
+
+def time_call(fn, args, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def measure(calls, repeat, label):
+    print(f"== {label}")
+    latencies = {}
+    for name, args in calls:
+        fn = getattr(reports, name)
+        statements = capture_statements(fn, args)
+        latencies[name] = time_call(fn, args, repeat)
+        print(f"-- {name}{args}: {latencies[name]:.2f} ms")
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                for line in explain(conn, statement, parameters):
+                    print(f"   {line}")
+    return latencies
+
+
+def set_indexes(present):
+    with db.engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                if present:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+        if present:
+            conn.execute(text("ANALYZE"))
+
+
+def scratch_copy(url, workdir):
+    """Copy the SQLite database at ``url`` into ``workdir``; returns the URL
+    of the copy."""
+    source = make_url(url).database
+    target = os.path.join(workdir, os.path.basename(source))
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    return f"sqlite:///{target}"
+
+
+def bench_indexes(args):
+    cache.configure(None)
+    # the indexes are dropped for the first pass, so never on the configured
+    # database: on a copy of it, or on a database named explicitly
+    url = args.database_url
+    if url is None:
+        configured = make_url(db.settings["url"])
+        if configured.get_backend_name() != "sqlite" or configured.database in (
+            None,
+            "",
+            ":memory:",
+        ):
+            sys.exit(
+                "bench indexes drops indexes and only copies SQLite files; "
+                "pass --database-url of a disposable database"
+            )
+        workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+        url = scratch_copy(db.settings["url"], workdir)
+        print(f"Benchmarking a copy of the database: {url}")
+    engine = configure_engine({**db.settings, "url": url})
+    db.use_engine(engine)
+    Base.metadata.create_all(engine)
+    if args.seed:
+        seed_bulk(
+            Scale(
+                students=args.students,
+                subjects=args.subjects,
+                grades_per_pair=args.grades_per_pair,
+            ),
+            workers=args.workers,
+        )
+    with db.engine.connect() as conn:
+        grades = conn.scalar(select(func.count()).select_from(Grade))
+        calls = report_calls(conn)
+    print(f"grades: {grades:,} rows, {args.repeat} runs per query")
+
+    set_indexes(False)
+    try:
+        before = measure(calls, args.repeat, "without indexes")
+    finally:
+        set_indexes(True)
+    after = measure(calls, args.repeat, "with indexes")
+
+    print(f"{'query':<10} {'before ms':>12} {'after ms':>12} {'speedup':>9}")
+    for name, _ in calls:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(
+            f"{name:<10} {before[name]:>12.2f} {after[name]:>12.2f} {speedup:>8.1f}x"
+        )
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+
+def timed(fn, arg_sets):
+    samples = []
+    for args in arg_sets:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def varied_calls(conn, repeat):
+    """``repeat`` argument tuples per report, drawn from the existing ids."""
+    ids = {
+        model: conn.scalars(select(model.id)).all()
+        for model in (Group, Teacher, Subject, Student)
+    }
+    rng = random.Random(0)
+
+    def pick(*models):
+        return [tuple(rng.choice(ids[m]) for m in models) for _ in range(repeat)]
+
+    return {
+        "select_1": pick(),
+        "select_2": pick(Subject),
+        "select_3": pick(Subject),
+        "select_4": pick(),
+        "select_5": pick(Teacher),
+        "select_6": pick(Group),
+        "select_7": pick(Group, Subject),
+        "select_8": pick(Teacher),
+        "select_9": pick(Student),
+        "select_10": pick(Student, Teacher),
+    }
+
+
+def run_cli(argv):
+    args = cli.build_parser().parse_args(argv)
+    with contextlib.redirect_stdout(io.StringIO()):
+        args.func(args)
+
+
+def bench_scale(name, scale, repeat, workers):
+    results = {}
+    written, elapsed = seed_bulk(scale, workers=workers)
+    rows = sum(written.values())
+    results["seed"] = {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed if elapsed else 0.0,
+    }
+
+    with db.engine.connect() as conn:
+        calls = varied_calls(conn, repeat)
+    for report, arg_sets in calls.items():
+        results[report] = timed(getattr(reports, report), arg_sets)
+        print(f"[{name}] {report}: p50 {results[report]['p50_ms']:.2f} ms")
+    for report in ("select_2_batch", "select_3_batch", "select_7_batch"):
+        results[report] = timed(getattr(reports, report), [()] * repeat)
+        print(f"[{name}] {report}: p50 {results[report]['p50_ms']:.2f} ms")
+
+    with db.engine.connect() as conn:
+        student_ids = conn.scalars(select(Student.id).limit(1000)).all()
+        subject_ids = conn.scalars(select(Subject.id)).all()
+    rng = random.Random(1)
+    creates = [
+        (
+            [
+                "grades",
+                "create",
+                str(rng.choice(student_ids)),
+                str(rng.choice(subject_ids)),
+                str(rng.randint(1, 100)),
+            ],
+        )
+        for _ in range(repeat)
+    ]
+    results["cli.grades_create"] = timed(run_cli, creates)
+    results["cli.grades_list_1000"] = timed(
+        run_cli, [(["grades", "list", "--limit", "1000"],)] * repeat
+    )
+    results["cli.students_list"] = timed(
+        run_cli, [(["students", "list"],)] * repeat
+    )
+    return results
+
+
+def bench_run(args):
+    cache.configure(None)
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "repeat": args.repeat,
+        },
+        "scales": {},
+    }
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    for name in args.scale or ("small", "medium"):
+        url = args.database_url or f"sqlite:///{os.path.join(workdir, name)}.sqlite3"
+        engine = configure_engine({**db.settings, "url": url})
+        db.use_engine(engine)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        report["meta"]["dialect"] = engine.dialect.name
+        report["scales"][name] = bench_scale(
+            name, SCALES[name], args.repeat, args.workers
+        )
+        engine.dispose()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def bench_compile(args):
+    """Per-call Python overhead of the reports: the statement rebuilt on
+    every call against the prebuilt ``reports.statement`` constructs."""
+    # empty in-memory tables keep the database's share of a call negligible
+    engine = configure_engine({"url": "sqlite://"})
+    Base.metadata.create_all(engine)
+    window = {}
+    if args.window:
+        window = {"since": datetime(2024, 1, 1), "until": datetime(2025, 1, 1)}
+    results = {}
+    print(f"{'report':<10} {'rebuilt us':>11} {'prebuilt us':>12} {'speedup':>8}")
+    with Session(engine) as s:
+        for number, (_fn, params) in reports.REPORTS.items():
+            query = getattr(reports, f"query_{number}")
+            values = {**dict.fromkeys(params, 1), **window}
+
+            def rebuilt():
+                s.execute(query(**values)).all()
+
+            def prebuilt():
+                s.execute(*reports.statement(query, **values)).all()
+
+            for fn in (rebuilt, prebuilt):
+                timed(fn, [()] * 10)  # compiled cache warm-up
+            before = timed(rebuilt, [()] * args.repeat)
+            after = timed(prebuilt, [()] * args.repeat)
+            results[f"select_{number} rebuilt"] = before
+            results[f"select_{number} prebuilt"] = after
+            print(
+                f"select_{number:<3} {before['p50_ms'] * 1000:>11.1f} "
+                f"{after['p50_ms'] * 1000:>12.1f} "
+                f"{before['p50_ms'] / after['p50_ms']:>7.2f}x"
+            )
+    engine.dispose()
+    if args.output:
+        report = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "sqlalchemy": sqlalchemy.__version__,
+                "repeat": args.repeat,
+            },
+            "scales": {"compile": results},
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+STARTUP_MODULES = ("app.cli", "app.seed", "app.my_select")
+
+
+def import_times(module):
+    """``{module: (self_us, cumulative_us)}`` from ``python -X importtime``
+    importing ``module`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def help_time(module):
+    """Wall time in ms of ``python -m module --help``, interpreter start-up
+    included."""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", module, "--help"],
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_importtime(args):
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+        },
+        "scales": {"startup": {}},
+    }
+    results = report["scales"]["startup"]
+    for module in args.module or STARTUP_MODULES:
+        samples = []
+        for _ in range(args.repeat):
+            times = import_times(module)
+            samples.append(times[module][1] / 1000)
+        results[f"import {module}"] = summarize(samples)
+        results[f"{module} --help"] = summarize(
+            [help_time(module) for _ in range(args.repeat)]
+        )
+        print(
+            f"{module}: import p50 {results[f'import {module}']['p50_ms']:.1f} ms, "
+            f"--help p50 {results[f'{module} --help']['p50_ms']:.1f} ms"
+        )
+        # the heaviest modules of the last run, by their own import time
+        heaviest = sorted(times.items(), key=lambda kv: kv[1][0], reverse=True)
+        for name, (self_us, cumulative_us) in heaviest[: args.top]:
+            print(
+                f"  {self_us / 1000:>8.1f} ms self "
+                f"{cumulative_us / 1000:>8.1f} ms cumulative  {name}"
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def metric_changes(base, new):
+    """Yield ``(scale, metric, key, before, after, worse_ratio)`` tuples."""
+    for scale, metrics in new["scales"].items():
+        for metric, values in metrics.items():
+            old = base["scales"].get(scale, {}).get(metric)
+            if old is None:
+                continue
+            if "p50_ms" in values:
+                key = "p50_ms"
+                before, after = old[key], values[key]
+                ratio = after / before if before else 1.0
+            else:
+                key = "rows_per_s"
+                before, after = old[key], values[key]
+                ratio = before / after if after else 1.0
+            yield scale, metric, key, before, after, ratio
+
+
+def bench_compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = 0
+    print(
+        f"{'scale':<8} {'metric':<22} {'key':<11} "
+        f"{'base':>12} {'new':>12} {'change':>8}"
+    )
+    for scale, metric, key, before, after, ratio in metric_changes(base, new):
+        noisy = key == "p50_ms" and max(before, after) < args.min_ms
+        flag = ""
+        if ratio > 1 + args.threshold and not noisy:
+            flag = "  REGRESSION"
+            regressions += 1
+        change = (after - before) / before * 100 if before else 0.0
+        print(
+            f"{scale:<8} {metric:<22} {key:<11} "
+            f"{before:>12.2f} {after:>12.2f} {change:>+7.1f}%{flag}"
+        )
+    if regressions:
+        sys.exit(f"{regressions} regression(s) above {args.threshold:.0%}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = Scale()
+    p = argparse.ArgumentParser()
+    sp = p.add_subparsers(dest="command", required=True)
+
+    p_indexes = sp.add_parser(
+        "indexes",
+        help="Compare report plans and latencies without and with indexes",
+    )
+    p_indexes.add_argument(
+        "--seed",
+        action="store_true",
+        help="Bulk seed a dataset of the given scale first",
+    )
+    p_indexes.add_argument("--students", type=int, default=defaults.students)
+    p_indexes.add_argument("--subjects", type=int, default=defaults.subjects)
+    p_indexes.add_argument(
+        "--grades-per-pair", type=int, default=defaults.grades_per_pair
+    )
+    p_indexes.add_argument("--workers", type=int, default=1)
+    p_indexes.add_argument("--repeat", type=int, default=5)
+    p_indexes.add_argument(
+        "--workdir", help="Directory for the copy of the SQLite database"
+    )
+    p_indexes.add_argument(
+        "--database-url",
+        help="Run against this disposable database instead of a copy of the "
+        "configured SQLite one; its indexes are dropped and recreated",
+    )
+    p_indexes.set_defaults(func=bench_indexes)
+
+    p_run = sp.add_parser(
+        "run", help="Seed each scale and time reports, seeding and CLI calls"
+    )
+    p_run.add_argument(
+        "--scale",
+        choices=SCALES,
+        action="append",
+        help="Scale to run, may be repeated (default: small and medium)",
+    )
+    p_run.add_argument("--repeat", type=int, default=50)
+    p_run.add_argument("--workers", type=int, default=1)
+    p_run.add_argument(
+        "--workdir", help="Directory for the per-scale SQLite databases"
+    )
+    p_run.add_argument(
+        "--database-url",
+        help="Run against this (empty, disposable) database instead of SQLite",
+    )
+    p_run.add_argument("-o", "--output", default="bench.json")
+    p_run.set_defaults(func=bench_run)
+
+    p_compile = sp.add_parser(
+        "compile",
+        help="Per-call overhead of rebuilt versus prebuilt report statements",
+    )
+    p_compile.add_argument("--repeat", type=int, default=2000)
+    p_compile.add_argument(
+        "--window", action="store_true", help="Bound the reports by since/until"
+    )
+    p_compile.add_argument(
+        "-o", "--output", help="Write results as JSON, comparable with compare"
+    )
+    p_compile.set_defaults(func=bench_compile)
+
+    p_importtime = sp.add_parser(
+        "importtime",
+        help="Time cold imports and --help of the entry points (-X importtime)",
+    )
+    p_importtime.add_argument(
+        "--module",
+        action="append",
+        help="Entry point module, may be repeated (default: "
+        f"{', '.join(STARTUP_MODULES)})",
+    )
+    p_importtime.add_argument("--repeat", type=int, default=10)
+    p_importtime.add_argument(
+        "--top", type=int, default=10, help="Heaviest modules listed per entry point"
+    )
+    p_importtime.add_argument(
+        "-o", "--output", help="Write results as JSON, comparable with compare"
+    )
+    p_importtime.set_defaults(func=bench_importtime)
+
+    p_compare = sp.add_parser("compare", help="Compare two result files")
+    p_compare.add_argument("base")
+    p_compare.add_argument("new")
+    p_compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown reported as a regression (default: 0.10)",
+    )
+    p_compare.add_argument(
+        "--min-ms",
+        type=float,
+        default=0.1,
+        help="Ignore latency changes on metrics faster than this",
+    )
+    p_compare.set_defaults(func=bench_compare)
+
+    return p
+
+
+def run():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,101 @@
+"""Set-based UPDATE and DELETE of the rows matching a filter.
+
+One statement changes every matching row; the affected rows come back
+through ``RETURNING`` where the dialect supports it (PostgreSQL, SQLite
+3.35+), otherwise they are read around the statement. Grade changes also
+keep ``grade_stats`` and the ``grade_changes`` log in step.
+"""
+
+from collections import Counter
+from itertools import islice
+
+from sqlalchemy import delete, func, select, update
+
+from app import stats, sync
+from app.models import Grade
+
+# ids per IN list when the rows have to be read back without RETURNING
+ID_CHUNK = 10_000
+
+
+def _chunks(ids):
+    it = iter(ids)
+    while chunk := list(islice(it, ID_CHUNK)):
+        yield chunk
+
+
+def count(session, table, conditions):
+    return session.scalar(select(func.count()).select_from(table).where(*conditions))
+
+
+def delete_rows(session, table, conditions):
+    """DELETE the rows of ``table`` matching ``conditions``; returns them."""
+    stmt = delete(table).where(*conditions)
+    if session.get_bind().dialect.delete_returning:
+        return session.execute(stmt.returning(*table.columns)).all()
+    rows = session.execute(
+        select(table).where(*conditions).order_by(table.c.id)
+    ).all()
+    for chunk in _chunks(r.id for r in rows):
+        session.execute(delete(table).where(table.c.id.in_(chunk)))
+    return rows
+
+
+def update_rows(session, table, conditions, values):
+    """UPDATE the rows of ``table`` matching ``conditions`` with ``values``;
+    returns the updated rows."""
+    stmt = update(table).where(*conditions).values(values)
+    if session.get_bind().dialect.update_returning:
+        return session.execute(stmt.returning(*table.columns)).all()
+    # the conditions may no longer match once updated, so the rows are
+    # found first and updated and read back by id
+    ids = session.scalars(
+        select(table.c.id).where(*conditions).order_by(table.c.id)
+    ).all()
+    rows = []
+    for chunk in _chunks(ids):
+        session.execute(update(table).where(table.c.id.in_(chunk)).values(values))
+        rows += session.execute(select(table).where(table.c.id.in_(chunk))).all()
+    return rows
+
+
+def delete_grades(session, conditions):
+    """Delete the matching grades, removing them from ``grade_stats`` and
+    logging the deletes. Returns ``(rows, pairs)``, the deleted rows and
+    their ``(student_id, subject_id)`` pairs."""
+    rows = delete_rows(session, Grade.__table__, conditions)
+    sums, counts = Counter(), Counter()
+    for r in rows:
+        sums[(r.student_id, r.subject_id)] -= r.value
+        counts[(r.student_id, r.subject_id)] -= 1
+    stats.apply(session, sums, counts)
+    sync.log_changes(session, "delete", [{"grade_id": r.id} for r in rows])
+    return rows, set(counts)
+
+
+def update_grades(session, conditions, values):
+    """Update the matching grades with ``values``, moving them between
+    ``grade_stats`` rows and logging the updates. Returns ``(rows,
+    pairs)``, the updated rows and the pairs they left and joined."""
+    c = Grade.__table__.c
+    before = session.execute(
+        select(c.student_id, c.subject_id, func.sum(c.value), func.count())
+        .where(*conditions)
+        .group_by(c.student_id, c.subject_id)
+    ).all()
+    sums = Counter({(st, sj): -total for st, sj, total, _ in before})
+    counts = Counter({(st, sj): -n for st, sj, _, n in before})
+    rows = update_rows(session, Grade.__table__, conditions, values)
+    for r in rows:
+        sums[(r.student_id, r.subject_id)] += r.value
+        counts[(r.student_id, r.subject_id)] += 1
+    stats.apply(session, sums, counts)
+    sync.log_changes(
+        session,
+        "update",
+        [
+            {"grade_id": r.id, **{f: getattr(r, f) for f in sync.GRADE_FIELDS}}
+            for r in rows
+        ],
+    )
+    return rows, set(counts)
@@ -0,0 +1,308 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from app import db
+from app.models import Student, Subject
+
+BACKENDS = ("memory", "sqlite", "off")
+
+
+class MemoryCache:
+    """In-process LRU cache with TTL expiry and tag-based invalidation."""
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._invalidated_at = 0.0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, tags, value = entry
+            if expires <= time.monotonic():
+                self._drop(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, tags):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tags, value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            self._invalidated_at = time.time()
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._invalidated_at = time.time()
+            self._entries.clear()
+            self._tags.clear()
+
+    def invalidated_at(self):
+        return self._invalidated_at
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteCache:
+    """Cache shared between processes through a local SQLite file."""
+
+    def __init__(self, path, maxsize=1024, ttl=60.0):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires REAL NOT NULL,
+                    used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_entries_used ON entries (used);
+                CREATE TABLE IF NOT EXISTS tags (
+                    tag TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (tag, key)
+                );
+                CREATE INDEX IF NOT EXISTS ix_tags_key ON tags (key);
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                );
+                """
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return False, None
+            conn.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, tags):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires, used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags],
+            )
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+            conn.execute(
+                "DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)"
+            )
+
+    def invalidate(self, tags):
+        tags = list(tags)
+        if not tags:
+            return
+        marks = ", ".join("?" * len(tags))
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                f"(SELECT key FROM tags WHERE tag IN ({marks}))",
+                tags,
+            )
+            conn.execute(f"DELETE FROM tags WHERE tag IN ({marks})", tags)
+            self._mark_invalidated(conn)
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM tags")
+            self._mark_invalidated(conn)
+
+    def _mark_invalidated(self, conn):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('invalidated_at', ?)",
+            (time.time(),),
+        )
+
+    def invalidated_at(self):
+        row = (
+            self._conn()
+            .execute("SELECT value FROM meta WHERE name = 'invalidated_at'")
+            .fetchone()
+        )
+        return row[0] if row else 0.0
+
+
+_cache = None
+_configured = False
+
+
+def from_env(environ=os.environ):
+    """The cache selected by ``REPORT_CACHE``.
+
+    The default, ``sqlite``, is shared by every process on the host, so the
+    invalidations of a CLI write reach reports served by other processes.
+    ``memory`` only sees the writes made in its own process (as in ``cli
+    shell``); results changed by other processes are served until the TTL.
+    """
+    backend = environ.get("REPORT_CACHE", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"REPORT_CACHE must be one of {', '.join(BACKENDS)}")
+    if backend == "off":
+        return None
+    maxsize = int(environ.get("REPORT_CACHE_SIZE", 1024))
+    ttl = float(environ.get("REPORT_CACHE_TTL", 60))
+    if backend == "sqlite":
+        path = environ.get("REPORT_CACHE_PATH", ".report_cache.sqlite3")
+        return SQLiteCache(path, maxsize=maxsize, ttl=ttl)
+    return MemoryCache(maxsize=maxsize, ttl=ttl)
+
+
+def configure(cache):
+    """Replace the process-wide cache; ``None`` disables caching."""
+    global _cache, _configured
+    _cache = cache
+    _configured = True
+
+
+def get_cache():
+    global _cache, _configured
+    if not _configured:
+        _cache = from_env()
+        _configured = True
+    return _cache
+
+
+def replica_lagging(cache):
+    """Whether reads may still come from a replica that has not replayed the
+    writes behind the last invalidation: for ``DB_REPLICA_LAG_S`` seconds
+    (default 5) after it, when read replicas are configured."""
+    if not db.replica_urls(db.settings):
+        return False
+    lag_s = float(db.settings.get("replica_lag_s", 5))
+    return time.time() - cache.invalidated_at() < lag_s
+
+
+def cached(tags):
+    """Cache a report function by name and arguments.
+
+    ``tags`` is called with the same arguments and returns the tags the
+    result depends on; ``invalidate`` drops every entry carrying one of them.
+    When it returns None the call is not cached, for results too large to
+    hold as one entry of a cache bounded by entry count. Results are not
+    stored while ``replica_lagging``, so a replica that is behind cannot
+    put a pre-write result back for the whole TTL.
+    """
+
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            entry_tags = None if cache is None else tags(*args, **kwargs)
+            if entry_tags is None:
+                return fn(*args, **kwargs)
+            key = f"{name}:{args!r}:{sorted(kwargs.items())!r}"
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            if not replica_lagging(cache):
+                cache.set(key, value, entry_tags)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags):
+    cache = get_cache()
+    if cache is not None and tags:
+        cache.invalidate(set(tags))
+
+
+def clear():
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def grade_tags(session, pairs):
+    """Tags touched by grade changes on ``(student_id, subject_id)`` pairs."""
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    student_ids = {student_id for student_id, _ in pairs}
+    subject_ids = {subject_id for _, subject_id in pairs}
+    groups = dict(
+        session.execute(
+            select(Student.id, Student.group_id).where(Student.id.in_(student_ids))
+        ).all()
+    )
+    teachers = dict(
+        session.execute(
+            select(Subject.id, Subject.teacher_id).where(Subject.id.in_(subject_ids))
+        ).all()
+    )
+    tags = {"grades"}
+    for student_id, subject_id in pairs:
+        tags.add(f"grades:student:{student_id}")
+        tags.add(f"grades:subject:{subject_id}")
+        if subject_id in teachers:
+            tags.add(f"grades:teacher:{teachers[subject_id]}")
+        if student_id in groups:
+            tags.add(f"grades:group-subject:{groups[student_id]}:{subject_id}")
+    return tags
@@ -1,283 +1,93 @@
 #!/usr/bin/env python
+"""Command line interface; the handlers live in ``app.commands``."""
 
 import argparse
-import sys
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.inspection import inspect
-
-from app.db import SessionLocal
-from app.models import Group, Teacher, Subject, Student, Grade
-
-
-def model_columns(instance):
-    return [c.key for c in inspect(instance).mapper.column_attrs]
-
-
-def row_to_dict(instance):
-    cols = model_columns(instance)
-    return {k: getattr(instance, k) for k in cols}
-
-
-def print_rows(rows):
-    if not rows:
-        print("[]")
-        return
-    for r in rows:
-        print(row_to_dict(r))
-
-
-def teachers_create(args):
-    with SessionLocal() as s:
-        obj = Teacher(full_name=args.name)
-        s.add(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def teachers_update(args):
-    with SessionLocal() as s:
-        obj = s.get(Teacher, args.id)
-        if not obj:
-            sys.exit(f"Teacher id={args.id} not found")
-        obj.full_name = args.name
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def teachers_list(_args):
-    with SessionLocal() as s:
-        rows = s.scalars(select(Teacher)).all()
-        print_rows(rows)
-
-
-def teachers_remove(args):
-    with SessionLocal() as s:
-        obj = s.get(Teacher, args.id)
-        if not obj:
-            sys.exit(f"Teacher id={args.id} not found")
-        s.delete(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        print(f"Deleted Teacher id={args.id}")
-
-
-def groups_create(args):
-    with SessionLocal() as s:
-        obj = Group(name=args.name)
-        s.add(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def groups_update(args):
-    with SessionLocal() as s:
-        obj = s.get(Group, args.id)
-        if not obj:
-            sys.exit(f"Group id={args.id} not found")
-        obj.name = args.name
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def groups_list(_args):
-    with SessionLocal() as s:
-        rows = s.scalars(select(Group)).all()
-        print_rows(rows)
-
-
-def groups_remove(args):
-    with SessionLocal() as s:
-        obj = s.get(Group, args.id)
-        if not obj:
-            sys.exit(f"Group id={args.id} not found")
-        s.delete(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        print(f"Deleted Group id={args.id}")
-
-
-def subjects_create(args):
-    with SessionLocal() as s:
-        obj = Subject(name=args.name, teacher_id=args.teacher_id)
-        s.add(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def subjects_update(args):
-    with SessionLocal() as s:
-        obj = s.get(Subject, args.id)
-        if not obj:
-            sys.exit(f"Subject id={args.id} not found")
-        if args.name is not None:
-            obj.name = args.name
-        if args.teacher_id is not None:
-            obj.teacher_id = args.teacher_id
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def subjects_list(_args):
-    with SessionLocal() as s:
-        rows = s.scalars(select(Subject)).all()
-        print_rows(rows)
-
-
-def subjects_remove(args):
-    with SessionLocal() as s:
-        obj = s.get(Subject, args.id)
-        if not obj:
-            sys.exit(f"Subject id={args.id} not found")
-        s.delete(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        print(f"Deleted Subject id={args.id}")
-
-
-def students_create(args):
-    with SessionLocal() as s:
-        obj = Student(full_name=args.full_name, group_id=args.group_id)
-        s.add(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def students_update(args):
-    with SessionLocal() as s:
-        obj = s.get(Student, args.id)
-        if not obj:
-            sys.exit(f"Student id={args.id} not found")
-        if args.full_name is not None:
-            obj.full_name = args.full_name
-        if args.group_id is not None:
-            obj.group_id = args.group_id
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def students_list(_args):
-    with SessionLocal() as s:
-        rows = s.scalars(select(Student)).all()
-        print_rows(rows)
-
-
-def students_remove(args):
-    with SessionLocal() as s:
-        obj = s.get(Student, args.id)
-        if not obj:
-            sys.exit(f"Student id={args.id} not found")
-        s.delete(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        print(f"Deleted Student id={args.id}")
-
-
-def grades_create(args):
-    with SessionLocal() as s:
-        obj = Grade(
-            student_id=args.student_id, subject_id=args.subject_id, value=args.value
+from datetime import datetime
+
+from app import export
+
+IMPORT_FORMATS = ("csv", "ndjson")
+SYNC_STATE_PATH = ".grades_sync.json"
+
+
+def handler(name):
+    """Parser default that imports ``app.commands`` (SQLAlchemy, the models)
+    only when the command runs, and calls ``app.commands.<name>``."""
+
+    def call(args):
+        from app import commands
+
+        return getattr(commands, name)(args)
+
+    call.__name__ = name
+    return call
+
+
+def add_list_arguments(parser):
+    parser.add_argument(
+        "--after-id",
+        type=int,
+        help="Only rows with id greater than this (keyset pagination)",
+    )
+    parser.add_argument("--limit", type=int, help="Maximum number of rows")
+
+
+def add_export_arguments(parser):
+    add_list_arguments(parser)
+    parser.add_argument(
+        "--format", choices=export.FORMATS, default="ndjson", help="Output format"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="Output file (default: stdout)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10_000,
+        help="Rows fetched from the cursor and written per batch",
+    )
+
+
+def add_where_arguments(parser):
+    """Options shared by the ``delete-where`` and ``update-where`` commands;
+    filters given together must all match, a repeated id filter matches any
+    of its ids."""
+    parser.add_argument("--min-id", type=int, help="Only rows with id >= this")
+    parser.add_argument("--max-id", type=int, help="Only rows with id <= this")
+    parser.add_argument(
+        "--all", action="store_true", help="Allow running without any filter"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only count the matching rows, change nothing",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Do not print the affected rows"
+    )
+
+
+def add_grade_filters(parser):
+    add_where_arguments(parser)
+    for name in ("student", "subject", "group", "teacher"):
+        parser.add_argument(
+            f"--{name}-id",
+            type=int,
+            action="append",
+            help=f"Only grades of this {name}, may be repeated",
         )
-        s.add(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def grades_update(args):
-    with SessionLocal() as s:
-        obj = s.get(Grade, args.id)
-        if not obj:
-            sys.exit(f"Grade id={args.id} not found")
-        if args.student_id is not None:
-            obj.student_id = args.student_id
-        if args.subject_id is not None:
-            obj.subject_id = args.subject_id
-        if args.value is not None:
-            obj.value = args.value
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        s.refresh(obj)
-        print(row_to_dict(obj))
-
-
-def grades_list(_args):
-    with SessionLocal() as s:
-        rows = s.scalars(select(Grade)).all()
-        print_rows(rows)
-
-
-def grades_remove(args):
-    with SessionLocal() as s:
-        obj = s.get(Grade, args.id)
-        if not obj:
-            sys.exit(f"Grade id={args.id} not found")
-        s.delete(obj)
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            sys.exit(f"Integrity error: {e.orig}")
-        print(f"Deleted Grade id={args.id}")
+    parser.add_argument("--value-lt", type=int, help="Only grades below this value")
+    parser.add_argument("--value-gt", type=int, help="Only grades above this value")
+    parser.add_argument(
+        "--created-before",
+        type=datetime.fromisoformat,
+        help="Only grades created before this ISO date or timestamp",
+    )
+    parser.add_argument(
+        "--created-since",
+        type=datetime.fromisoformat,
+        help="Only grades created at or after this ISO date or timestamp",
+    )
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -289,38 +99,56 @@ def build_parser() -> argparse.ArgumentParser:
 
     t_create = sp_teachers.add_parser("create", help="Create a teacher")
     t_create.add_argument("name", help="Teacher's full name")
-    t_create.set_defaults(func=teachers_create)
+    t_create.set_defaults(func=handler("teachers_create"))
 
     t_update = sp_teachers.add_parser("update", help="Update a teacher")
     t_update.add_argument("id", type=int)
     t_update.add_argument("name")
-    t_update.set_defaults(func=teachers_update)
+    t_update.set_defaults(func=handler("teachers_update"))
 
     t_list = sp_teachers.add_parser("list", help="List all teachers")
-    t_list.set_defaults(func=teachers_list)
+    add_list_arguments(t_list)
+    t_list.set_defaults(func=handler("teachers_list"))
+
+    t_show = sp_teachers.add_parser("show", help="Show one teacher")
+    t_show.add_argument("id", type=int)
+    t_show.set_defaults(func=handler("teachers_show"))
+
+    t_export = sp_teachers.add_parser("export", help="Export teachers in bulk")
+    add_export_arguments(t_export)
+    t_export.set_defaults(func=handler("teachers_export"))
 
     t_remove = sp_teachers.add_parser("remove", help="Remove a teacher")
     t_remove.add_argument("id", type=int)
-    t_remove.set_defaults(func=teachers_remove)
+    t_remove.set_defaults(func=handler("teachers_remove"))
 
     p_groups = sp_resources.add_parser("groups", help="Groups operations")
     sp_groups = p_groups.add_subparsers(dest="action", required=True)
 
     g_create = sp_groups.add_parser("create", help="Create a group")
     g_create.add_argument("name")
-    g_create.set_defaults(func=groups_create)
+    g_create.set_defaults(func=handler("groups_create"))
 
     g_update = sp_groups.add_parser("update", help="Update a group")
     g_update.add_argument("id", type=int)
     g_update.add_argument("name")
-    g_update.set_defaults(func=groups_update)
+    g_update.set_defaults(func=handler("groups_update"))
 
     g_list = sp_groups.add_parser("list", help="List all groups")
-    g_list.set_defaults(func=groups_list)
+    add_list_arguments(g_list)
+    g_list.set_defaults(func=handler("groups_list"))
+
+    g_show = sp_groups.add_parser("show", help="Show one group")
+    g_show.add_argument("id", type=int)
+    g_show.set_defaults(func=handler("groups_show"))
+
+    g_export = sp_groups.add_parser("export", help="Export groups in bulk")
+    add_export_arguments(g_export)
+    g_export.set_defaults(func=handler("groups_export"))
 
     g_remove = sp_groups.add_parser("remove", help="Remove a group")
     g_remove.add_argument("id", type=int)
-    g_remove.set_defaults(func=groups_remove)
+    g_remove.set_defaults(func=handler("groups_remove"))
 
     p_subjects = sp_resources.add_parser("subjects", help="Subjects operations")
     sp_subjects = p_subjects.add_subparsers(dest="action", required=True)
@@ -328,20 +156,48 @@ def build_parser() -> argparse.ArgumentParser:
     s_create = sp_subjects.add_parser("create", help="Create a subject")
     s_create.add_argument("name")
     s_create.add_argument("teacher_id", type=int)
-    s_create.set_defaults(func=subjects_create)
+    s_create.set_defaults(func=handler("subjects_create"))
 
     s_update = sp_subjects.add_parser("update", help="Update a subject")
     s_update.add_argument("id", type=int)
     s_update.add_argument("--name")
     s_update.add_argument("--teacher_id", type=int)
-    s_update.set_defaults(func=subjects_update)
+    s_update.set_defaults(func=handler("subjects_update"))
 
     s_list = sp_subjects.add_parser("list", help="List all subjects")
-    s_list.set_defaults(func=subjects_list)
+    add_list_arguments(s_list)
+    s_list.set_defaults(func=handler("subjects_list"))
+
+    s_show = sp_subjects.add_parser("show", help="Show one subject")
+    s_show.add_argument("id", type=int)
+    s_show.set_defaults(func=handler("subjects_show"))
+
+    s_export = sp_subjects.add_parser("export", help="Export subjects in bulk")
+    add_export_arguments(s_export)
+    s_export.set_defaults(func=handler("subjects_export"))
 
     s_remove = sp_subjects.add_parser("remove", help="Remove a subject")
     s_remove.add_argument("id", type=int)
-    s_remove.set_defaults(func=subjects_remove)
+    s_remove.set_defaults(func=handler("subjects_remove"))
+
+    s_delete_where = sp_subjects.add_parser(
+        "delete-where", help="Delete all subjects matching the filters"
+    )
+    add_where_arguments(s_delete_where)
+    s_delete_where.add_argument(
+        "--teacher-id", type=int, action="append", help="May be repeated"
+    )
+    s_delete_where.set_defaults(func=handler("subjects_delete_where"))
+
+    s_update_where = sp_subjects.add_parser(
+        "update-where", help="Update all subjects matching the filters"
+    )
+    add_where_arguments(s_update_where)
+    s_update_where.add_argument(
+        "--teacher-id", type=int, action="append", help="May be repeated"
+    )
+    s_update_where.add_argument("--set-teacher-id", type=int)
+    s_update_where.set_defaults(func=handler("subjects_update_where"))
 
     p_students = sp_resources.add_parser("students", help="Students operations")
     sp_students = p_students.add_subparsers(dest="action", required=True)
@@ -349,20 +205,49 @@ def build_parser() -> argparse.ArgumentParser:
     st_create = sp_students.add_parser("create", help="Crеate a student")
     st_create.add_argument("full_name")
     st_create.add_argument("group_id", type=int)
-    st_create.set_defaults(func=students_create)
+    st_create.set_defaults(func=handler("students_create"))
 
     st_update = sp_students.add_parser("update", help="Update a student")
     st_update.add_argument("id", type=int)
     st_update.add_argument("--full_name")
     st_update.add_argument("--group_id", type=int)
-    st_update.set_defaults(func=students_update)
+    st_update.set_defaults(func=handler("students_update"))
 
     st_list = sp_students.add_parser("list", help="List all students")
-    st_list.set_defaults(func=students_list)
+    add_list_arguments(st_list)
+    st_list.set_defaults(func=handler("students_list"))
+
+    st_show = sp_students.add_parser("show", help="Show one student")
+    st_show.add_argument("id", type=int)
+    st_show.set_defaults(func=handler("students_show"))
+
+    st_export = sp_students.add_parser("export", help="Export students in bulk")
+    add_export_arguments(st_export)
+    st_export.set_defaults(func=handler("students_export"))
 
     st_remove = sp_students.add_parser("remove", help="Remove a student")
     st_remove.add_argument("id", type=int)
-    st_remove.set_defaults(func=students_remove)
+    st_remove.set_defaults(func=handler("students_remove"))
+
+    st_delete_where = sp_students.add_parser(
+        "delete-where", help="Delete all students matching the filters"
+    )
+    add_where_arguments(st_delete_where)
+    st_delete_where.add_argument(
+        "--group-id", type=int, action="append", help="May be repeated"
+    )
+    st_delete_where.set_defaults(func=handler("students_delete_where"))
+
+    st_update_where = sp_students.add_parser(
+        "update-where",
+        help="Update all students matching the filters, e.g. move a group",
+    )
+    add_where_arguments(st_update_where)
+    st_update_where.add_argument(
+        "--group-id", type=int, action="append", help="May be repeated"
+    )
+    st_update_where.add_argument("--set-group-id", type=int)
+    st_update_where.set_defaults(func=handler("students_update_where"))
 
     p_grades = sp_resources.add_parser("grades", help="Grades operations")
     sp_grades = p_grades.add_subparsers(dest="action", required=True)
@@ -371,21 +256,174 @@ def build_parser() -> argparse.ArgumentParser:
     gr_create.add_argument("student_id", type=int)
     gr_create.add_argument("subject_id", type=int)
     gr_create.add_argument("value", type=int)
-    gr_create.set_defaults(func=grades_create)
+    gr_create.set_defaults(func=handler("grades_create"))
 
     gr_update = sp_grades.add_parser("update", help="Update a grade")
     gr_update.add_argument("id", type=int)
     gr_update.add_argument("--student_id", type=int)
     gr_update.add_argument("--subject_id", type=int)
     gr_update.add_argument("--value", type=int)
-    gr_update.set_defaults(func=grades_update)
+    gr_update.set_defaults(func=handler("grades_update"))
 
     gr_list = sp_grades.add_parser("list", help="List all grades")
-    gr_list.set_defaults(func=grades_list)
+    add_list_arguments(gr_list)
+    gr_list.set_defaults(func=handler("grades_list"))
+
+    gr_show = sp_grades.add_parser("show", help="Show one grade")
+    gr_show.add_argument("id", type=int)
+    gr_show.set_defaults(func=handler("grades_show"))
+
+    gr_export = sp_grades.add_parser("export", help="Export grades in bulk")
+    add_export_arguments(gr_export)
+    gr_export.set_defaults(func=handler("grades_export"))
 
     gr_remove = sp_grades.add_parser("remove", help="Remove a grade")
     gr_remove.add_argument("id", type=int)
-    gr_remove.set_defaults(func=grades_remove)
+    gr_remove.set_defaults(func=handler("grades_remove"))
+
+    gr_delete_where = sp_grades.add_parser(
+        "delete-where", help="Delete all grades matching the filters"
+    )
+    add_grade_filters(gr_delete_where)
+    gr_delete_where.set_defaults(func=handler("grades_delete_where"))
+
+    gr_update_where = sp_grades.add_parser(
+        "update-where", help="Update all grades matching the filters"
+    )
+    add_grade_filters(gr_update_where)
+    gr_update_where.add_argument("--set-student-id", type=int)
+    gr_update_where.add_argument("--set-subject-id", type=int)
+    gr_update_where.add_argument("--set-value", type=int)
+    gr_update_where.set_defaults(func=handler("grades_update_where"))
+
+    gr_import = sp_grades.add_parser("import", help="Import grades from a file")
+    gr_import.add_argument("file", help="CSV or NDJSON file, - for stdin")
+    gr_import.add_argument(
+        "--format",
+        choices=IMPORT_FORMATS,
+        help="Input format (default: by file extension, ndjson otherwise)",
+    )
+    gr_import.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows inserted per transaction",
+    )
+    gr_import.add_argument(
+        "--rejects", help="Write rejected rows as NDJSON here (default: stderr)"
+    )
+    gr_import.set_defaults(func=handler("grades_import"))
+
+    gr_sync = sp_grades.add_parser(
+        "sync",
+        help="Write grades inserted, updated or deleted since the last sync",
+    )
+    gr_sync.add_argument(
+        "--state",
+        default=SYNC_STATE_PATH,
+        help=f"Watermark file (default: {SYNC_STATE_PATH})",
+    )
+    gr_sync.add_argument(
+        "-o", "--output", default="-", help="NDJSON output file (default: stdout)"
+    )
+    gr_sync.set_defaults(func=handler("grades_sync"))
+
+    gr_archive = sp_grades.add_parser(
+        "archive", help="Move grades created before a date out of grades"
+    )
+    gr_archive.add_argument(
+        "--before",
+        type=datetime.fromisoformat,
+        required=True,
+        help="ISO date or timestamp; older grades are archived",
+    )
+    gr_archive.add_argument(
+        "--drop",
+        action="store_true",
+        help="Delete the old grades instead of keeping archive tables",
+    )
+    gr_archive.set_defaults(func=handler("grades_archive"))
+
+    gr_partitions = sp_grades.add_parser(
+        "partitions", help="List grades partitions and archive tables"
+    )
+    gr_partitions.add_argument(
+        "--ensure-months",
+        type=int,
+        default=0,
+        help="Create missing monthly partitions this many months ahead "
+        "(PostgreSQL only; SQLite keeps grades unpartitioned)",
+    )
+    gr_partitions.set_defaults(func=handler("grades_partitions"))
+
+    gr_leaderboard = sp_grades.add_parser(
+        "leaderboard", help="Best students by average grade, and their ranks"
+    )
+    gr_leaderboard.add_argument(
+        "--subject-id", type=int, help="Rank within one subject (default: overall)"
+    )
+    gr_leaderboard.add_argument(
+        "--top", type=int, default=10, help="Students listed (default: 10)"
+    )
+    gr_leaderboard.add_argument("--student-id", type=int, help="Also show this rank")
+    gr_leaderboard.set_defaults(func=handler("grades_leaderboard"))
+
+    gr_rebuild_stats = sp_grades.add_parser(
+        "rebuild-stats", help="Recompute grade_stats and student_stats from grades"
+    )
+    gr_rebuild_stats.set_defaults(func=handler("grades_rebuild_stats"))
+
+    p_db = sp_resources.add_parser("db", help="Database engine operations")
+    sp_db = p_db.add_subparsers(dest="action", required=True)
+
+    db_pool = sp_db.add_parser(
+        "pool-stats",
+        help="Show the connection pool configuration and the pool counters "
+        "recorded with DB_INSTRUMENT=1",
+    )
+    db_pool.set_defaults(func=handler("db_pool_stats"))
+
+    db_replicas = sp_db.add_parser(
+        "replicas", help="Show the read replicas and whether they are healthy"
+    )
+    db_replicas.set_defaults(func=handler("db_replicas"))
+
+    db_stats_p = sp_db.add_parser(
+        "stats", help="Show statement statistics recorded with DB_INSTRUMENT=1"
+    )
+    db_stats_p.add_argument(
+        "--top", type=int, default=10, help="Number of callers and statements"
+    )
+    db_stats_p.add_argument(
+        "--json", action="store_true", help="Dump the raw aggregates as JSON"
+    )
+    db_stats_p.add_argument(
+        "--reset", action="store_true", help="Discard the recorded statistics"
+    )
+    db_stats_p.set_defaults(func=handler("db_stats"))
+
+    p_shell = sp_resources.add_parser(
+        "shell", help="Read commands interactively in one process"
+    )
+    p_shell.add_argument(
+        "--commit-every",
+        type=int,
+        default=1,
+        help="Commit after this many commands (default: 1, 0: at exit)",
+    )
+    p_shell.set_defaults(func=handler("cli_shell"))
+
+    p_batch = sp_resources.add_parser(
+        "batch", help="Run commands from a file, one per line"
+    )
+    p_batch.add_argument("file", help="Command file, - for stdin")
+    p_batch.add_argument(
+        "--commit-every",
+        type=int,
+        default=1000,
+        help="Commit after this many commands (default: 1000, 0: at the end)",
+    )
+    p_batch.set_defaults(func=handler("cli_batch"))
 
     return p
 
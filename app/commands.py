@@ -0,0 +1,816 @@
+"""Handlers of the ``cli`` commands.
+
+``app.cli`` only builds the argument parser and imports this module when a
+command runs, so ``--help`` and argument errors never load SQLAlchemy, the
+models or the engine.
+"""
+
+import functools
+import itertools
+import json
+import shlex
+import sys
+from datetime import datetime
+from sqlalchemy import bindparam, make_url, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.inspection import inspect
+
+from app import (
+    bulk,
+    cache,
+    db,
+    export,
+    importer,
+    instrument,
+    leaderboard,
+    partitions,
+    stats,
+    sync,
+)
+from app.cli import build_parser
+from app.db import ReadSessionLocal, SessionLocal, pool_stats, settings
+from app.models import Group, Teacher, Subject, Student, Grade
+
+
+@functools.cache
+def model_columns(model):
+    """Attribute names of ``model``'s columns, looked up once per model."""
+    return tuple(c.key for c in inspect(model).column_attrs)
+
+
+def row_to_dict(instance):
+    return {k: getattr(instance, k) for k in model_columns(type(instance))}
+
+
+LIST_BATCH_SIZE = 1000
+
+
+def list_query(model, args):
+    """Keyset-paginated column select over ``model`` ordered by id."""
+    table = model.__table__
+    q = select(*table.columns).order_by(table.c.id)
+    if args.after_id is not None:
+        q = q.where(table.c.id > args.after_id)
+    if args.limit is not None:
+        q = q.limit(args.limit)
+    return q
+
+
+@functools.cache
+def show_query(model):
+    """Column select of one ``model`` row by ``:id``, built once per model."""
+    table = model.__table__
+    return select(*table.columns).where(table.c.id == bindparam("id"))
+
+
+@functools.cache
+def row_format(keys):
+    """``str.format`` template rendering a row of ``keys`` as ``print`` renders
+    the row's dict, newline included."""
+    fields = ", ".join(f"{k!r}: {{!r}}" for k in keys)
+    return "{{" + fields + "}}\n"
+
+
+def format_rows(keys, rows):
+    return "".join(itertools.starmap(row_format(tuple(keys)).format, rows))
+
+
+def print_rows(result):
+    """Print the rows of ``result`` as dicts, one write per fetched batch."""
+    keys = tuple(result.keys())
+    empty = True
+    for batch in result.partitions(LIST_BATCH_SIZE):
+        empty = False
+        sys.stdout.write(format_rows(keys, batch))
+    if empty:
+        print("[]")
+
+
+def stream_rows(model, args):
+    with ReadSessionLocal() as s:
+        rows = s.execute(
+            list_query(model, args),
+            execution_options={"yield_per": LIST_BATCH_SIZE},
+        )
+        print_rows(rows)
+
+
+def show_row(model, args):
+    with ReadSessionLocal() as s:
+        row = s.execute(show_query(model), {"id": args.id}).first()
+    if row is None:
+        sys.exit(f"{model.__name__} id={args.id} not found")
+    sys.stdout.write(format_rows(row._fields, [row]))
+
+
+def export_model(model, args):
+    with ReadSessionLocal() as s:
+        rows = s.execute(
+            list_query(model, args),
+            execution_options={"yield_per": args.batch_size},
+        )
+        count = export.export_rows(
+            rows, model.__table__, args.format, args.output, args.batch_size
+        )
+    print(f"Exported {count} {model.__tablename__} rows", file=sys.stderr)
+
+
+def teachers_create(args):
+    with SessionLocal() as s:
+        obj = Teacher(full_name=args.name)
+        s.add(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def teachers_update(args):
+    with SessionLocal() as s:
+        obj = s.get(Teacher, args.id)
+        if not obj:
+            sys.exit(f"Teacher id={args.id} not found")
+        obj.full_name = args.name
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def teachers_list(args):
+    stream_rows(Teacher, args)
+
+
+def teachers_show(args):
+    show_row(Teacher, args)
+
+
+def teachers_export(args):
+    export_model(Teacher, args)
+
+
+def teachers_remove(args):
+    with SessionLocal() as s:
+        obj = s.get(Teacher, args.id)
+        if not obj:
+            sys.exit(f"Teacher id={args.id} not found")
+        s.delete(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        print(f"Deleted Teacher id={args.id}")
+
+
+def groups_create(args):
+    with SessionLocal() as s:
+        obj = Group(name=args.name)
+        s.add(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("groups")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def groups_update(args):
+    with SessionLocal() as s:
+        obj = s.get(Group, args.id)
+        if not obj:
+            sys.exit(f"Group id={args.id} not found")
+        obj.name = args.name
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("groups")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def groups_list(args):
+    stream_rows(Group, args)
+
+
+def groups_show(args):
+    show_row(Group, args)
+
+
+def groups_export(args):
+    export_model(Group, args)
+
+
+def groups_remove(args):
+    with SessionLocal() as s:
+        obj = s.get(Group, args.id)
+        if not obj:
+            sys.exit(f"Group id={args.id} not found")
+        s.delete(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("groups")
+        print(f"Deleted Group id={args.id}")
+
+
+def subjects_create(args):
+    with SessionLocal() as s:
+        obj = Subject(name=args.name, teacher_id=args.teacher_id)
+        s.add(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("subjects", f"subjects:teacher:{obj.teacher_id}")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def subjects_update(args):
+    with SessionLocal() as s:
+        obj = s.get(Subject, args.id)
+        if not obj:
+            sys.exit(f"Subject id={args.id} not found")
+        old_teacher_id = obj.teacher_id
+        if args.name is not None:
+            obj.name = args.name
+        if args.teacher_id is not None:
+            obj.teacher_id = args.teacher_id
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate(
+            "subjects",
+            f"subjects:teacher:{old_teacher_id}",
+            f"subjects:teacher:{obj.teacher_id}",
+        )
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def subjects_list(args):
+    stream_rows(Subject, args)
+
+
+def subjects_show(args):
+    show_row(Subject, args)
+
+
+def subjects_export(args):
+    export_model(Subject, args)
+
+
+def subjects_remove(args):
+    with SessionLocal() as s:
+        obj = s.get(Subject, args.id)
+        if not obj:
+            sys.exit(f"Subject id={args.id} not found")
+        teacher_id = obj.teacher_id
+        s.delete(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("subjects", f"subjects:teacher:{teacher_id}")
+        print(f"Deleted Subject id={args.id}")
+
+
+def students_create(args):
+    with SessionLocal() as s:
+        obj = Student(full_name=args.full_name, group_id=args.group_id)
+        s.add(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("students", f"students:group:{obj.group_id}")
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def students_update(args):
+    with SessionLocal() as s:
+        obj = s.get(Student, args.id)
+        if not obj:
+            sys.exit(f"Student id={args.id} not found")
+        old_group_id = obj.group_id
+        if args.full_name is not None:
+            obj.full_name = args.full_name
+        if args.group_id is not None:
+            obj.group_id = args.group_id
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate(
+            "students",
+            f"students:group:{old_group_id}",
+            f"students:group:{obj.group_id}",
+        )
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def students_list(args):
+    stream_rows(Student, args)
+
+
+def students_show(args):
+    show_row(Student, args)
+
+
+def students_export(args):
+    export_model(Student, args)
+
+
+def students_remove(args):
+    with SessionLocal() as s:
+        obj = s.get(Student, args.id)
+        if not obj:
+            sys.exit(f"Student id={args.id} not found")
+        group_id = obj.group_id
+        s.delete(obj)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate("students", f"students:group:{group_id}")
+        print(f"Deleted Student id={args.id}")
+
+
+def grades_create(args):
+    with SessionLocal() as s:
+        obj = Grade(
+            student_id=args.student_id, subject_id=args.subject_id, value=args.value
+        )
+        s.add(obj)
+        try:
+            s.flush()
+            stats.apply_grade(s, obj.student_id, obj.subject_id, obj.value)
+            tags = cache.grade_tags(s, [(obj.student_id, obj.subject_id)])
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate(*tags)
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def grades_update(args):
+    with SessionLocal() as s:
+        obj = s.get(Grade, args.id)
+        if not obj:
+            sys.exit(f"Grade id={args.id} not found")
+        old = (obj.student_id, obj.subject_id, obj.value)
+        if args.student_id is not None:
+            obj.student_id = args.student_id
+        if args.subject_id is not None:
+            obj.subject_id = args.subject_id
+        if args.value is not None:
+            obj.value = args.value
+        try:
+            s.flush()
+            stats.apply_grade(s, *old, sign=-1)
+            stats.apply_grade(s, obj.student_id, obj.subject_id, obj.value)
+            sync.log_update(s, obj)
+            tags = cache.grade_tags(
+                s, [old[:2], (obj.student_id, obj.subject_id)]
+            )
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate(*tags)
+        s.refresh(obj)
+        print(row_to_dict(obj))
+
+
+def grades_list(args):
+    stream_rows(Grade, args)
+
+
+def grades_show(args):
+    show_row(Grade, args)
+
+
+def grades_export(args):
+    export_model(Grade, args)
+
+
+def grades_remove(args):
+    with SessionLocal() as s:
+        obj = s.get(Grade, args.id)
+        if not obj:
+            sys.exit(f"Grade id={args.id} not found")
+        s.delete(obj)
+        try:
+            stats.apply_grade(s, obj.student_id, obj.subject_id, obj.value, sign=-1)
+            sync.log_delete(s, args.id)
+            tags = cache.grade_tags(s, [(obj.student_id, obj.subject_id)])
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+        cache.invalidate(*tags)
+        print(f"Deleted Grade id={args.id}")
+
+
+def grades_import(args):
+    importer.run_import(
+        SessionLocal, args.file, args.format, args.batch_size, args.rejects
+    )
+
+
+def grades_sync(args):
+    with export.open_output(args.output, binary=False) as out:
+        counts = sync.export_changes(SessionLocal, args.state, out)
+    print(
+        f"Synced {counts['insert']} new, {counts['update']} updated, "
+        f"{counts['delete']} deleted grades",
+        file=sys.stderr,
+    )
+
+
+def grades_archive(args):
+    with SessionLocal() as s:
+        rows, tables = partitions.archive(s, args.before, drop=args.drop)
+        s.commit()
+    cache.clear()
+    action = "Deleted" if args.drop else "Archived"
+    print(f"{action} {rows} grades created before {args.before:%Y-%m-%d %H:%M:%S}")
+    for name in tables:
+        print(f"  {name}")
+
+
+def grades_partitions(args):
+    with SessionLocal() as s:
+        conn = s.connection()
+        if args.ensure_months and not partitions.is_partitioned(conn):
+            print(
+                "grades is not partitioned on this database "
+                "(partitioning needs PostgreSQL)",
+                file=sys.stderr,
+            )
+        elif args.ensure_months:
+            now = datetime.utcnow()
+            year, month = now.year, now.month
+            for _ in range(args.ensure_months):
+                year, month = partitions.month_after(year, month)
+            for name in partitions.ensure_partitions(
+                conn, now, datetime(year, month, 1)
+            ):
+                print(f"Created {name}")
+        for name, kind, rows in partitions.describe(conn):
+            print(f"{name:<28} {kind:<10} {rows:>12}")
+        s.commit()
+
+
+def grades_leaderboard(args):
+    with ReadSessionLocal() as s:
+        for position, (student_id, name, avg) in enumerate(
+            leaderboard.top(s, args.top, args.subject_id), start=1
+        ):
+            print(f"{position:>4} {student_id:>8} {avg:>8.2f}  {name}")
+        if args.student_id is not None:
+            position = leaderboard.rank(s, args.student_id, args.subject_id)
+            if position is None:
+                sys.exit(f"Student id={args.student_id} has no grades")
+            print(f"Student id={args.student_id} ranks {position}")
+
+
+def grades_rebuild_stats(_args):
+    with SessionLocal() as s:
+        count = stats.rebuild(s)
+        s.commit()
+        cache.clear()
+        print(f"Rebuilt grade_stats: {count} rows")
+
+
+def id_conditions(table, args):
+    conditions = []
+    if args.min_id is not None:
+        conditions.append(table.c.id >= args.min_id)
+    if args.max_id is not None:
+        conditions.append(table.c.id <= args.max_id)
+    return conditions
+
+
+def grade_conditions(args):
+    c = Grade.__table__.c
+    conditions = id_conditions(Grade.__table__, args)
+    if args.student_id:
+        conditions.append(c.student_id.in_(args.student_id))
+    if args.subject_id:
+        conditions.append(c.subject_id.in_(args.subject_id))
+    if args.group_id:
+        conditions.append(
+            c.student_id.in_(
+                select(Student.id).where(Student.group_id.in_(args.group_id))
+            )
+        )
+    if args.teacher_id:
+        conditions.append(
+            c.subject_id.in_(
+                select(Subject.id).where(Subject.teacher_id.in_(args.teacher_id))
+            )
+        )
+    if args.value_lt is not None:
+        conditions.append(c.value < args.value_lt)
+    if args.value_gt is not None:
+        conditions.append(c.value > args.value_gt)
+    if args.created_before is not None:
+        conditions.append(c.created_at < args.created_before)
+    if args.created_since is not None:
+        conditions.append(c.created_at >= args.created_since)
+    return conditions
+
+
+def student_conditions(args):
+    conditions = id_conditions(Student.__table__, args)
+    if args.group_id:
+        conditions.append(Student.__table__.c.group_id.in_(args.group_id))
+    return conditions
+
+
+def subject_conditions(args):
+    conditions = id_conditions(Subject.__table__, args)
+    if args.teacher_id:
+        conditions.append(Subject.__table__.c.teacher_id.in_(args.teacher_id))
+    return conditions
+
+
+def where_values(args, columns):
+    """``{column: value}`` from the ``--set-*`` options that were given."""
+    values = {
+        column: getattr(args, f"set_{column}")
+        for column in columns
+        if getattr(args, f"set_{column}") is not None
+    }
+    if not values:
+        options = ", ".join(f"--set-{c.replace('_', '-')}" for c in columns)
+        sys.exit(f"Nothing to update; give at least one of {options}")
+    return values
+
+
+def run_where(model, conditions, args, change):
+    """Run ``change(session)``, which returns ``(rows, tags)``, for a
+    ``delete-where`` or ``update-where`` command, or with ``--dry-run`` only
+    count the matching rows."""
+    if not conditions and not args.all:
+        sys.exit("No filters given; pass --all to change every row")
+    action = "delete" if args.action == "delete-where" else "update"
+    name = model.__tablename__
+    with SessionLocal() as s:
+        if args.dry_run:
+            n = bulk.count(s, model.__table__, conditions)
+            print(f"Would {action} {n} {name} rows")
+            return
+        try:
+            rows, tags = change(s)
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            sys.exit(f"Integrity error: {e.orig}")
+    cache.invalidate(*tags)
+    if not args.quiet and rows:
+        sys.stdout.write(format_rows(rows[0]._fields, rows))
+    print(f"{action.capitalize()}d {len(rows)} {name} rows", file=sys.stderr)
+
+
+def grades_delete_where(args):
+    def change(s):
+        rows, pairs = bulk.delete_grades(s, conditions)
+        return rows, cache.grade_tags(s, pairs)
+
+    conditions = grade_conditions(args)
+    run_where(Grade, conditions, args, change)
+
+
+def grades_update_where(args):
+    def change(s):
+        rows, pairs = bulk.update_grades(s, conditions, values)
+        return rows, cache.grade_tags(s, pairs)
+
+    conditions = grade_conditions(args)
+    values = where_values(args, ("student_id", "subject_id", "value"))
+    run_where(Grade, conditions, args, change)
+
+
+def students_delete_where(args):
+    def change(s):
+        rows = bulk.delete_rows(s, Student.__table__, conditions)
+        groups = {r.group_id for r in rows}
+        return rows, ["students", *(f"students:group:{g}" for g in groups)]
+
+    conditions = student_conditions(args)
+    run_where(Student, conditions, args, change)
+
+
+def students_update_where(args):
+    def change(s):
+        groups = set(
+            s.scalars(
+                select(Student.group_id).where(*conditions).distinct()
+            ).all()
+        )
+        rows = bulk.update_rows(s, Student.__table__, conditions, values)
+        groups.update(r.group_id for r in rows)
+        return rows, ["students", *(f"students:group:{g}" for g in groups)]
+
+    conditions = student_conditions(args)
+    values = where_values(args, ("group_id",))
+    run_where(Student, conditions, args, change)
+
+
+def subjects_delete_where(args):
+    def change(s):
+        rows = bulk.delete_rows(s, Subject.__table__, conditions)
+        teachers = {r.teacher_id for r in rows}
+        return rows, ["subjects", *(f"subjects:teacher:{t}" for t in teachers)]
+
+    conditions = subject_conditions(args)
+    run_where(Subject, conditions, args, change)
+
+
+def subjects_update_where(args):
+    def change(s):
+        teachers = set(
+            s.scalars(
+                select(Subject.teacher_id).where(*conditions).distinct()
+            ).all()
+        )
+        rows = bulk.update_rows(s, Subject.__table__, conditions, values)
+        teachers.update(r.teacher_id for r in rows)
+        return rows, ["subjects", *(f"subjects:teacher:{t}" for t in teachers)]
+
+    conditions = subject_conditions(args)
+    values = where_values(args, ("teacher_id",))
+    run_where(Subject, conditions, args, change)
+
+
+def print_pool_counters(title, counters):
+    print(f"\n{title}:")
+    for key, value in counters.items():
+        if isinstance(value, float):
+            value = f"{value:.1f}"
+        print(f"  {key}: {value}")
+
+
+def db_pool_stats(_args):
+    engine = db.get_engine()
+    for key, value in pool_stats(engine).items():
+        print(f"{key}: {value}")
+    metrics = getattr(engine.pool, "metrics", {})
+    if metrics.get("checkouts"):
+        # cli shell and cli batch: the commands run so far in this process
+        print_pool_counters("this process", metrics)
+    path = instrument.stats_path(settings)
+    recorded = instrument.load_stats(path).get("pool", {})
+    processes = recorded.pop("processes", 0)
+    if not processes:
+        print(f"\nNo pool counters recorded in {path}; run with DB_INSTRUMENT=1")
+        return
+    print_pool_counters(f"{processes} processes recorded in {path}", recorded)
+
+
+def db_replicas(_args):
+    replicas = db.get_replicas()
+    if replicas is None:
+        print("No replicas configured; reads use the primary (DATABASE_REPLICA_URLS)")
+        return
+    for url, healthy in replicas.status():
+        shown = make_url(url).render_as_string(hide_password=True)
+        print(f"{shown}: {'healthy' if healthy else 'unavailable'}")
+
+
+def db_stats(args):
+    path = instrument.stats_path(settings)
+    if args.reset:
+        instrument.reset_stats(path)
+        print(f"Removed {path}")
+        return
+    stats = instrument.load_stats(path)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    if not stats["callers"]:
+        print(f"No statements recorded in {path}; run with DB_INSTRUMENT=1")
+        return
+    for line in instrument.report(stats, top=args.top):
+        print(line)
+
+
+def run_commands(lines, commit_every):
+    """Run CLI commands from ``lines`` over one connection.
+
+    Every command runs in a savepoint, so a failing command only undoes
+    itself; the enclosing transaction is committed every ``commit_every``
+    commands (0: once at the end). Besides CLI commands, ``commit`` and
+    ``rollback`` end the current transaction and ``quit`` stops reading.
+    Returns ``(ran, failed)``.
+    """
+    parser = build_parser()
+    db.enable_sqlite_savepoints(db.engine)
+    ran = failed = pending = 0
+    with db.engine.connect() as conn:
+        trans = conn.begin()
+        SessionLocal.configure(bind=conn, join_transaction_mode="create_savepoint")
+        # reads see the batch's uncommitted writes, so no replicas here
+        ReadSessionLocal.configure(bind=conn)
+        try:
+            for number, line in enumerate(lines, start=1):
+                try:
+                    argv = shlex.split(line, comments=True)
+                except ValueError as e:
+                    argv = None
+                    failed += 1
+                    print(f"line {number}: {e}", file=sys.stderr)
+                if not argv:
+                    continue
+                if argv[0] in ("quit", "exit"):
+                    break
+                if argv[0] in ("commit", "rollback"):
+                    if argv[0] == "commit":
+                        trans.commit()
+                    else:
+                        trans.rollback()
+                    trans = conn.begin()
+                    pending = 0
+                    continue
+                ran += 1
+                try:
+                    if argv[0] in ("shell", "batch"):
+                        sys.exit(f"{argv[0]} cannot be nested")
+                    args = parser.parse_args(argv)
+                    args.func(args)
+                except SystemExit as e:
+                    # sys.exit() in a handler, or an argparse error
+                    if e.code:
+                        failed += 1
+                        if isinstance(e.code, str):
+                            print(f"line {number}: {e.code}", file=sys.stderr)
+                except Exception as e:
+                    failed += 1
+                    print(f"line {number}: {type(e).__name__}: {e}", file=sys.stderr)
+                pending += 1
+                if commit_every and pending >= commit_every:
+                    trans.commit()
+                    trans = conn.begin()
+                    pending = 0
+            trans.commit()
+        except BaseException:
+            trans.rollback()
+            raise
+        finally:
+            SessionLocal.configure(
+                bind=db.engine, join_transaction_mode="conditional_savepoint"
+            )
+            ReadSessionLocal.configure(bind=None)
+    return ran, failed
+
+
+def prompt_lines(prompt="cli> "):
+    while True:
+        try:
+            yield input(prompt)
+        except EOFError:
+            print()
+            return
+
+
+def cli_shell(args):
+    try:
+        import readline  # noqa: F401 - line editing and history for input()
+    except ImportError:
+        pass
+    print("Commands as for cli, plus commit, rollback and quit.")
+    run_commands(prompt_lines(), args.commit_every)
+
+
+def cli_batch(args):
+    with importer.open_input(args.file) as f:
+        ran, failed = run_commands(f, args.commit_every)
+    print(f"Ran {ran} commands, {failed} failed", file=sys.stderr)
+    if failed:
+        sys.exit(1)
@@ -1,12 +1,430 @@
+import configparser
 import os
+import threading
+import time
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///db.sqlite3")
+DEFAULT_DATABASE_URL = "sqlite:///db.sqlite3"
 
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(bind=engine)
+# setting name -> environment variable; the same names (lower case, without
+# prefix) are read from the [database] section of $DATABASE_CONFIG, and the
+# environment wins over the file
+SETTINGS = {
+    "url": "DATABASE_URL",
+    "replica_urls": "DATABASE_REPLICA_URLS",
+    "replica_check_s": "DB_REPLICA_CHECK_S",
+    "replica_lag_s": "DB_REPLICA_LAG_S",
+    "async_url": "DATABASE_ASYNC_URL",
+    "echo": "DB_ECHO",
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS",
+    "sqlite_journal_mode": "SQLITE_JOURNAL_MODE",
+    "sqlite_synchronous": "SQLITE_SYNCHRONOUS",
+    "sqlite_mmap_size": "SQLITE_MMAP_SIZE",
+    "sqlite_cache_size": "SQLITE_CACHE_SIZE",
+    "sqlite_busy_timeout": "SQLITE_BUSY_TIMEOUT",
+    "pg_executemany_mode": "PG_EXECUTEMANY_MODE",
+    "pg_prepare_threshold": "PG_PREPARE_THRESHOLD",
+    "instrument": "DB_INSTRUMENT",
+    "instrument_stats_path": "DB_STATS_PATH",
+    "slow_query_ms": "DB_SLOW_QUERY_MS",
+    "slow_query_log": "DB_SLOW_QUERY_LOG",
+    "n_plus_one_threshold": "DB_N_PLUS_ONE_THRESHOLD",
+}
+
+SQLITE_PRAGMAS = {
+    "sqlite_journal_mode": "journal_mode",
+    "sqlite_synchronous": "synchronous",
+    "sqlite_mmap_size": "mmap_size",
+    "sqlite_cache_size": "cache_size",
+}
+
+
+def load_settings(environ=os.environ):
+    settings = {}
+    if path := environ.get("DATABASE_CONFIG"):
+        parser = configparser.ConfigParser()
+        if not parser.read(path):
+            raise FileNotFoundError(f"DATABASE_CONFIG file not found: {path}")
+        if parser.has_section("database"):
+            settings.update(
+                (k, v) for k, v in parser.items("database") if k in SETTINGS
+            )
+    for key, env in SETTINGS.items():
+        if env in environ:
+            settings[key] = environ[env]
+    settings.setdefault("url", DEFAULT_DATABASE_URL)
+    return settings
+
+
+def _bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+class MeteredQueuePool(QueuePool):
+    """``QueuePool`` that also records checkout counts and wait times."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.metrics = self._new_metrics()
+
+    @staticmethod
+    def _new_metrics():
+        return {
+            "connects": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "timeouts": 0,
+            "max_overflow_seen": 0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0,
+        }
+
+    def take_metrics(self):
+        """Return the counters so far and start new ones; the
+        instrumentation merges them into its stats file at exit."""
+        with self._metrics_lock:
+            metrics, self.metrics = self.metrics, self._new_metrics()
+        return metrics
+
+    def _count(self, key):
+        with self._metrics_lock:
+            self.metrics[key] += 1
+
+    def _create_connection(self):
+        self._count("connects")
+        return super()._create_connection()
+
+    def _do_return_conn(self, record):
+        self._count("checkins")
+        return super()._do_return_conn(record)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self._count("timeouts")
+            raise
+        finally:
+            waited = (time.perf_counter() - started) * 1000
+            with self._metrics_lock:
+                self.metrics["wait_total_ms"] += waited
+                if waited > self.metrics["wait_max_ms"]:
+                    self.metrics["wait_max_ms"] = waited
+        with self._metrics_lock:
+            self.metrics["checkouts"] += 1
+            self.metrics["max_overflow_seen"] = max(
+                self.metrics["max_overflow_seen"], self.overflow()
+            )
+        return record
+
+
+def engine_options(settings):
+    url = make_url(settings["url"])
+    options = {"echo": _bool(settings.get("echo", False))}
+    connect_args = {}
+    in_memory = url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+    if not in_memory:
+        options["poolclass"] = MeteredQueuePool
+        for key in ("pool_size", "max_overflow", "pool_timeout", "pool_recycle"):
+            if key in settings:
+                options[key] = int(settings[key])
+    if "pool_pre_ping" in settings:
+        options["pool_pre_ping"] = _bool(settings["pool_pre_ping"])
+
+    if url.get_backend_name() == "sqlite":
+        if "sqlite_busy_timeout" in settings:
+            connect_args["timeout"] = float(settings["sqlite_busy_timeout"])
+    elif url.get_backend_name() == "postgresql":
+        if "statement_timeout_ms" in settings:
+            connect_args["options"] = (
+                f"-c statement_timeout={int(settings['statement_timeout_ms'])}"
+            )
+        driver = url.get_driver_name()
+        if "pg_executemany_mode" in settings and driver == "psycopg2":
+            options["executemany_mode"] = settings["pg_executemany_mode"]
+        # server-side prepared statements: psycopg 3 prepares a query once
+        # it ran this many times on a connection (0: always, "none": never);
+        # psycopg2 cannot prepare, asyncpg always does
+        if "pg_prepare_threshold" in settings and driver == "psycopg":
+            threshold = settings["pg_prepare_threshold"]
+            connect_args["prepare_threshold"] = (
+                None if str(threshold).lower() == "none" else int(threshold)
+            )
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def install_pragmas(engine, settings):
+    pragmas = [
+        (pragma, settings[key])
+        for key, pragma in SQLITE_PRAGMAS.items()
+        if key in settings
+    ]
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+    for pragma, value in pragmas:
+        if not str(value).lstrip("-").isalnum():
+            raise ValueError(f"Invalid value for PRAGMA {pragma}: {value}")
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+
+def _disable_driver_transactions(dbapi_connection, _record):
+    dbapi_connection.isolation_level = None
+
+
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+def enable_sqlite_savepoints(engine):
+    """Let SQLAlchemy, not pysqlite, emit BEGIN so SAVEPOINT works.
+
+    The pysqlite driver starts and commits transactions on its own, which
+    breaks nested transactions; this is the recipe from the SQLAlchemy
+    SQLite dialect documentation. Installed once per engine.
+    """
+    if engine.dialect.name != "sqlite" or event.contains(engine, "begin", _begin):
+        return
+    event.listen(engine, "connect", _disable_driver_transactions)
+    event.listen(engine, "begin", _begin)
+    # pooled connections were opened without the listener
+    engine.dispose()
+
+
+def configure_engine(settings):
+    engine = create_engine(settings["url"], **engine_options(settings))
+    install_pragmas(engine, settings)
+    if _bool(settings.get("instrument", False)):
+        from app import instrument
+
+        instrument.install(engine, settings)
+    return engine
+
+
+def pool_stats(engine):
+    """Configuration and current state of ``engine``'s pool."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
+
+
+class LazySessionmaker(sessionmaker):
+    """``sessionmaker`` that creates the default engine on the first session
+    unless a bind was configured."""
+
+    def __call__(self, **local_kw):
+        if "bind" not in local_kw and self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+settings = load_settings()
+DATABASE_URL = settings["url"]
+
+# created by get_engine() on first use, so that commands which never touch
+# the database (``--help``, argument errors) skip connecting and dialect setup
+_engine = None
+_engine_lock = threading.Lock()
+SessionLocal = LazySessionmaker()
+
+
+def get_engine():
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                use_engine(configure_engine(settings))
+    return _engine
+
+
+def use_engine(new_engine):
+    """Point ``engine`` and ``SessionLocal`` at another database."""
+    global _engine
+    _engine = new_engine
+    SessionLocal.configure(bind=new_engine)
+
+
+class ReplicaSet:
+    """Read replicas used in turn, skipping those that fail a health check.
+
+    A replica is checked with ``SELECT 1`` when first used and again once
+    its last result is ``check_s`` seconds old, so a failed replica is left
+    out until a later check succeeds; ``fail`` marks one failed between
+    checks. Engines are created on first use.
+    """
+
+    def __init__(self, urls, settings, check_s=30.0):
+        self.urls = list(urls)
+        self.settings = settings
+        self.check_s = check_s
+        self._engines = {}
+        self._health = {}  # url -> (healthy, checked at)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def engine(self, url):
+        with self._lock:
+            if url not in self._engines:
+                self._engines[url] = configure_engine({**self.settings, "url": url})
+            return self._engines[url]
+
+    def check(self, url):
+        parsed = make_url(url)
+        if parsed.get_backend_name() == "sqlite" and parsed.database not in (
+            None,
+            "",
+            ":memory:",
+        ):
+            # connecting would create an empty database file
+            if not os.path.exists(parsed.database):
+                return False
+        try:
+            with self.engine(url).connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+        except exc.DBAPIError:
+            return False
+        return True
+
+    def healthy(self, url):
+        healthy, checked = self._health.get(url, (None, 0.0))
+        now = time.monotonic()
+        if healthy is None or now - checked >= self.check_s:
+            healthy = self.check(url)
+            self._health[url] = (healthy, now)
+        return healthy
+
+    def fail(self, engine):
+        """Leave the replica of ``engine`` out until its next check; False if
+        ``engine`` is not one of the replicas."""
+        with self._lock:
+            for url, replica in self._engines.items():
+                if replica is engine:
+                    self._health[url] = (False, time.monotonic())
+                    return True
+        return False
+
+    def pick(self):
+        """The engine of the next healthy replica, or None if none is."""
+        for _ in self.urls:
+            with self._lock:
+                url = self.urls[self._next % len(self.urls)]
+                self._next += 1
+            if self.healthy(url):
+                return self.engine(url)
+        return None
+
+    def status(self):
+        """``(url, healthy)`` for every replica, checking them now."""
+        return [(url, self.check(url)) for url in self.urls]
+
+
+def replica_urls(settings):
+    return settings.get("replica_urls", "").replace(",", " ").split()
+
+
+_replicas = None
+
+
+def get_replicas():
+    """The ``ReplicaSet`` of ``DATABASE_REPLICA_URLS``, None without any."""
+    global _replicas
+    if _replicas is None:
+        urls = replica_urls(settings)
+        if not urls:
+            return None
+        with _engine_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet(
+                    urls, settings, float(settings.get("replica_check_s", 30))
+                )
+    return _replicas
+
+
+def read_engine():
+    """Engine for read-only work: a healthy replica, else the primary."""
+    replicas = get_replicas()
+    engine = replicas.pick() if replicas is not None else None
+    return engine or get_engine()
+
+
+class ReadSession(Session):
+    """Session for reads that falls back to the primary when its replica
+    fails: on a connection error the replica is marked failed and the
+    statement runs again on the primary. Errors while iterating a streamed
+    result are not retried."""
+
+    def _fail_over(self, method, *args, **kw):
+        try:
+            return method(*args, **kw)
+        except exc.DBAPIError as e:
+            if not (isinstance(e, exc.OperationalError) or e.connection_invalidated):
+                raise
+            replicas = get_replicas()
+            if replicas is None or not replicas.fail(self.bind):
+                raise
+            self.rollback()
+            self.bind = get_engine()
+            return method(*args, **kw)
+
+    def execute(self, *args, **kw):
+        return self._fail_over(super().execute, *args, **kw)
+
+    def scalar(self, *args, **kw):
+        return self._fail_over(super().scalar, *args, **kw)
+
+    def scalars(self, *args, **kw):
+        return self._fail_over(super().scalars, *args, **kw)
+
+
+class ReadSessionmaker(sessionmaker):
+    """``sessionmaker`` that binds each new session to ``read_engine()``
+    unless a bind was configured."""
+
+    def __call__(self, **local_kw):
+        if "bind" not in local_kw and self.kw.get("bind") is None:
+            local_kw["bind"] = read_engine()
+        return super().__call__(**local_kw)
+
+
+# sessions for reports, lists and exports; writes always use SessionLocal
+ReadSessionLocal = ReadSessionmaker(class_=ReadSession)
+
+
+def __getattr__(name):
+    # ``db.engine`` keeps working and creates the engine when first read
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Base(DeclarativeBase):
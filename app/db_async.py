@@ -0,0 +1,42 @@
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db import engine_options, install_pragmas, settings
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_url(settings):
+    """``DATABASE_ASYNC_URL``, or ``DATABASE_URL`` with its async driver."""
+    if "async_url" in settings:
+        return make_url(settings["async_url"])
+    url = make_url(settings["url"])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def async_engine_options(settings, url):
+    options = engine_options({**settings, "url": url})
+    # the async engine brings its own adapted pool class
+    options.pop("poolclass", None)
+    options.pop("executemany_mode", None)
+    if url.get_driver_name() == "asyncpg" and "statement_timeout_ms" in settings:
+        options["connect_args"] = {
+            "server_settings": {
+                "statement_timeout": str(int(settings["statement_timeout_ms"]))
+            }
+        }
+    return options
+
+
+def configure_async_engine(settings):
+    url = async_url(settings)
+    engine = create_async_engine(url, **async_engine_options(settings, url))
+    install_pragmas(engine.sync_engine, settings)
+    return engine
+
+
+async_engine = configure_async_engine(settings)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine)
@@ -0,0 +1,176 @@
+import array
+import csv
+import json
+import struct
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+FORMATS = ("ndjson", "csv", "columnar")
+OUTPUT_BUFFER = 1 << 20
+
+# columnar layout, all integers little-endian:
+#   MAGIC, u32 header length, JSON header {"table", "columns": [{name, type}]}
+#   blocks: u32 row count, then per column u32 byte length + payload
+#   terminated by a block with a row count of 0
+# payloads: int32 -> int32 array, timestamp_us -> int64 microseconds since
+# the epoch, utf8 -> int32 offsets (rows + 1) followed by the utf-8 bytes
+MAGIC = b"GRCOL1\n"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def json_default(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def write_ndjson(out, columns, batches):
+    names = [c.name for c in columns]
+    dumps = json.JSONEncoder(default=json_default, ensure_ascii=False).encode
+    for batch in batches:
+        out.write("".join(dumps(dict(zip(names, row))) + "\n" for row in batch))
+
+
+def write_csv(out, columns, batches):
+    writer = csv.writer(out)
+    writer.writerow([c.name for c in columns])
+    for batch in batches:
+        writer.writerows(batch)
+
+
+# by python_type, so that importing this module (for FORMATS in the cli
+# parser) does not import SQLAlchemy
+COLUMN_TYPES = {int: "int32", datetime: "timestamp_us", str: "utf8"}
+
+
+def column_type(column):
+    try:
+        return COLUMN_TYPES[column.type.python_type]
+    except (KeyError, NotImplementedError):
+        raise ValueError(
+            f"Unsupported column type for {column}: {column.type}"
+        ) from None
+
+
+def _little_endian(arr):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def encode_column(kind, values):
+    if kind == "int32":
+        return _little_endian(array.array("i", values))
+    if kind == "timestamp_us":
+        micros = ((v - EPOCH) // MICROSECOND for v in values)
+        return _little_endian(array.array("q", micros))
+    encoded = [v.encode() for v in values]
+    offsets = array.array("i", [0])
+    pos = 0
+    for item in encoded:
+        pos += len(item)
+        offsets.append(pos)
+    return _little_endian(offsets) + b"".join(encoded)
+
+
+def decode_column(kind, payload, rows):
+    if kind == "int32":
+        arr = array.array("i")
+        arr.frombytes(payload)
+    elif kind == "timestamp_us":
+        arr = array.array("q")
+        arr.frombytes(payload)
+    else:
+        arr = array.array("i")
+        arr.frombytes(payload[: (rows + 1) * arr.itemsize])
+    if sys.byteorder == "big":
+        arr.byteswap()
+    if kind == "int32":
+        return arr.tolist()
+    if kind == "timestamp_us":
+        return [EPOCH + v * MICROSECOND for v in arr]
+    data = payload[(rows + 1) * arr.itemsize :]
+    return [data[arr[i] : arr[i + 1]].decode() for i in range(rows)]
+
+
+def write_columnar(out, columns, batches, table_name=""):
+    kinds = [column_type(c) for c in columns]
+    header = json.dumps(
+        {
+            "table": table_name,
+            "columns": [{"name": c.name, "type": k} for c, k in zip(columns, kinds)],
+        }
+    ).encode()
+    out.write(MAGIC + struct.pack("<I", len(header)) + header)
+    for batch in batches:
+        if not batch:
+            continue
+        out.write(struct.pack("<I", len(batch)))
+        for i, kind in enumerate(kinds):
+            payload = encode_column(kind, [row[i] for row in batch])
+            out.write(struct.pack("<I", len(payload)))
+            out.write(payload)
+    out.write(struct.pack("<I", 0))
+
+
+def read_columnar(fp):
+    """Yield ``(header, {column: values})`` for every block of a columnar file."""
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar export")
+    (size,) = struct.unpack("<I", fp.read(4))
+    header = json.loads(fp.read(size))
+    while True:
+        (rows,) = struct.unpack("<I", fp.read(4))
+        if rows == 0:
+            return
+        block = {}
+        for column in header["columns"]:
+            (size,) = struct.unpack("<I", fp.read(4))
+            block[column["name"]] = decode_column(column["type"], fp.read(size), rows)
+        yield header, block
+
+
+@contextmanager
+def open_output(path, binary):
+    if path in (None, "-"):
+        out = sys.stdout.buffer if binary else sys.stdout
+        try:
+            yield out
+        finally:
+            out.flush()
+        return
+    if binary:
+        f = open(path, "wb", buffering=OUTPUT_BUFFER)
+    else:
+        f = open(path, "w", buffering=OUTPUT_BUFFER, encoding="utf-8", newline="")
+    with f:
+        yield f
+
+
+def export_rows(result, table, fmt, path, batch_size):
+    """Write a column-select ``result`` over ``table`` to ``path`` in ``fmt``.
+
+    Rows are consumed from the cursor ``batch_size`` at a time and written
+    as whole batches; returns the number of rows written.
+    """
+    columns = list(table.columns)
+    count = 0
+
+    def batches():
+        nonlocal count
+        for batch in result.partitions(batch_size):
+            count += len(batch)
+            yield batch
+
+    with open_output(path, binary=fmt == "columnar") as out:
+        if fmt == "ndjson":
+            write_ndjson(out, columns, batches())
+        elif fmt == "csv":
+            write_csv(out, columns, batches())
+        elif fmt == "columnar":
+            write_columnar(out, columns, batches(), table.name)
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+    return count
@@ -0,0 +1,178 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import cache, stats
+from app.models import Student, Subject, Grade
+
+
+class Rejected(ValueError):
+    pass
+
+
+@contextmanager
+def open_input(path):
+    if path == "-":
+        yield sys.stdin
+        return
+    with open(path, encoding="utf-8", newline="") as f:
+        yield f
+
+
+def read_records(f, fmt):
+    """Yield ``(line_number, record)`` pairs; unparsable lines become ``None``."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def _int(record, key):
+    try:
+        value = record[key]
+    except KeyError:
+        raise Rejected(f"missing {key}")
+    # int() would truncate 50.7 to 50 and accept True as 1
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, str)) and not isinstance(value, bool):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise Rejected(f"{key} is not an integer: {value!r}")
+
+
+def _timestamp(value):
+    """Naive UTC ``datetime`` from an ISO string, as ``created_at`` stores;
+    offsets are converted to UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate(record, student_ids, subject_ids, now):
+    if not isinstance(record, dict):
+        raise Rejected("unparsable record")
+    row = {
+        "student_id": _int(record, "student_id"),
+        "subject_id": _int(record, "subject_id"),
+        "value": _int(record, "value"),
+        "created_at": now,
+    }
+    if not 1 <= row["value"] <= 100:
+        raise Rejected(f"value out of range 1..100: {row['value']}")
+    if row["student_id"] not in student_ids:
+        raise Rejected(f"unknown student_id {row['student_id']}")
+    if row["subject_id"] not in subject_ids:
+        raise Rejected(f"unknown subject_id {row['subject_id']}")
+    if record.get("created_at"):
+        try:
+            row["created_at"] = _timestamp(record["created_at"])
+        except (TypeError, ValueError):
+            raise Rejected(f"invalid created_at: {record['created_at']!r}")
+    return row
+
+
+def insert_grades(session, rows):
+    sums = Counter()
+    counts = Counter()
+    for row in rows:
+        sums[(row["student_id"], row["subject_id"])] += row["value"]
+        counts[(row["student_id"], row["subject_id"])] += 1
+    session.execute(insert(Grade.__table__), rows)
+    stats.apply(session, sums, counts)
+    return cache.grade_tags(session, counts)
+
+
+def import_grades(session_factory, f, fmt, batch_size, reject):
+    """Validate and insert grades from ``f``, one transaction per batch.
+
+    ``reject(line, reason, record)`` is called for every row that is not
+    imported. Returns ``(imported, rejected)`` counts.
+    """
+    with session_factory() as s:
+        student_ids = set(s.scalars(select(Student.id)))
+        subject_ids = set(s.scalars(select(Subject.id)))
+    now = datetime.utcnow()
+    imported = rejected = 0
+
+    def flush(batch):
+        nonlocal imported, rejected
+        rows = [row for _, row in batch]
+        try:
+            with session_factory.begin() as s:
+                tags = insert_grades(s, rows)
+            cache.invalidate(*tags)
+            imported += len(rows)
+            return
+        except IntegrityError:
+            pass
+        # a constraint the in-memory checks missed: retry row by row so
+        # only the offending rows are rejected
+        for line, row in batch:
+            try:
+                with session_factory.begin() as s:
+                    tags = insert_grades(s, [row])
+                cache.invalidate(*tags)
+                imported += 1
+            except IntegrityError as e:
+                rejected += 1
+                reject(line, f"integrity error: {e.orig}", row)
+
+    batch = []
+    for line, record in read_records(f, fmt):
+        try:
+            batch.append((line, validate(record, student_ids, subject_ids, now)))
+        except Rejected as e:
+            rejected += 1
+            reject(line, str(e), record)
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return imported, rejected
+
+
+def run_import(session_factory, path, fmt, batch_size, rejects_path):
+    if fmt is None:
+        fmt = "csv" if path.endswith(".csv") else "ndjson"
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+
+    def reject(line, reason, record):
+        entry = {"line": line, "reason": reason, "record": record}
+        print(json.dumps(entry, default=str), file=rejects or sys.stderr)
+
+    started = time.perf_counter()
+    try:
+        with open_input(path) as f:
+            imported, rejected = import_grades(
+                session_factory, f, fmt, batch_size, reject
+            )
+    finally:
+        if rejects:
+            rejects.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Imported {imported} grades, rejected {rejected} "
+        f"in {elapsed:.2f}s ({imported / elapsed if elapsed else 0:,.0f} rows/s)"
+    )
+    return imported, rejected
@@ -0,0 +1,391 @@
+"""Opt-in statement instrumentation for the SQLAlchemy engine.
+
+Enabled with ``DB_INSTRUMENT=1`` (or ``instrument = 1`` in the [database]
+section of $DATABASE_CONFIG). Every statement is timed and attributed to
+the ``app`` function that issued it; statements slower than
+``DB_SLOW_QUERY_MS`` are written to the slow-query log, and sessions that
+repeat the same statement ``DB_N_PLUS_ONE_THRESHOLD`` times are reported as
+possible N+1 patterns. Aggregates are merged into ``DB_STATS_PATH`` when
+the process exits and are shown by ``cli db stats``; the connection pool
+counters of the process are merged there too, for ``cli db pool-stats``.
+"""
+
+import atexit
+import fcntl
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DEFAULT_STATS_PATH = ".db_stats.json"
+DEFAULT_SLOW_QUERY_MS = 100.0
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+# upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# upper bounds of the statements-per-session histogram buckets
+SESSION_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+# modules whose frames are never reported as the calling function
+SKIP_MODULES = ("app.instrument", "app.db", "app.db_async", "app.cache")
+
+SESSION_KEY = "instrument.session"
+MAX_NPLUSONE = 100
+# distinct statements kept in the stats; any further ones share one entry
+MAX_STATEMENTS = 500
+OTHER_STATEMENTS = "<other statements>"
+# pool counters merged by taking the maximum; all others are summed
+POOL_MAXIMA = ("max_overflow_seen", "wait_max_ms")
+
+slow_log = logging.getLogger("app.sql.slow")
+
+# a bound parameter in any DBAPI paramstyle, with an optional ::type cast
+PARAMETER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)(?:::\w+)?"
+IN_LIST = re.compile(rf"\bIN \({PARAMETER}(?:, {PARAMETER})*\)", re.IGNORECASE)
+
+
+def bucket(value, bounds):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds)
+
+
+def new_entry():
+    return {
+        "count": 0,
+        "total_ms": 0.0,
+        "max_ms": 0.0,
+        "rows": 0,
+        "histogram": [0] * (len(BUCKETS_MS) + 1),
+    }
+
+
+def add_entry(entry, elapsed_ms, rows):
+    entry["count"] += 1
+    entry["total_ms"] += elapsed_ms
+    entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+    entry["rows"] += rows
+    entry["histogram"][bucket(elapsed_ms, BUCKETS_MS)] += 1
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_shape(statement):
+    """``statement`` with the parameters of every ``IN (...)`` list collapsed:
+    an expanding IN parameter renders one placeholder per value, and lists of
+    every length are the same statement."""
+    return IN_LIST.sub("IN (...)", statement)
+
+
+def statement_entry(statements, statement):
+    """The entry of ``statement`` in ``statements``, past ``MAX_STATEMENTS``
+    distinct ones the shared ``OTHER_STATEMENTS`` entry."""
+    entry = statements.get(statement)
+    if entry is None:
+        if len(statements) >= MAX_STATEMENTS:
+            statement = OTHER_STATEMENTS
+        entry = statements.setdefault(statement, new_entry())
+    return entry
+
+
+def merge_entry(into, entry):
+    into["count"] += entry["count"]
+    into["total_ms"] += entry["total_ms"]
+    into["max_ms"] = max(into["max_ms"], entry["max_ms"])
+    into["rows"] += entry["rows"]
+    into["histogram"] = [a + b for a, b in zip(into["histogram"], entry["histogram"])]
+
+
+def empty_stats():
+    return {
+        "callers": {},
+        "statements": {},
+        "sessions": {
+            "count": 0,
+            "statements": 0,
+            "histogram": [0] * (len(SESSION_BUCKETS) + 1),
+        },
+        "slow_queries": 0,
+        "n_plus_one": [],
+        "pool": {"processes": 0},
+    }
+
+
+def merge_pool(into, metrics):
+    for key, value in metrics.items():
+        if key in POOL_MAXIMA:
+            into[key] = max(into.get(key, 0), value)
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def merge_stats(into, stats):
+    for key, entry in stats["callers"].items():
+        merge_entry(into["callers"].setdefault(key, new_entry()), entry)
+    # files written before statements were normalized have one key per length
+    # of every IN list
+    for statement, entry in stats["statements"].items():
+        shape = statement_shape(statement)
+        merge_entry(statement_entry(into["statements"], shape), entry)
+    into["sessions"]["count"] += stats["sessions"]["count"]
+    into["sessions"]["statements"] += stats["sessions"]["statements"]
+    into["sessions"]["histogram"] = [
+        a + b
+        for a, b in zip(into["sessions"]["histogram"], stats["sessions"]["histogram"])
+    ]
+    into["slow_queries"] += stats["slow_queries"]
+    into["n_plus_one"] = (into["n_plus_one"] + stats["n_plus_one"])[-MAX_NPLUSONE:]
+    # stats files written before pool counters were recorded have none
+    merge_pool(into.setdefault("pool", {"processes": 0}), stats.get("pool", {}))
+    return into
+
+
+def load_stats(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return empty_stats()
+
+
+def calling_function():
+    """Name of the innermost ``app`` function outside the database plumbing."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module == "__main__" and frame.f_globals.get("__spec__") is not None:
+            # python -m app.cli
+            module = frame.f_globals["__spec__"].name
+        if module.startswith("app.") and module not in SKIP_MODULES:
+            return f"{module[4:]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<external>"
+
+
+class Instrumentation:
+    def __init__(self, stats_path, slow_query_ms, n_plus_one_threshold):
+        self.stats_path = stats_path
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.stats = empty_stats()
+        self._lock = threading.Lock()
+        # Connection -> state of the session it is bound to; not kept in
+        # ``conn.info``, which outlives the checkout
+        self._sessions = weakref.WeakKeyDictionary()
+        # engines whose pool counters are merged by flush()
+        self._engines = weakref.WeakSet()
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("instrument.started", []).append(time.perf_counter())
+
+    def after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = conn.info["instrument.started"].pop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # DML reports affected rows; most drivers report -1 for SELECT
+        rows = max(cursor.rowcount, 0)
+        caller = calling_function()
+        shape = statement_shape(statement)
+        with self._lock:
+            add_entry(
+                self.stats["callers"].setdefault(caller, new_entry()), elapsed_ms, rows
+            )
+            statements = self.stats["statements"]
+            add_entry(statement_entry(statements, shape), elapsed_ms, rows)
+            if elapsed_ms >= self.slow_query_ms:
+                self.stats["slow_queries"] += 1
+        session = self._sessions.get(conn)
+        if session is not None:
+            session["statements"] += 1
+            session["shapes"][shape] += 1
+            session["callers"].setdefault(shape, caller)
+        if elapsed_ms >= self.slow_query_ms:
+            slow_log.warning(
+                json.dumps(
+                    {
+                        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "ms": round(elapsed_ms, 3),
+                        "caller": caller,
+                        "rows": rows,
+                        "statement": statement,
+                        "parameters": repr(parameters)[:500],
+                    }
+                )
+            )
+
+    def after_begin(self, session, transaction, connection):
+        state = session.info.get(SESSION_KEY)
+        if state is None:
+            state = session.info[SESSION_KEY] = {
+                "statements": 0,
+                "shapes": Counter(),
+                "callers": {},
+                "connections": [],
+            }
+        self._sessions[connection] = state
+        state["connections"].append(connection)
+
+    def after_transaction_end(self, session, transaction):
+        if transaction.parent is not None:
+            return
+        state = session.info.pop(SESSION_KEY, None)
+        if state is None:
+            return
+        for connection in state["connections"]:
+            self._sessions.pop(connection, None)
+        with self._lock:
+            sessions = self.stats["sessions"]
+            sessions["count"] += 1
+            sessions["statements"] += state["statements"]
+            sessions["histogram"][bucket(state["statements"], SESSION_BUCKETS)] += 1
+            for statement, count in state["shapes"].items():
+                if count >= self.n_plus_one_threshold:
+                    self.stats["n_plus_one"].append(
+                        {
+                            "caller": state["callers"][statement],
+                            "count": count,
+                            "statement": statement,
+                        }
+                    )
+            del self.stats["n_plus_one"][:-MAX_NPLUSONE]
+
+    def flush(self):
+        """Merge this process's aggregates into the stats file."""
+        with self._lock:
+            stats, self.stats = self.stats, empty_stats()
+        for engine in list(self._engines):
+            take_metrics = getattr(engine.pool, "take_metrics", None)
+            if take_metrics is not None:
+                merge_pool(stats["pool"], take_metrics())
+        if stats["pool"].get("checkouts"):
+            stats["pool"]["processes"] = 1
+        if not stats["callers"] and not stats["sessions"]["count"]:
+            return
+        with stats_lock(self.stats_path):
+            merged = merge_stats(load_stats(self.stats_path), stats)
+            tmp = f"{self.stats_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp, self.stats_path)
+
+
+@contextmanager
+def stats_lock(path):
+    """Hold an exclusive lock on ``path``'s ``.lock`` sidecar file, so
+    processes exiting together merge into the stats file one at a time."""
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def reset_stats(path):
+    """Remove the stats file; returns whether there was one."""
+    with stats_lock(path):
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+
+_instrumentation = None
+
+
+def stats_path(settings):
+    return settings.get("instrument_stats_path", DEFAULT_STATS_PATH)
+
+
+def install(engine, settings):
+    """Attach the instrumentation to ``engine`` and to every ORM session."""
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation(
+            stats_path(settings),
+            float(settings.get("slow_query_ms", DEFAULT_SLOW_QUERY_MS)),
+            int(settings.get("n_plus_one_threshold", DEFAULT_N_PLUS_ONE_THRESHOLD)),
+        )
+        if path := settings.get("slow_query_log"):
+            handler = logging.FileHandler(path, encoding="utf-8")
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        slow_log.addHandler(handler)
+        slow_log.propagate = False
+        event.listen(Session, "after_begin", _instrumentation.after_begin)
+        event.listen(
+            Session, "after_transaction_end", _instrumentation.after_transaction_end
+        )
+        atexit.register(_instrumentation.flush)
+    _instrumentation._engines.add(engine)
+    event.listen(
+        engine, "before_cursor_execute", _instrumentation.before_cursor_execute
+    )
+    event.listen(engine, "after_cursor_execute", _instrumentation.after_cursor_execute)
+    return _instrumentation
+
+
+def format_histogram(histogram, bounds, unit=""):
+    labels = [f"<={b:g}{unit}" for b in bounds] + [f">{bounds[-1]:g}{unit}"]
+    top = max(histogram) or 1
+    for label, count in zip(labels, histogram):
+        if count:
+            yield f"  {label:>9} {count:>8} {'#' * max(1, round(count / top * 40))}"
+
+
+def report(stats, top=10):
+    """Yield the lines printed by ``cli db stats``."""
+    callers = sorted(
+        stats["callers"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True
+    )
+    yield f"{'caller':<32} {'calls':>8} {'total ms':>11} {'avg ms':>9} {'max ms':>9}"
+    for caller, entry in callers[:top]:
+        yield (
+            f"{caller:<32} {entry['count']:>8} {entry['total_ms']:>11.1f} "
+            f"{entry['total_ms'] / entry['count']:>9.2f} {entry['max_ms']:>9.2f}"
+        )
+    total = new_entry()
+    for entry in stats["callers"].values():
+        merge_entry(total, entry)
+    yield ""
+    yield f"latency ({total['count']} statements, {stats['slow_queries']} slow):"
+    yield from format_histogram(total["histogram"], BUCKETS_MS, "ms")
+
+    statements = sorted(
+        stats["statements"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True
+    )
+    yield ""
+    yield f"top {min(top, len(statements))} statements by total time:"
+    for statement, entry in statements[:top]:
+        text = " ".join(statement.split())
+        yield (
+            f"  {entry['total_ms']:>9.1f} ms {entry['count']:>7}x  "
+            f"{text[:100]}{'...' if len(text) > 100 else ''}"
+        )
+
+    sessions = stats["sessions"]
+    yield ""
+    yield f"statements per session ({sessions['count']} sessions):"
+    yield from format_histogram(sessions["histogram"], SESSION_BUCKETS)
+
+    if stats["n_plus_one"]:
+        yield ""
+        yield "possible N+1 patterns:"
+        for item in stats["n_plus_one"][-top:]:
+            text = " ".join(item["statement"].split())
+            yield f"  {item['caller']}: {item['count']}x {text[:80]}"
@@ -0,0 +1,52 @@
+"""Students ranked by average grade.
+
+``student_stats`` (overall) and ``grade_stats`` (per subject) hold running
+totals and averages, kept by ``app.stats`` on every grade write, with an
+index on the average: ``top`` reads the first index entries, ``rank``
+counts the entries ahead of a student, so neither sorts the averages.
+
+Higher averages rank first; equal averages go to the higher student id,
+as in select_1 and select_2.
+"""
+
+from sqlalchemy import and_, desc, func, or_, select
+
+from app.models import GradeStat, Student, StudentStat
+
+
+def _stats(subject_id=None):
+    """The ranked table and its conditions: all of ``student_stats``, or the
+    ``grade_stats`` rows of one subject."""
+    if subject_id is None:
+        return StudentStat, []
+    return GradeStat, [GradeStat.subject_id == subject_id]
+
+
+def top(session, k, subject_id=None):
+    """``(student_id, full_name, avg_value)`` of the ``k`` best students."""
+    table, conditions = _stats(subject_id)
+    return session.execute(
+        select(table.student_id, Student.full_name, table.avg_value)
+        .join(Student, Student.id == table.student_id)
+        .where(*conditions)
+        .order_by(desc(table.avg_value), desc(table.student_id))
+        .limit(k)
+    ).all()
+
+
+def rank(session, student_id, subject_id=None):
+    """1-based position of ``student_id``, None if they have no grades."""
+    table, conditions = _stats(subject_id)
+    avg = session.scalar(
+        select(table.avg_value).where(table.student_id == student_id, *conditions)
+    )
+    if avg is None:
+        return None
+    ahead = or_(
+        table.avg_value > avg,
+        and_(table.avg_value == avg, table.student_id > student_id),
+    )
+    return 1 + session.scalar(
+        select(func.count()).select_from(table).where(ahead, *conditions)
+    )
+
@@ -2,8 +2,10 @@ from datetime import datetime
 from sqlalchemy import (
     String,
     Integer,
+    Float,
     ForeignKey,
     DateTime,
+    Index,
     CheckConstraint,
     UniqueConstraint,
 )
@@ -36,6 +38,8 @@ class Subject(Base):
     teacher: Mapped["Teacher"] = relationship(back_populates="subjects")
     grades: Mapped[list["Grade"]] = relationship(back_populates="subject")
 
+    __table_args__ = (Index("ix_subjects_teacher_id", "teacher_id"),)
+
 
 class Student(Base):
     __tablename__ = "students"
@@ -48,6 +52,7 @@ class Student(Base):
 
     __table_args__ = (
         UniqueConstraint("full_name", "group_id", name="uq_student_name_group"),
+        Index("ix_students_group_id_full_name", "group_id", "full_name"),
     )
 
 
@@ -66,4 +71,79 @@ class Grade(Base):
 
     __table_args__ = (
         CheckConstraint("value BETWEEN 1 AND 100", name="ck_grade_range"),
+        # per-subject aggregates: select_2, select_3, select_8
+        Index("ix_grades_subject_student_value", "subject_id", "student_id", "value"),
+        # per-student lookups: select_1, select_7, select_9, select_10
+        Index(
+            "ix_grades_student_subject_created",
+            "student_id",
+            "subject_id",
+            "created_at",
+            "value",
+        ),
+        Index("ix_grades_created_at", "created_at"),
+        # on PostgreSQL the table is range partitioned by month on
+        # created_at, with PRIMARY KEY (id, created_at); see app.partitions
+        # and migration e3a9c7d15b42. id alone still identifies a grade.
+        # ids are never reused, even on SQLite: app.sync relies on it
+        {"sqlite_autoincrement": True},
+    )
+
+
+class GradeStat(Base):
+    __tablename__ = "grade_stats"
+    student_id: Mapped[int] = mapped_column(
+        ForeignKey("students.id"), primary_key=True
+    )
+    subject_id: Mapped[int] = mapped_column(
+        ForeignKey("subjects.id"), primary_key=True
+    )
+    value_sum: Mapped[int] = mapped_column(Integer, nullable=False)
+    value_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    # value_sum / value_count, kept by app.stats
+    avg_value: Mapped[float] = mapped_column(Float, nullable=False)
+
+    __table_args__ = (
+        # per-subject leaderboard: select_2 reads the first entry
+        Index("ix_grade_stats_subject_avg", "subject_id", "avg_value", "student_id"),
+    )
+
+
+class StudentStat(Base):
+    """Per-student totals over all subjects, maintained with ``grade_stats``;
+    the overall leaderboard of select_1."""
+
+    __tablename__ = "student_stats"
+    student_id: Mapped[int] = mapped_column(
+        ForeignKey("students.id"), primary_key=True
+    )
+    value_sum: Mapped[int] = mapped_column(Integer, nullable=False)
+    value_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    avg_value: Mapped[float] = mapped_column(Float, nullable=False)
+
+    __table_args__ = (Index("ix_student_stats_avg", "avg_value", "student_id"),)
+
+
+class GradeChange(Base):
+    """Updates and deletes of grades, in commit order, for incremental sync.
+
+    Inserts are found by the ``grades.id`` watermark alone. There is no
+    foreign key to ``grades`` because the log outlives deleted rows.
+    """
+
+    __tablename__ = "grade_changes"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    grade_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String(10), nullable=False)
+    # the grade after an update; empty for deletes
+    student_id: Mapped[int | None] = mapped_column(Integer)
+    subject_id: Mapped[int | None] = mapped_column(Integer)
+    value: Mapped[int | None] = mapped_column(Integer)
+    created_at: Mapped[datetime | None] = mapped_column(DateTime)
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+    __table_args__ = (
+        CheckConstraint("op IN ('update', 'delete')", name="ck_grade_change_op"),
     )
@@ -1,143 +1,98 @@
 #!/usr/bin/env python
-
-from sqlalchemy import select, func, desc, distinct
-from app.db import SessionLocal
-from app.models import Student, Group, Subject, Grade
-
-
-def select_1():
-    with SessionLocal() as s:
-        q = (
-            select(
-                Student.id,
-                Student.full_name,
-                func.avg(Grade.value).label("avg_grade"),
-            )
-            .join(Grade, Grade.student_id == Student.id)
-            .group_by(Student.id)
-            .order_by(desc("avg_grade"))
-            .limit(5)
-        )
-        return s.execute(q).all()
-
-
-def select_2(subject_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(
-                Student.id,
-                Student.full_name,
-                func.avg(Grade.value).label("avg_grade"),
-            )
-            .join(Grade, Grade.student_id == Student.id)
-            .where(Grade.subject_id == subject_id)
-            .group_by(Student.id)
-            .order_by(desc("avg_grade"))
-            .limit(1)
-        )
-        return s.execute(q).first()
-
-
-def select_3(subject_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(
-                Group.id,
-                Group.name,
-                func.avg(Grade.value).label("avg_grade"),
-            )
-            .join(Student, Student.group_id == Group.id)
-            .join(Grade, Grade.student_id == Student.id)
-            .where(Grade.subject_id == subject_id)
-            .group_by(Group.id)
-            .order_by(Group.name)
-        )
-        return s.execute(q).all()
-
-
-def select_4():
-    with SessionLocal() as s:
-        q = select(func.avg(Grade.value).label("avg_grade"))
-        return s.execute(q).scalar_one()
-
-
-def select_5(teacher_id: int):
-    with SessionLocal() as s:
-        q = select(Subject.id, Subject.name).where(Subject.teacher_id == teacher_id)
-        return s.execute(q).all()
-
-
-def select_6(group_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(Student.id, Student.full_name)
-            .where(Student.group_id == group_id)
-            .order_by(Student.full_name)
-        )
-        return s.execute(q).all()
-
-
-def select_7(group_id: int, subject_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(
-                Student.full_name,
-                Grade.value,
-                Grade.created_at,
-            )
-            .join(Grade, Grade.student_id == Student.id)
-            .where(Student.group_id == group_id, Grade.subject_id == subject_id)
-            .order_by(Student.full_name, Grade.created_at)
-        )
-        return s.execute(q).all()
-
-
-def select_8(teacher_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(func.avg(Grade.value))
-            .join(Subject, Subject.id == Grade.subject_id)
-            .where(Subject.teacher_id == teacher_id)
-        )
-        return s.execute(q).scalar_one()
-
-
-def select_9(student_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(distinct(Subject.id), Subject.name)
-            .join(Grade, Grade.subject_id == Subject.id)
-            .where(Grade.student_id == student_id)
-            .order_by(Subject.name)
-        )
-        return s.execute(q).all()
-
-
-def select_10(student_id: int, teacher_id: int):
-    with SessionLocal() as s:
-        q = (
-            select(distinct(Subject.id), Subject.name)
-            .join(Grade, Grade.subject_id == Subject.id)
-            .where(
-                Grade.student_id == student_id,
-                Subject.teacher_id == teacher_id,
-            )
-            .order_by(Subject.name)
-        )
-        return s.execute(q).all()
+"""Report command line; the reports live in ``app.reports``."""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+# the keys of app.reports.REPORTS
+REPORT_NUMBERS = range(1, 11)
+
+ID_PARAMS = ("subject_id", "teacher_id", "group_id", "student_id")
+
+
+def load_param_sets(path):
+    """Id parameter sets from an NDJSON file, one object per line such as
+    ``{"subject_id": 3}``; ``-`` reads stdin."""
+    from app import importer
+
+    param_sets = []
+    with importer.open_input(path) as f:
+        for line, record in importer.read_records(f, "ndjson"):
+            if not isinstance(record, dict):
+                sys.exit(f"{path}:{line}: not a JSON object")
+            unknown = record.keys() - set(ID_PARAMS)
+            if unknown:
+                sys.exit(f"{path}:{line}: unknown parameters {sorted(unknown)}")
+            if not all(isinstance(v, int) for v in record.values()):
+                sys.exit(f"{path}:{line}: ids must be integers")
+            param_sets.append(record)
+    return param_sets
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Run the grade reports")
+    p.add_argument(
+        "reports",
+        nargs="*",
+        type=int,
+        choices=REPORT_NUMBERS,
+        metavar="N",
+        help="Report numbers 1-10 (default: all)",
+    )
+    for name in ID_PARAMS:
+        p.add_argument(f"--{name.replace('_', '-')}", type=int, default=1)
+    p.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only grades created at or after this ISO date/timestamp",
+    )
+    p.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="Only grades created before this ISO date/timestamp",
+    )
+    p.add_argument(
+        "--params",
+        metavar="FILE",
+        help="NDJSON file of id parameter sets, e.g. {\"subject_id\": 3} per "
+        "line; every report runs once per set, ids a set lacks come from the "
+        "options above ('-' for stdin)",
+    )
+    p.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Run the reports on N threads (keep within DB_POOL_SIZE plus "
+        "DB_MAX_OVERFLOW, or threads wait for a connection)",
+    )
+    return p
 
 
 def run():
-    print("Select 1:", select_1())
-    print("Select 2 (subject_id=1):", select_2(1))
-    print("Select 3 (subject_id=1):", select_3(1))
-    print("Select 4:", select_4())
-    print("Select 5 (teacher_id=1):", select_5(1))
-    print("Select 6 (group_id=1):", select_6(1))
-    print("Select 7 (group_id=1, subject_id=1):", select_7(1, 1))
-    print("Select 8 (teacher_id=1):", select_8(1))
-    print("Select 9 (student_id=1):", select_9(1))
-    print("Select 10 (student_id=1, teacher_id=1):", select_10(1, 1))
+    args = build_parser().parse_args()
+    if args.parallel < 1:
+        sys.exit("--parallel must be at least 1")
+    # SQLAlchemy and the models load only once there is a report to run
+    from app import reports
+
+    defaults = {name: getattr(args, name) for name in ID_PARAMS}
+    param_sets = load_param_sets(args.params) if args.params else [{}]
+    jobs = reports.report_jobs(
+        args.reports or list(REPORT_NUMBERS), param_sets, defaults
+    )
+    timings = {}
+    started = time.perf_counter()
+    for number, values, result, ms in reports.run_reports(
+        jobs, args.parallel, args.since, args.until
+    ):
+        print(reports.report_label(number, values), result, flush=True)
+        timings.setdefault(number, []).append(ms)
+    reports.print_timings(
+        timings, (time.perf_counter() - started) * 1000, args.parallel
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+import asyncio
+import time
+
+from app.db_async import AsyncSessionLocal
+from app.reports import (
+    statement,
+    query_1,
+    query_2,
+    query_3,
+    query_4,
+    query_5,
+    query_6,
+    query_7,
+    query_8,
+    query_9,
+    query_10,
+)
+
+
+async def select_1(since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(*statement(query_1, since=since, until=until))
+        return result.all()
+
+
+async def select_2(subject_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_2, subject_id=subject_id, since=since, until=until)
+        )
+        return result.first()
+
+
+async def select_3(subject_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_3, subject_id=subject_id, since=since, until=until)
+        )
+        return result.all()
+
+
+async def select_4(since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(*statement(query_4, since=since, until=until))
+        return result.scalar_one()
+
+
+async def select_5(teacher_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_5, teacher_id=teacher_id, since=since, until=until)
+        )
+        return result.all()
+
+
+async def select_6(group_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_6, group_id=group_id, since=since, until=until)
+        )
+        return result.all()
+
+
+async def select_7(group_id: int, subject_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(
+                query_7,
+                group_id=group_id,
+                subject_id=subject_id,
+                since=since,
+                until=until,
+            )
+        )
+        return result.all()
+
+
+async def select_8(teacher_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_8, teacher_id=teacher_id, since=since, until=until)
+        )
+        return result.scalar_one()
+
+
+async def select_9(student_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(query_9, student_id=student_id, since=since, until=until)
+        )
+        return result.all()
+
+
+async def select_10(student_id: int, teacher_id: int, since=None, until=None):
+    async with AsyncSessionLocal() as s:
+        result = await s.execute(
+            *statement(
+                query_10,
+                student_id=student_id,
+                teacher_id=teacher_id,
+                since=since,
+                until=until,
+            )
+        )
+        return result.all()
+
+
+async def run_all(
+    subject_id: int = 1,
+    teacher_id: int = 1,
+    group_id: int = 1,
+    student_id: int = 1,
+    since=None,
+    until=None,
+):
+    """Run the ten reports concurrently, each on its own pooled connection."""
+    window = {"since": since, "until": until}
+    results = await asyncio.gather(
+        select_1(**window),
+        select_2(subject_id, **window),
+        select_3(subject_id, **window),
+        select_4(**window),
+        select_5(teacher_id, **window),
+        select_6(group_id, **window),
+        select_7(group_id, subject_id, **window),
+        select_8(teacher_id, **window),
+        select_9(student_id, **window),
+        select_10(student_id, teacher_id, **window),
+    )
+    return dict(zip([f"select_{i}" for i in range(1, 11)], results))
+
+
+async def main():
+    started = time.perf_counter()
+    results = await run_all()
+    elapsed = time.perf_counter() - started
+    for name, result in results.items():
+        print(f"{name}:", result)
+    print(f"All reports in {elapsed * 1000:.1f} ms")
+
+
+def run():
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run()
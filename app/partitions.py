@@ -0,0 +1,241 @@
+"""Monthly range partitions of ``grades`` and archiving of old months.
+
+On PostgreSQL ``grades`` is partitioned by ``created_at`` (migration
+e3a9c7d15b42) into ``grades_yYYYYmMM`` tables plus ``grades_default``, so
+queries bounded on ``created_at`` scan only their months; archiving
+detaches whole months, which costs no row copying.
+
+Partitioning is not supported on SQLite: ``grades`` stays a single table
+and bounded queries get no pruning beyond the ``created_at`` index.
+Archiving still works there, moving old rows into per-month tables so
+``grades`` only holds the recent ones. On both, archived months are named
+``grades_archive_yYYYYmMM``; reports only read ``grades``.
+
+Archived grades leave ``grade_stats`` and are logged as deletes in
+``grade_changes``, so reports and synced copies agree with ``grades``.
+"""
+
+import re
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import (
+    column,
+    extract,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+    table,
+    text,
+)
+
+from app import stats
+from app.models import Grade, GradeChange
+
+PARTITION_RE = re.compile(r"^grades_y(\d{4})m(\d{2})$")
+ARCHIVE_PREFIX = "grades_archive_"
+DEFAULT_PARTITION = "grades_default"
+COLUMNS = [c.name for c in Grade.__table__.columns]
+
+
+def month_after(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def months(first, last):
+    """``(year, month)`` pairs from ``first`` to ``last`` inclusive."""
+    month = (first.year, first.month)
+    while month <= (last.year, last.month):
+        yield month
+        month = month_after(*month)
+
+
+def suffix(year, month):
+    return f"y{year:04d}m{month:02d}"
+
+
+def grades_like(name):
+    """Lightweight construct for a table with the columns of ``grades``."""
+    return table(name, *(column(c.name, c.type) for c in Grade.__table__.columns))
+
+
+def is_partitioned(conn):
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.scalar(
+            text(
+                "SELECT count(*) FROM pg_partitioned_table "
+                "WHERE partrelid = 'grades'::regclass"
+            )
+        )
+    )
+
+
+def partition_names(conn):
+    return conn.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'grades'::regclass ORDER BY c.relname"
+        )
+    ).all()
+
+
+def archive_names(conn):
+    return sorted(
+        name
+        for name in inspect(conn).get_table_names()
+        if name.startswith(ARCHIVE_PREFIX)
+    )
+
+
+def ensure_partitions(conn, first, last):
+    """Create the monthly partitions from ``first`` to ``last`` that are
+    missing, moving their rows out of the default partition. A no-op unless
+    ``grades`` is partitioned."""
+    if not is_partitioned(conn):
+        return []
+    existing = set(partition_names(conn))
+    created = []
+    for year, month in months(first, last):
+        name = f"grades_{suffix(year, month)}"
+        if name in existing:
+            continue
+        lower = f"{year:04d}-{month:02d}-01"
+        upper = "{:04d}-{:02d}-01".format(*month_after(year, month))
+        # attaching checks that the default partition holds no rows of the
+        # new range, so they are moved into the new table first
+        conn.exec_driver_sql(
+            f"CREATE TABLE {name} "
+            "(LIKE grades INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        if DEFAULT_PARTITION in existing:
+            conn.exec_driver_sql(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= '{lower}' AND created_at < '{upper}' "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            )
+        conn.exec_driver_sql(
+            f"ALTER TABLE grades ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+        created.append(name)
+    return created
+
+
+def _retire(session, source, *conditions):
+    """Remove the grades of ``source`` matching ``conditions`` from
+    ``grade_stats`` and log them as deleted; returns the row count."""
+    c = source.c
+    rows = session.execute(
+        select(c.student_id, c.subject_id, func.sum(c.value), func.count())
+        .where(*conditions)
+        .group_by(c.student_id, c.subject_id)
+    ).all()
+    sums = Counter({(st, sj): -total for st, sj, total, _ in rows})
+    counts = Counter({(st, sj): -n for st, sj, _, n in rows})
+    stats.apply(session, sums, counts)
+    session.execute(
+        insert(GradeChange.__table__).from_select(
+            ["grade_id", "op", "changed_at"],
+            select(c.id, literal("delete"), literal(datetime.utcnow())).where(
+                *conditions
+            ),
+        )
+    )
+    return -sum(counts.values())
+
+
+def archive(session, before, drop=False):
+    """Archive (or with ``drop``, delete) grades created before ``before``.
+
+    Whole monthly partitions are detached on PostgreSQL; remaining rows,
+    in the default partition, the month ``before`` falls in, or on SQLite,
+    are moved into per-month archive tables. Returns ``(rows, tables)``.
+    """
+    conn = session.connection()
+    rows = 0
+    tables = []
+    existing = set(archive_names(conn))
+    if is_partitioned(conn):
+        for name in partition_names(conn):
+            match = PARTITION_RE.match(name)
+            if not match:
+                continue
+            upper = datetime(*month_after(*map(int, match.groups())), 1)
+            if upper > before:
+                continue
+            rows += _retire(session, grades_like(name))
+            conn.exec_driver_sql(f"ALTER TABLE grades DETACH PARTITION {name}")
+            if drop:
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+                continue
+            target = ARCHIVE_PREFIX + name.removeprefix("grades_")
+            if target in existing:
+                # an earlier archive with a mid-month ``before`` already
+                # made this month's table from the partition's older rows
+                names = ", ".join(COLUMNS)
+                conn.exec_driver_sql(
+                    f"INSERT INTO {target} ({names}) SELECT {names} FROM {name}"
+                )
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+            else:
+                conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {target}")
+                existing.add(target)
+            tables.append(target)
+
+    grades = Grade.__table__
+    remaining = session.execute(
+        select(
+            extract("year", grades.c.created_at),
+            extract("month", grades.c.created_at),
+        )
+        .where(grades.c.created_at < before)
+        .distinct()
+    ).all()
+    for y, m in remaining:
+        y, m = int(y), int(m)
+        lower = datetime(y, m, 1)
+        upper = min(datetime(*month_after(y, m), 1), before)
+        in_month = (grades.c.created_at >= lower, grades.c.created_at < upper)
+        rows += _retire(session, grades, *in_month)
+        if not drop:
+            target = ARCHIVE_PREFIX + suffix(y, m)
+            if target not in existing:
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {target} AS SELECT * FROM grades WHERE 1 = 0"
+                )
+                existing.add(target)
+            session.execute(
+                insert(grades_like(target)).from_select(
+                    COLUMNS, select(grades).where(*in_month)
+                )
+            )
+            if target not in tables:
+                tables.append(target)
+        session.execute(grades.delete().where(*in_month))
+    return rows, tables
+
+
+def describe(conn):
+    """``(table, kind, rows)`` for the live partitions and the archives;
+    row counts are planner estimates on PostgreSQL."""
+    if is_partitioned(conn):
+        live = [(name, "partition") for name in partition_names(conn)]
+    else:
+        live = [("grades", "table")]
+    tables = live + [(name, "archive") for name in archive_names(conn)]
+    result = []
+    for name, kind in tables:
+        if conn.dialect.name == "postgresql":
+            rows = conn.scalar(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+                {"name": name},
+            )
+        else:
+            rows = conn.scalar(select(func.count()).select_from(grades_like(name)))
+        result.append((name, kind, max(rows or 0, 0)))
+    return result
@@ -0,0 +1,618 @@
+"""The grade reports; ``app.my_select`` runs them from the command line."""
+
+import functools
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, func, desc, distinct, cast, exists, Float
+from app.cache import cached
+from app.db import ReadSessionLocal
+from app.models import Student, Group, Subject, Grade, GradeStat, StudentStat
+
+# Reports only read, through ReadSessionLocal: on a replica when
+# DATABASE_REPLICA_URLS is set, on the primary otherwise.
+#
+# Every report takes optional ``since``/``until`` bounds on Grade.created_at
+# (``since`` inclusive, ``until`` exclusive), pushed into the WHERE clause.
+
+
+def window(since=None, until=None):
+    conditions = []
+    if since is not None:
+        conditions.append(Grade.created_at >= since)
+    if until is not None:
+        conditions.append(Grade.created_at < until)
+    return conditions
+
+
+def totals(since=None, until=None):
+    """Per (student_id, subject_id) value_sum and value_count.
+
+    Without bounds this is the grade_stats summary; with bounds the grades
+    in the window are aggregated instead.
+    """
+    if since is None and until is None:
+        return GradeStat.__table__
+    return (
+        select(
+            Grade.student_id,
+            Grade.subject_id,
+            func.sum(Grade.value).label("value_sum"),
+            func.count().label("value_count"),
+        )
+        .where(*window(since, until))
+        .group_by(Grade.student_id, Grade.subject_id)
+        .subquery("totals")
+    )
+
+
+def stats_avg(t=GradeStat.__table__):
+    # averages come from per-pair totals, grade_stats unless bounded
+    return cast(func.sum(t.c.value_sum), Float) / func.sum(t.c.value_count)
+
+
+def statement(query, **params):
+    """``(construct, parameters)`` that run ``query`` with ``params``.
+
+    The construct is built by ``query`` once per combination of given
+    (non-None) parameters, with ``bindparam`` placeholders in place of the
+    values, and reused by every later call: the ``select()`` is not rebuilt,
+    its memoized cache key hits SQLAlchemy's compiled cache, and the SQL text
+    stays identical, which lets drivers with server-side prepared statements
+    (psycopg 3, asyncpg) reuse their prepared plan.
+    """
+    params = {name: value for name, value in params.items() if value is not None}
+    return _prepared(query, tuple(params)), params
+
+
+@functools.cache
+def _prepared(query, names):
+    # *_ids parameters of the batch reports are lists, expanded into IN (...)
+    return query(
+        **{name: bindparam(name, expanding=name.endswith("_ids")) for name in names}
+    )
+
+
+def _window_tags(tags, since, until, *grade_tags):
+    # reports that only list entities depend on grades once bounded
+    if since is None and until is None:
+        return tags
+    return [*tags, *grade_tags]
+
+
+# Unbounded, select_1 and select_2 read the first entries of the leaderboard
+# indexes on student_stats and grade_stats instead of sorting every average;
+# ties go to the higher student id so that one backward index scan serves.
+# The bounded and batch queries break ties the same way.
+
+
+def query_1(since=None, until=None):
+    if since is None and until is None:
+        return (
+            select(
+                Student.id,
+                Student.full_name,
+                StudentStat.avg_value.label("avg_grade"),
+            )
+            .join(StudentStat, StudentStat.student_id == Student.id)
+            .order_by(desc(StudentStat.avg_value), desc(StudentStat.student_id))
+            .limit(5)
+        )
+    t = totals(since, until)
+    return (
+        select(
+            Student.id,
+            Student.full_name,
+            stats_avg(t).label("avg_grade"),
+        )
+        .join(t, t.c.student_id == Student.id)
+        .group_by(Student.id)
+        .order_by(desc("avg_grade"), desc(Student.id))
+        .limit(5)
+    )
+
+
+@cached(lambda since=None, until=None: ["grades", "students"])
+def select_1(since: datetime | None = None, until: datetime | None = None):
+    with ReadSessionLocal() as s:
+        return s.execute(*statement(query_1, since=since, until=until)).all()
+
+
+def query_2(subject_id: int, since=None, until=None):
+    if since is None and until is None:
+        return (
+            select(
+                Student.id,
+                Student.full_name,
+                GradeStat.avg_value.label("avg_grade"),
+            )
+            .join(GradeStat, GradeStat.student_id == Student.id)
+            .where(GradeStat.subject_id == subject_id)
+            .order_by(desc(GradeStat.avg_value), desc(GradeStat.student_id))
+            .limit(1)
+        )
+    t = totals(since, until)
+    return (
+        select(
+            Student.id,
+            Student.full_name,
+            stats_avg(t).label("avg_grade"),
+        )
+        .join(t, t.c.student_id == Student.id)
+        .where(t.c.subject_id == subject_id)
+        .group_by(Student.id)
+        .order_by(desc("avg_grade"), desc(Student.id))
+        .limit(1)
+    )
+
+
+@cached(
+    lambda subject_id, since=None, until=None: [
+        f"grades:subject:{subject_id}",
+        "students",
+    ]
+)
+def select_2(
+    subject_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_2, subject_id=subject_id, since=since, until=until)
+        ).first()
+
+
+def query_3(subject_id: int, since=None, until=None):
+    t = totals(since, until)
+    return (
+        select(
+            Group.id,
+            Group.name,
+            stats_avg(t).label("avg_grade"),
+        )
+        .join(Student, Student.group_id == Group.id)
+        .join(t, t.c.student_id == Student.id)
+        .where(t.c.subject_id == subject_id)
+        .group_by(Group.id)
+        .order_by(Group.name)
+    )
+
+
+@cached(
+    lambda subject_id, since=None, until=None: [
+        f"grades:subject:{subject_id}",
+        "students",
+        "groups",
+    ]
+)
+def select_3(
+    subject_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_3, subject_id=subject_id, since=since, until=until)
+        ).all()
+
+
+def query_4(since=None, until=None):
+    return select(func.avg(Grade.value).label("avg_grade")).where(
+        *window(since, until)
+    )
+
+
+@cached(lambda since=None, until=None: ["grades"])
+def select_4(since: datetime | None = None, until: datetime | None = None):
+    with ReadSessionLocal() as s:
+        return s.execute(*statement(query_4, since=since, until=until)).scalar_one()
+
+
+def query_5(teacher_id: int, since=None, until=None):
+    query = select(Subject.id, Subject.name).where(Subject.teacher_id == teacher_id)
+    if since is not None or until is not None:
+        # only subjects graded within the window
+        query = query.where(
+            exists().where(Grade.subject_id == Subject.id, *window(since, until))
+        )
+    return query
+
+
+@cached(
+    lambda teacher_id, since=None, until=None: _window_tags(
+        [f"subjects:teacher:{teacher_id}", "subjects"],
+        since,
+        until,
+        f"grades:teacher:{teacher_id}",
+    )
+)
+def select_5(
+    teacher_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_5, teacher_id=teacher_id, since=since, until=until)
+        ).all()
+
+
+def query_6(group_id: int, since=None, until=None):
+    query = (
+        select(Student.id, Student.full_name)
+        .where(Student.group_id == group_id)
+        .order_by(Student.full_name)
+    )
+    if since is not None or until is not None:
+        # only students graded within the window
+        query = query.where(
+            exists().where(Grade.student_id == Student.id, *window(since, until))
+        )
+    return query
+
+
+@cached(
+    lambda group_id, since=None, until=None: _window_tags(
+        [f"students:group:{group_id}", "students"], since, until, "grades"
+    )
+)
+def select_6(
+    group_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_6, group_id=group_id, since=since, until=until)
+        ).all()
+
+
+def query_7(group_id: int, subject_id: int, since=None, until=None):
+    return (
+        select(
+            Student.full_name,
+            Grade.value,
+            Grade.created_at,
+        )
+        .join(Grade, Grade.student_id == Student.id)
+        .where(
+            Student.group_id == group_id,
+            Grade.subject_id == subject_id,
+            *window(since, until),
+        )
+        .order_by(Student.full_name, Grade.created_at)
+    )
+
+
+@cached(
+    lambda group_id, subject_id, since=None, until=None: [
+        f"grades:group-subject:{group_id}:{subject_id}",
+        f"students:group:{group_id}",
+        "students",
+    ]
+)
+def select_7(
+    group_id: int,
+    subject_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(
+                query_7,
+                group_id=group_id,
+                subject_id=subject_id,
+                since=since,
+                until=until,
+            )
+        ).all()
+
+
+# Batch variants: one grouped query for many keys instead of one query per
+# key. ``None`` means every subject/group; the result maps each requested
+# key to what the single-key report returns for it, with the key columns
+# prepended to the rows.
+
+
+def _ids(s, column, ids):
+    if ids is None:
+        return s.scalars(select(column).order_by(column)).all()
+    return list(ids)
+
+
+def _batch_tags(prefix, ids, *tags):
+    if ids is None:
+        return ["grades", *tags]
+    return [f"{prefix}:{i}" for i in ids] + list(tags)
+
+
+def query_2_batch(subject_ids=None, since=None, until=None):
+    t = totals(since, until)
+    avg = cast(t.c.value_sum, Float) / t.c.value_count
+    ranked = select(
+        t.c.subject_id,
+        t.c.student_id,
+        avg.label("avg_grade"),
+        func.row_number()
+        .over(
+            partition_by=t.c.subject_id,
+            order_by=(desc(avg), desc(t.c.student_id)),
+        )
+        .label("rank"),
+    )
+    if subject_ids is not None:
+        ranked = ranked.where(t.c.subject_id.in_(subject_ids))
+    ranked = ranked.subquery()
+    return (
+        select(
+            ranked.c.subject_id,
+            Student.id,
+            Student.full_name,
+            ranked.c.avg_grade,
+        )
+        .join(Student, Student.id == ranked.c.student_id)
+        .where(ranked.c.rank == 1)
+        .order_by(ranked.c.subject_id)
+    )
+
+
+@cached(
+    lambda subject_ids=None, since=None, until=None: _batch_tags(
+        "grades:subject", subject_ids, "students", "subjects"
+    )
+)
+def select_2_batch(subject_ids=None, since=None, until=None):
+    """``select_2`` for many subjects: ``{subject_id: row or None}``."""
+    with ReadSessionLocal() as s:
+        result = dict.fromkeys(_ids(s, Subject.id, subject_ids))
+        for row in s.execute(
+            *statement(query_2_batch, subject_ids=subject_ids, since=since, until=until)
+        ):
+            result[row.subject_id] = row
+        return result
+
+
+def query_3_batch(subject_ids=None, since=None, until=None):
+    t = totals(since, until)
+    query = (
+        select(
+            t.c.subject_id,
+            Group.id,
+            Group.name,
+            stats_avg(t).label("avg_grade"),
+        )
+        .join(Student, Student.group_id == Group.id)
+        .join(t, t.c.student_id == Student.id)
+        .group_by(t.c.subject_id, Group.id)
+        .order_by(t.c.subject_id, Group.name)
+    )
+    if subject_ids is not None:
+        query = query.where(t.c.subject_id.in_(subject_ids))
+    return query
+
+
+@cached(
+    lambda subject_ids=None, since=None, until=None: _batch_tags(
+        "grades:subject", subject_ids, "students", "groups", "subjects"
+    )
+)
+def select_3_batch(subject_ids=None, since=None, until=None):
+    """``select_3`` for many subjects: ``{subject_id: [rows]}``."""
+    with ReadSessionLocal() as s:
+        result = {i: [] for i in _ids(s, Subject.id, subject_ids)}
+        for row in s.execute(
+            *statement(query_3_batch, subject_ids=subject_ids, since=since, until=until)
+        ):
+            result[row.subject_id].append(row)
+        return result
+
+
+def query_7_batch(group_ids=None, subject_ids=None, since=None, until=None):
+    query = (
+        select(
+            Student.group_id,
+            Grade.subject_id,
+            Student.full_name,
+            Grade.value,
+            Grade.created_at,
+        )
+        .join(Grade, Grade.student_id == Student.id)
+        .where(*window(since, until))
+        .order_by(
+            Student.group_id, Grade.subject_id, Student.full_name, Grade.created_at
+        )
+    )
+    if group_ids is not None:
+        query = query.where(Student.group_id.in_(group_ids))
+    if subject_ids is not None:
+        query = query.where(Grade.subject_id.in_(subject_ids))
+    return query
+
+
+# without both id lists the result holds every grade of the window, too
+# much for one cache entry, so those calls are not cached
+@cached(
+    lambda group_ids=None, subject_ids=None, since=None, until=None: (
+        None
+        if group_ids is None or subject_ids is None
+        else [
+            f"grades:group-subject:{g}:{sj}" for g in group_ids for sj in subject_ids
+        ]
+        + [f"students:group:{g}" for g in group_ids]
+        + ["students"]
+    )
+)
+def select_7_batch(group_ids=None, subject_ids=None, since=None, until=None):
+    """``select_7`` for every group and subject pair: ``{(g, s): [rows]}``."""
+    with ReadSessionLocal() as s:
+        subjects = _ids(s, Subject.id, subject_ids)
+        result = {(g, sj): [] for g in _ids(s, Group.id, group_ids) for sj in subjects}
+        for row in s.execute(
+            *statement(
+                query_7_batch,
+                group_ids=group_ids,
+                subject_ids=subject_ids,
+                since=since,
+                until=until,
+            )
+        ):
+            result[row.group_id, row.subject_id].append(row)
+        return result
+
+
+def query_8(teacher_id: int, since=None, until=None):
+    t = totals(since, until)
+    return (
+        select(stats_avg(t))
+        .join(Subject, Subject.id == t.c.subject_id)
+        .where(Subject.teacher_id == teacher_id)
+    )
+
+
+@cached(
+    lambda teacher_id, since=None, until=None: [
+        f"grades:teacher:{teacher_id}",
+        f"subjects:teacher:{teacher_id}",
+    ]
+)
+def select_8(
+    teacher_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_8, teacher_id=teacher_id, since=since, until=until)
+        ).scalar_one()
+
+
+def query_9(student_id: int, since=None, until=None):
+    return (
+        select(distinct(Subject.id), Subject.name)
+        .join(Grade, Grade.subject_id == Subject.id)
+        .where(Grade.student_id == student_id, *window(since, until))
+        .order_by(Subject.name)
+    )
+
+
+@cached(
+    lambda student_id, since=None, until=None: [
+        f"grades:student:{student_id}",
+        "subjects",
+    ]
+)
+def select_9(
+    student_id: int, since: datetime | None = None, until: datetime | None = None
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(query_9, student_id=student_id, since=since, until=until)
+        ).all()
+
+
+def query_10(student_id: int, teacher_id: int, since=None, until=None):
+    return (
+        select(distinct(Subject.id), Subject.name)
+        .join(Grade, Grade.subject_id == Subject.id)
+        .where(
+            Grade.student_id == student_id,
+            Subject.teacher_id == teacher_id,
+            *window(since, until),
+        )
+        .order_by(Subject.name)
+    )
+
+
+@cached(
+    lambda student_id, teacher_id, since=None, until=None: [
+        f"grades:student:{student_id}",
+        f"subjects:teacher:{teacher_id}",
+        "subjects",
+    ]
+)
+def select_10(
+    student_id: int,
+    teacher_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    with ReadSessionLocal() as s:
+        return s.execute(
+            *statement(
+                query_10,
+                student_id=student_id,
+                teacher_id=teacher_id,
+                since=since,
+                until=until,
+            )
+        ).all()
+
+
+# report number -> (function, id parameters)
+REPORTS = {
+    1: (select_1, ()),
+    2: (select_2, ("subject_id",)),
+    3: (select_3, ("subject_id",)),
+    4: (select_4, ()),
+    5: (select_5, ("teacher_id",)),
+    6: (select_6, ("group_id",)),
+    7: (select_7, ("group_id", "subject_id")),
+    8: (select_8, ("teacher_id",)),
+    9: (select_9, ("student_id",)),
+    10: (select_10, ("student_id", "teacher_id")),
+}
+
+
+def report_jobs(numbers, param_sets, defaults):
+    """``(number, values)`` of every report for every parameter set, without
+    repeats; ids a set lacks come from ``defaults``."""
+    jobs = {}
+    for params in param_sets:
+        for number in numbers:
+            _fn, names = REPORTS[number]
+            jobs[number, tuple(params.get(n, defaults[n]) for n in names)] = None
+    return list(jobs)
+
+
+def run_reports(jobs, workers=1, since=None, until=None):
+    """Run ``(number, values)`` jobs on ``workers`` threads, each report on its
+    own pooled connection; yields ``(number, values, result, ms)`` as they
+    finish."""
+
+    def call(number, values):
+        fn, _names = REPORTS[number]
+        started = time.perf_counter()
+        result = fn(*values, since=since, until=until)
+        return result, (time.perf_counter() - started) * 1000
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+    try:
+        futures = {pool.submit(call, *job): job for job in jobs}
+        for future in as_completed(futures):
+            yield *futures[future], *future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def report_label(number, values):
+    _fn, names = REPORTS[number]
+    label = ", ".join(f"{name}={value}" for name, value in zip(names, values))
+    return f"Select {number} ({label}):" if label else f"Select {number}:"
+
+
+def print_timings(timings, wall_ms, workers, out=sys.stderr):
+    print(
+        f"{'report':<10} {'runs':>6} {'total ms':>10} {'mean ms':>9} "
+        f"{'p50 ms':>9} {'max ms':>9}",
+        file=out,
+    )
+    for number in sorted(timings):
+        samples = timings[number]
+        print(
+            f"select_{number:<3} {len(samples):>6} {sum(samples):>10.1f} "
+            f"{statistics.fmean(samples):>9.2f} {statistics.median(samples):>9.2f} "
+            f"{max(samples):>9.2f}",
+            file=out,
+        )
+    total = sum(sum(samples) for samples in timings.values())
+    runs = sum(len(samples) for samples in timings.values())
+    print(
+        f"{runs} queries in {wall_ms:.1f} ms wall on {workers} threads "
+        f"({total:.1f} ms of query time)",
+        file=out,
+    )
@@ -1,66 +1,117 @@
 #!/usr/bin/env python
+"""Seeding command line; the generators and writers live in ``app.seeder``."""
 
+import argparse
+import os
 import random
-from faker import Faker
-from sqlalchemy import select, func
-from app.db import SessionLocal
-from app.models import Group, Teacher, Subject, Student, Grade
+from dataclasses import dataclass
+from datetime import datetime
 
-fake = Faker()
 
+@dataclass(frozen=True)
+class Scale:
+    groups: int = 10
+    teachers: int = 20
+    subjects: int = 50
+    students: int = 1000
+    grades_per_pair: int = 20
+    chunk_size: int = 10_000
+    days: int = 365
+    shard_size: int = 500
+    seed: int = 0
+    # latest grade timestamp; None for the current time
+    anchor: datetime | None = None
 
-def run():
-    session = SessionLocal()
-    try:
-        groups = [Group(name=f"G-{i+1}") for i in range(3)]
-        session.add_all(groups)
-
-        teachers = [Teacher(full_name=fake.name()) for _ in range(random.randint(3, 5))]
-        session.add_all(teachers)
 
-        subjects = []
-        for _ in range(random.randint(5, 8)):
-            subjects.append(
-                Subject(
-                    name=fake.unique.job()[:90],
-                    teacher=random.choice(teachers),
-                )
-            )
-        session.add_all(subjects)
+def build_parser() -> argparse.ArgumentParser:
+    defaults = Scale()
+    p = argparse.ArgumentParser()
+    p.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Stream a dataset of the given scale through bulk inserts",
+    )
+    p.add_argument("--groups", type=int, default=defaults.groups)
+    p.add_argument("--teachers", type=int, default=defaults.teachers)
+    p.add_argument("--subjects", type=int, default=defaults.subjects)
+    p.add_argument("--students", type=int, default=defaults.students)
+    p.add_argument(
+        "--grades-per-pair",
+        type=int,
+        default=defaults.grades_per_pair,
+        help="Grades generated for every (student, subject) pair",
+    )
+    p.add_argument(
+        "--chunk-size",
+        type=int,
+        default=defaults.chunk_size,
+        help="Rows sent to the database per batch",
+    )
+    p.add_argument(
+        "--days",
+        type=int,
+        default=defaults.days,
+        help="Spread grade timestamps over this many past days",
+    )
+    p.add_argument(
+        "--shard-size",
+        type=int,
+        default=defaults.shard_size,
+        help="Students generated per shard (unit of work for --workers)",
+    )
+    p.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed; the same seed, scale, shard size and --anchor give "
+        "the same data",
+    )
+    p.add_argument(
+        "--anchor",
+        type=datetime.fromisoformat,
+        help="Timestamp of the newest possible grade, as ISO date/time "
+        "(default: now); grades are spread over --days before it",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes generating shards (0 = one per CPU)",
+    )
+    p.add_argument(
+        "--writers",
+        type=int,
+        default=1,
+        help="Connections writing shards (always 1 on SQLite); only one writer "
+        "seeds all or nothing",
+    )
+    return p
 
-        students = []
-        for _ in range(random.randint(30, 50)):
-            students.append(
-                Student(
-                    full_name=fake.name(),
-                    group=random.choice(groups),
-                )
-            )
-        session.add_all(students)
-        session.commit()
 
-        for st in students:
-            for subj in subjects:
-                for _ in range(random.randint(0, 20)):
-                    session.add(
-                        Grade(
-                            student=st,
-                            subject=subj,
-                            value=random.randint(40, 100),
-                        )
-                    )
-        session.commit()
+def run():
+    args = build_parser().parse_args()
+    # SQLAlchemy and the models load only once there is something to seed
+    from app import seeder
 
-        totals = {
-            "groups":   session.scalar(select(func.count()).select_from(Group)),
-            "teachers": session.scalar(select(func.count()).select_from(Teacher)),
-            "subjects": session.scalar(select(func.count()).select_from(Subject)),
-            "students": session.scalar(select(func.count()).select_from(Student)),
-            "grades":   session.scalar(select(func.count()).select_from(Grade)),
-        }
-        print(totals)
-    finally:
-        session.close()
+    if not args.bulk:
+        seeder.seed_random()
+        return
+    seeder.seed_bulk(
+        Scale(
+            groups=args.groups,
+            teachers=args.teachers,
+            subjects=args.subjects,
+            students=args.students,
+            grades_per_pair=args.grades_per_pair,
+            chunk_size=args.chunk_size,
+            days=args.days,
+            shard_size=args.shard_size,
+            seed=args.seed if args.seed is not None else random.randrange(2**31),
+            anchor=args.anchor,
+        ),
+        workers=args.workers or os.cpu_count() or 1,
+        writers=args.writers,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,469 @@
+"""Random and bulk seeding; ``app.seed`` runs it from the command line."""
+
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from io import StringIO
+from itertools import islice
+
+from sqlalchemy import select, func, insert, text
+from app import partitions, stats
+from app.db import SessionLocal
+from app.seed import Scale
+from app.models import (
+    Group,
+    Teacher,
+    Subject,
+    Student,
+    Grade,
+    GradeStat,
+    StudentStat,
+)
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    first_student_id: int
+    students: int
+    group_ids: tuple
+    subject_ids: tuple
+    grades_per_pair: int
+    now: datetime
+    days: int
+    seed: int
+
+
+STUDENT_COLUMNS = ("id", "full_name", "group_id")
+GRADE_COLUMNS = ("student_id", "subject_id", "value", "created_at")
+STAT_COLUMNS = ("student_id", "subject_id", "value_sum", "value_count", "avg_value")
+STUDENT_STAT_COLUMNS = ("student_id", "value_sum", "value_count", "avg_value")
+
+
+def chunked(rows, size):
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _copy_value(v):
+    if v is None:
+        return r"\N"
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    return (
+        str(v)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_rows(conn, table, columns, rows):
+    """Stream one chunk of row tuples through PostgreSQL ``COPY FROM STDIN``."""
+    buf = StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buf
+        )
+    finally:
+        cursor.close()
+
+
+def write_rows(conn, table, columns, rows, chunk_size):
+    """Insert ``rows`` in fixed-size chunks, return the number of rows written.
+
+    PostgreSQL goes through ``COPY``, every other backend through a Core
+    ``insert()`` executemany on the caller's connection/transaction.
+    """
+    use_copy = conn.dialect.name == "postgresql"
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        if use_copy:
+            copy_rows(conn, table, columns, chunk)
+        else:
+            conn.execute(insert(table), [dict(zip(columns, row)) for row in chunk])
+        count += len(chunk)
+    return count
+
+
+def sync_sequences(conn, tables):
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"coalesce(max(id), 1), max(id) IS NOT NULL) FROM {table.name}"
+            )
+        )
+
+
+def next_id(conn, model):
+    return (conn.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def group_rows(first_id, n):
+    for i in range(first_id, first_id + n):
+        yield (i, f"G-{i}")
+
+
+def teacher_rows(first_id, n, faker):
+    for i in range(first_id, first_id + n):
+        yield (i, f"{faker.name()} #{i}")
+
+
+def subject_rows(first_id, n, teacher_ids, faker, rng):
+    for i in range(first_id, first_id + n):
+        yield (i, f"{faker.job()[:80]} #{i}", rng.choice(teacher_ids))
+
+
+def student_rows(first_id, n, group_ids, faker, rng):
+    for i in range(first_id, first_id + n):
+        yield (i, f"{faker.name()} #{i}", rng.choice(group_ids))
+
+
+def grade_rows(student_ids, subject_ids, per_pair, now, days, rng):
+    span = days * 86400
+    for student_id in student_ids:
+        for subject_id in subject_ids:
+            for _ in range(per_pair):
+                yield (
+                    student_id,
+                    subject_id,
+                    rng.randint(40, 100),
+                    now - timedelta(seconds=rng.randint(0, span)),
+                )
+
+
+def generate_shard(shard: Shard):
+    """Build the student, grade, grade_stats and student_stats rows of one
+    shard.
+
+    Runs inside pool workers, so everything it needs travels in ``shard``.
+    The random streams are derived from ``shard.seed`` and ``shard.index``
+    only, which keeps the output identical whatever the number of workers.
+    """
+    # imported here, not at module level: Faker is slow to import and only
+    # needed while generating
+    from faker import Faker
+
+    rng = random.Random(shard.seed * 1_000_003 + shard.index)
+    faker = Faker()
+    faker.seed_instance(shard.seed * 1_000_003 + shard.index)
+    students = list(
+        student_rows(
+            shard.first_student_id, shard.students, shard.group_ids, faker, rng
+        )
+    )
+    grades = list(
+        grade_rows(
+            range(shard.first_student_id, shard.first_student_id + shard.students),
+            shard.subject_ids,
+            shard.grades_per_pair,
+            shard.now,
+            shard.days,
+            rng,
+        )
+    )
+    sums = Counter()
+    counts = Counter()
+    # a shard holds every grade of its students, so their totals are final
+    student_sums = Counter()
+    student_counts = Counter()
+    for student_id, subject_id, value, _ in grades:
+        sums[(student_id, subject_id)] += value
+        counts[(student_id, subject_id)] += 1
+        student_sums[student_id] += value
+        student_counts[student_id] += 1
+    grade_stats = [
+        (*key, sums[key], counts[key], sums[key] / counts[key]) for key in counts
+    ]
+    student_stats = [
+        (key, student_sums[key], n, student_sums[key] / n)
+        for key, n in student_counts.items()
+    ]
+    return students, grades, grade_stats, student_stats
+
+
+def produce_shards(shards, workers):
+    """Yield generated shards in order, ``workers`` processes at a time.
+
+    At most ``2 * workers`` shards are in flight, so memory stays bounded
+    even when the writers are slower than the generators.
+    """
+    if workers <= 1:
+        for shard in shards:
+            yield generate_shard(shard)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for shard in shards:
+            pending.append(pool.submit(generate_shard, shard))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _write_shard(conn, batch, chunk_size, written):
+    students, grades, grade_stats, student_stats = batch
+    written["students"] += write_rows(
+        conn, Student.__table__, STUDENT_COLUMNS, students, chunk_size
+    )
+    written["grades"] += write_rows(
+        conn, Grade.__table__, GRADE_COLUMNS, grades, chunk_size
+    )
+    written["grade_stats"] += write_rows(
+        conn, GradeStat.__table__, STAT_COLUMNS, grade_stats, chunk_size
+    )
+    written["student_stats"] += write_rows(
+        conn, StudentStat.__table__, STUDENT_STAT_COLUMNS, student_stats, chunk_size
+    )
+
+
+def write_shards(batches, writers, chunk_size, conn=None):
+    """Write generated shards through ``writers`` connections.
+
+    With one writer the shards go through ``conn``, in the caller's
+    transaction. With more, each writer keeps one transaction open for all
+    the shards it receives and commits once every writer has written its
+    shards; the commits themselves are separate, so one failing after
+    others succeeded leaves their shards in place.
+    """
+    written = Counter()
+    if writers <= 1:
+        for batch in batches:
+            _write_shard(conn, batch, chunk_size, written)
+        return written
+
+    work = queue.Queue(maxsize=writers * 2)
+    failed = threading.Event()
+    barrier = threading.Barrier(writers)
+    errors = []
+    lock = threading.Lock()
+
+    def fail(e):
+        errors.append(e)
+        failed.set()
+
+    def writer():
+        local = Counter()
+        with SessionLocal() as session:
+            conn = None
+            try:
+                conn = session.connection()
+            except Exception as e:
+                fail(e)
+            while (batch := work.get()) is not None:
+                if failed.is_set():
+                    continue
+                try:
+                    _write_shard(conn, batch, chunk_size, local)
+                except Exception as e:
+                    fail(e)
+            barrier.wait()
+            if failed.is_set():
+                session.rollback()
+                return
+            try:
+                session.commit()
+            except Exception as e:
+                fail(e)
+                return
+        with lock:
+            written.update(local)
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    try:
+        for batch in batches:
+            if failed.is_set():
+                break
+            work.put(batch)
+    finally:
+        for _ in threads:
+            work.put(None)
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+    return written
+
+
+def seed_bulk(scale: Scale, workers: int = 1, writers: int = 1):
+    """Write a dataset of ``scale``.
+
+    With one writer (always on SQLite) everything is written in one
+    transaction, so a failure leaves the database unchanged. With more,
+    the groups, teachers and subjects are committed first, since the
+    writers' connections cannot see uncommitted parents, and each writer
+    commits its own shards: a failure can leave part of the dataset.
+    """
+    from faker import Faker
+
+    now = scale.anchor or datetime.utcnow().replace(microsecond=0)
+    rng = random.Random(scale.seed)
+    faker = Faker()
+    faker.seed_instance(scale.seed)
+    written = Counter()
+    started = time.perf_counter()
+    with SessionLocal.begin() as session:
+        conn = session.connection()
+        if conn.dialect.name == "sqlite":
+            writers = 1
+        partitions.ensure_partitions(conn, now - timedelta(days=scale.days), now)
+
+        first = next_id(conn, Group)
+        group_ids = tuple(range(first, first + scale.groups))
+        written["groups"] = write_rows(
+            conn,
+            Group.__table__,
+            ("id", "name"),
+            group_rows(first, scale.groups),
+            scale.chunk_size,
+        )
+
+        first = next_id(conn, Teacher)
+        teacher_ids = tuple(range(first, first + scale.teachers))
+        written["teachers"] = write_rows(
+            conn,
+            Teacher.__table__,
+            ("id", "full_name"),
+            teacher_rows(first, scale.teachers, faker),
+            scale.chunk_size,
+        )
+
+        first = next_id(conn, Subject)
+        subject_ids = tuple(range(first, first + scale.subjects))
+        written["subjects"] = write_rows(
+            conn,
+            Subject.__table__,
+            ("id", "name", "teacher_id"),
+            subject_rows(first, scale.subjects, teacher_ids, faker, rng),
+            scale.chunk_size,
+        )
+
+        first_student_id = next_id(conn, Student)
+
+        shards = (
+            Shard(
+                index=i,
+                first_student_id=first_student_id + offset,
+                students=min(scale.shard_size, scale.students - offset),
+                group_ids=group_ids,
+                subject_ids=subject_ids,
+                grades_per_pair=scale.grades_per_pair,
+                now=now,
+                days=scale.days,
+                seed=scale.seed,
+            )
+            for i, offset in enumerate(range(0, scale.students, scale.shard_size))
+        )
+        batches = produce_shards(shards, workers)
+        if writers <= 1:
+            written.update(write_shards(batches, 1, scale.chunk_size, conn))
+    if writers > 1:
+        written.update(write_shards(batches, writers, scale.chunk_size))
+
+    with SessionLocal.begin() as session:
+        sync_sequences(
+            session.connection(),
+            [Group.__table__, Teacher.__table__, Subject.__table__, Student.__table__],
+        )
+    elapsed = time.perf_counter() - started
+
+    total = sum(written.values())
+    tables = (
+        "groups",
+        "teachers",
+        "subjects",
+        "students",
+        "grades",
+        "grade_stats",
+        "student_stats",
+    )
+    for name in tables:
+        print(f"{name:>11}: {written[name]:>12,} rows")
+    print(
+        f"{'total':>11}: {total:>12,} rows in {elapsed:.2f}s "
+        f"({total / elapsed if elapsed else 0:,.0f} rows/s, "
+        f"seed={scale.seed}, anchor={now:%Y-%m-%dT%H:%M:%S}, "
+        f"workers={workers}, writers={writers})"
+    )
+    return written, elapsed
+
+
+def seed_random():
+    from faker import Faker
+
+    fake = Faker()
+    session = SessionLocal()
+    try:
+        groups = [Group(name=f"G-{i+1}") for i in range(3)]
+        session.add_all(groups)
+
+        teachers = [Teacher(full_name=fake.name()) for _ in range(random.randint(3, 5))]
+        session.add_all(teachers)
+
+        subjects = []
+        for _ in range(random.randint(5, 8)):
+            subjects.append(
+                Subject(
+                    name=fake.unique.job()[:90],
+                    teacher=random.choice(teachers),
+                )
+            )
+        session.add_all(subjects)
+
+        students = []
+        for _ in range(random.randint(30, 50)):
+            students.append(
+                Student(
+                    full_name=fake.name(),
+                    group=random.choice(groups),
+                )
+            )
+        session.add_all(students)
+        session.commit()
+
+        sums = Counter()
+        counts = Counter()
+        for st in students:
+            for subj in subjects:
+                for _ in range(random.randint(0, 20)):
+                    value = random.randint(40, 100)
+                    session.add(
+                        Grade(
+                            student=st,
+                            subject=subj,
+                            value=value,
+                        )
+                    )
+                    sums[(st.id, subj.id)] += value
+                    counts[(st.id, subj.id)] += 1
+        stats.apply(session, sums, counts)
+        session.commit()
+
+        totals = {
+            "groups":   session.scalar(select(func.count()).select_from(Group)),
+            "teachers": session.scalar(select(func.count()).select_from(Teacher)),
+            "subjects": session.scalar(select(func.count()).select_from(Subject)),
+            "students": session.scalar(select(func.count()).select_from(Student)),
+            "grades":   session.scalar(select(func.count()).select_from(Grade)),
+        }
+        print(totals)
+    finally:
+        session.close()
@@ -0,0 +1,146 @@
+from collections import Counter
+
+from sqlalchemy import (
+    Float,
+    bindparam,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from app.models import Grade, GradeStat, StudentStat
+
+GRADE_STAT_KEYS = ("student_id", "subject_id")
+STUDENT_STAT_KEYS = ("student_id",)
+
+
+def average(value_sum, value_count):
+    # 0 for rows about to be deleted, which the NOT NULL column still sees
+    return case(
+        (value_count > 0, cast(value_sum, Float) / value_count), else_=0.0
+    )
+
+
+def _upsert(session, table, keys):
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        return None
+    stmt = upsert(table)
+    value_sum = table.c.value_sum + stmt.excluded.value_sum
+    value_count = table.c.value_count + stmt.excluded.value_count
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_={
+            "value_sum": value_sum,
+            "value_count": value_count,
+            "avg_value": average(value_sum, value_count),
+        },
+    )
+
+
+def _apply(session, table, keys, sums, counts):
+    changed = [k for k in counts.keys() | sums.keys() if counts[k] or sums[k]]
+    if not changed:
+        return
+    rows = [
+        {
+            **dict(zip(keys, key)),
+            "value_sum": sums[key],
+            "value_count": counts[key],
+            # only used when the row is new
+            "avg_value": sums[key] / counts[key] if counts[key] > 0 else 0.0,
+        }
+        for key in changed
+    ]
+    stmt = _upsert(session, table, keys)
+    if stmt is not None:
+        session.execute(stmt, rows)
+    else:
+        for row in rows:
+            value_sum = table.c.value_sum + row["value_sum"]
+            value_count = table.c.value_count + row["value_count"]
+            updated = session.execute(
+                update(table)
+                .where(*(table.c[k] == row[k] for k in keys))
+                .values(
+                    value_sum=value_sum,
+                    value_count=value_count,
+                    avg_value=average(value_sum, value_count),
+                )
+            )
+            if updated.rowcount == 0:
+                session.execute(insert(table), row)
+
+    emptied = [dict(zip(keys, key)) for key in changed if counts[key] < 0]
+    if emptied:
+        session.execute(
+            delete(table).where(
+                *(table.c[k] == bindparam(f"_{k}") for k in keys),
+                table.c.value_count <= 0,
+            ),
+            [{f"_{k}": row[k] for k in keys} for row in emptied],
+        )
+
+
+def apply(session, sums, counts):
+    """Add per-(student_id, subject_id) deltas to ``grade_stats`` and the
+    per-student totals of ``student_stats``.
+
+    ``sums`` and ``counts`` map ``(student_id, subject_id)`` to the change
+    of the value sum and of the number of grades; negative deltas remove
+    grades. Runs in the caller's transaction.
+    """
+    _apply(session, GradeStat.__table__, GRADE_STAT_KEYS, sums, counts)
+    student_sums, student_counts = Counter(), Counter()
+    for (student_id, _), delta in sums.items():
+        student_sums[(student_id,)] += delta
+    for (student_id, _), delta in counts.items():
+        student_counts[(student_id,)] += delta
+    _apply(
+        session, StudentStat.__table__, STUDENT_STAT_KEYS, student_sums, student_counts
+    )
+
+
+def apply_grade(session, student_id, subject_id, value, sign=1):
+    key = (student_id, subject_id)
+    apply(session, Counter({key: sign * value}), Counter({key: sign}))
+
+
+def rebuild(session):
+    """Recompute ``grade_stats`` and ``student_stats`` from ``grades``;
+    returns the number of ``grade_stats`` rows."""
+    session.execute(delete(GradeStat))
+    session.execute(
+        insert(GradeStat).from_select(
+            ["student_id", "subject_id", "value_sum", "value_count", "avg_value"],
+            select(
+                Grade.student_id,
+                Grade.subject_id,
+                func.sum(Grade.value),
+                func.count(),
+                average(func.sum(Grade.value), func.count()),
+            ).group_by(Grade.student_id, Grade.subject_id),
+        )
+    )
+    session.execute(delete(StudentStat))
+    value_sum = func.sum(GradeStat.value_sum)
+    value_count = func.sum(GradeStat.value_count)
+    session.execute(
+        insert(StudentStat).from_select(
+            ["student_id", "value_sum", "value_count", "avg_value"],
+            select(
+                GradeStat.student_id,
+                value_sum,
+                value_count,
+                average(value_sum, value_count),
+            ).group_by(GradeStat.student_id),
+        )
+    )
+    return session.scalar(select(func.count()).select_from(GradeStat))
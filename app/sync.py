@@ -0,0 +1,123 @@
+"""Incremental sync of grades for downstream copies.
+
+New grades are found with an id watermark (``grades.id`` only grows and
+is never reused, see ``Grade``);
+updates and deletes, which a watermark cannot see, are read from the
+``grade_changes`` log written by the grade commands. A consumer keeps a
+``Watermark`` and applies what ``pull`` yields since the last one, so a
+refresh costs time proportional to the changes, not to the table.
+
+Events may be delivered more than once (for example a change to a row
+that was also pulled as new), so consumers must apply them idempotently.
+With several concurrent writers on PostgreSQL a sequence value can commit
+after a higher one; such a row is only picked up if it is also changed.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, fields
+
+from sqlalchemy import func, insert, select
+
+from app.export import json_default
+from app.models import Grade, GradeChange
+
+GRADE_FIELDS = ("student_id", "subject_id", "value", "created_at")
+
+
+def log_changes(session, op, rows):
+    """Append ``op`` entries for ``rows`` (dicts with ``grade_id`` and, for
+    updates, the new grade fields) to the change log."""
+    rows = [dict(row, op=op) for row in rows]
+    if rows:
+        session.execute(insert(GradeChange.__table__), rows)
+
+
+def log_update(session, grade):
+    log_changes(
+        session,
+        "update",
+        [{"grade_id": grade.id, **{f: getattr(grade, f) for f in GRADE_FIELDS}}],
+    )
+
+
+def log_delete(session, grade_id):
+    log_changes(session, "delete", [{"grade_id": grade_id}])
+
+
+@dataclass
+class Watermark:
+    last_id: int = 0
+    last_change_id: int = 0
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        # state files may carry fields of older versions
+        return cls(**{f.name: state[f.name] for f in fields(cls) if f.name in state})
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp, path)
+
+
+def pull(session, mark, batch_size=10_000):
+    """Yield ``(op, record)`` events newer than ``mark`` and advance it.
+
+    ``op`` is ``"update"`` or ``"delete"`` for logged changes to rows the
+    consumer already has, then ``"insert"`` for every grade above the id
+    watermark, in id order. ``mark`` is only complete once the generator
+    is exhausted; save it after the events have been applied.
+    """
+    # read the log bound first: changes logged while the new rows are read
+    # are delivered again next time, never lost
+    change_max = session.scalar(select(func.max(GradeChange.id))) or 0
+    changes = session.execute(
+        select(GradeChange)
+        .where(
+            GradeChange.id > mark.last_change_id,
+            GradeChange.id <= change_max,
+            # newer rows are pulled whole below
+            GradeChange.grade_id <= mark.last_id,
+        )
+        .order_by(GradeChange.id)
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+    for change in changes:
+        record = {"id": change.grade_id}
+        if change.op == "update":
+            record.update((f, getattr(change, f)) for f in GRADE_FIELDS)
+        yield change.op, record
+
+    rows = session.execute(
+        select(Grade.id, *(getattr(Grade, f) for f in GRADE_FIELDS))
+        .where(Grade.id > mark.last_id)
+        .order_by(Grade.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        record = row._asdict()
+        yield "insert", record
+        mark.last_id = row.id
+    mark.last_change_id = max(mark.last_change_id, change_max)
+
+
+def export_changes(session_factory, state_path, out):
+    """Write the events since the saved watermark to ``out`` as NDJSON and
+    save the new watermark. Returns per-op counts."""
+    mark = Watermark.load(state_path)
+    counts = {"insert": 0, "update": 0, "delete": 0}
+    dumps = json.JSONEncoder(default=json_default, ensure_ascii=False).encode
+    with session_factory() as s:
+        for op, record in pull(s, mark):
+            counts[op] += 1
+            out.write(dumps({"op": op, **record}) + "\n")
+    out.flush()
+    mark.save(state_path)
+    return counts
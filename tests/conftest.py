@@ -0,0 +1,41 @@
+import pytest
+
+from app import cache, db
+from app.db import Base, configure_engine
+from app.seeder import seed_bulk
+from tests.helpers import SCALE, run_cli
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A seeded SQLite database behind ``SessionLocal`` and
+    ``ReadSessionLocal``, without replicas or report cache."""
+    monkeypatch.delitem(db.settings, "replica_urls", raising=False)
+    monkeypatch.setattr(db, "_replicas", None)
+    engine = configure_engine({"url": f"sqlite:///{tmp_path / 'grades.sqlite3'}"})
+    Base.metadata.create_all(engine)
+    previous = db._engine
+    db.use_engine(engine)
+    cache.configure(None)
+    seed_bulk(SCALE)
+    yield engine
+    db.use_engine(previous)
+    engine.dispose()
+
+
+@pytest.fixture
+def ties(engine):
+    """Students 1..10 average 60 in every subject, all others 50 in
+    subject 1 and lower elsewhere."""
+    run_cli("grades", "update-where", "--all", "--set-value", 40, "--quiet")
+    run_cli("grades", "update-where", "--subject-id", 1, "--set-value", 50, "--quiet")
+    for student_id in range(1, 11):
+        run_cli(
+            "grades",
+            "update-where",
+            "--student-id",
+            student_id,
+            "--set-value",
+            60,
+            "--quiet",
+        )
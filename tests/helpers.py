@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.cli import build_parser
+from app.db import SessionLocal
+from app.models import Grade, GradeStat, StudentStat
+from app.seed import Scale
+
+ANCHOR = datetime(2026, 6, 1)
+SCALE = Scale(
+    groups=3,
+    teachers=3,
+    subjects=4,
+    students=40,
+    grades_per_pair=3,
+    days=120,
+    seed=1,
+    anchor=ANCHOR,
+)
+
+
+def run_cli(*argv):
+    args = build_parser().parse_args([str(a) for a in argv])
+    args.func(args)
+
+
+def first_grade(*conditions):
+    with SessionLocal() as s:
+        return s.execute(
+            select(Grade).where(*conditions).order_by(Grade.id).limit(1)
+        ).scalar_one()
+
+
+def grade_aggregates(session):
+    """``grade_stats`` and ``student_stats`` rows computed from ``grades``."""
+    per_pair = session.execute(
+        select(Grade.student_id, Grade.subject_id, func.sum(Grade.value), func.count())
+        .group_by(Grade.student_id, Grade.subject_id)
+    ).all()
+    per_student = session.execute(
+        select(Grade.student_id, func.sum(Grade.value), func.count()).group_by(
+            Grade.student_id
+        )
+    ).all()
+    return {tuple(r) for r in per_pair}, {tuple(r) for r in per_student}
+
+
+def assert_stats_match():
+    with SessionLocal() as s:
+        pairs, students = grade_aggregates(s)
+        grade_stats = s.execute(select(GradeStat.__table__)).all()
+        student_stats = s.execute(select(StudentStat.__table__)).all()
+    assert {r[:4] for r in grade_stats} == pairs
+    assert {r[:3] for r in student_stats} == students
+    for r in grade_stats:
+        assert r.avg_value == pytest.approx(r.value_sum / r.value_count)
+    for r in student_stats:
+        assert r.avg_value == pytest.approx(r.value_sum / r.value_count)
@@ -0,0 +1,39 @@
+"""``GradeFrame`` answers the overlapping reports like ``app.reports``."""
+
+import pytest
+
+from app import reports
+from tests.helpers import SCALE
+
+pytest.importorskip("numpy")
+
+from app.analytics import GradeFrame  # noqa: E402
+
+
+def assert_same_rows(rows, expected):
+    """``(id, name, average)`` rows, averages compared approximately."""
+    assert [row[:2] for row in rows] == [tuple(row[:2]) for row in expected]
+    assert [row[2] for row in rows] == pytest.approx([row[2] for row in expected])
+
+
+def assert_same_as_reports(frame):
+    assert_same_rows(frame.top_students(), reports.select_1())
+    for subject_id in range(1, SCALE.subjects + 1):
+        assert_same_rows(
+            frame.group_averages(subject_id), reports.select_3(subject_id)
+        )
+    assert frame.average() == pytest.approx(reports.select_4())
+    for teacher_id in range(1, SCALE.teachers + 1):
+        expected = reports.select_8(teacher_id)
+        if expected is None:
+            assert frame.teacher_average(teacher_id) is None
+        else:
+            assert frame.teacher_average(teacher_id) == pytest.approx(expected)
+
+
+def test_reports(engine):
+    assert_same_as_reports(GradeFrame.load())
+
+
+def test_reports_with_ties(ties):
+    assert_same_as_reports(GradeFrame.load())
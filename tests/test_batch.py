@@ -0,0 +1,63 @@
+"""``cli batch``: each command runs in a savepoint of a shared transaction."""
+
+from sqlalchemy import func, select
+
+from app.commands import run_commands
+from app.db import SessionLocal
+from app.models import Grade
+from tests.helpers import assert_stats_match
+
+
+def last_grade_id():
+    with SessionLocal() as s:
+        return s.scalar(select(func.max(Grade.id)))
+
+
+def created_since(grade_id):
+    """``(student_id, value)`` of the grades created after ``grade_id``."""
+    with SessionLocal() as s:
+        rows = s.execute(
+            select(Grade.student_id, Grade.value).where(Grade.id > grade_id)
+        )
+        return {tuple(row) for row in rows}
+
+
+def test_failed_commands_only_undo_themselves(engine, capsys):
+    last = last_grade_id()
+    ran, failed = run_commands(
+        [
+            "grades create 1 1 99",
+            "grades create 1 1 500  # violates ck_grade_range",
+            "grades remove 999999",
+            "grades create 2 1 98",
+            "commit",
+            "grades create 3 1 97",
+            "rollback",
+            "grades create 4 1 96",
+            "no-such-command",
+        ],
+        commit_every=0,
+    )
+    assert (ran, failed) == (7, 3)
+    err = capsys.readouterr().err
+    assert "line 2: Integrity error" in err
+    assert "line 3: Grade id=999999 not found" in err
+
+    assert created_since(last) == {(1, 99), (2, 98), (4, 96)}
+    assert_stats_match()
+
+
+def test_commit_every(engine):
+    last = last_grade_id()
+    run_commands(
+        ["grades create 1 1 99", "grades create 2 1 98", "rollback"], commit_every=1
+    )
+    assert created_since(last) == {(1, 99), (2, 98)}
+
+
+def test_sessions_after_batch(engine):
+    run_commands(["grades create 1 1 99"], commit_every=0)
+    # SessionLocal is bound to the engine again, outside any batch
+    with SessionLocal() as s:
+        assert s.get_bind() is engine
+        assert s.scalar(select(func.count()).select_from(Grade))
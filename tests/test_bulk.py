@@ -0,0 +1,79 @@
+"""``delete-where`` and ``update-where``: the rows they match, and the
+stats, change log and dry runs around them."""
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db import SessionLocal
+from app.models import Grade, GradeChange
+from tests.helpers import assert_stats_match, run_cli
+
+
+def count(model, *conditions):
+    with SessionLocal() as s:
+        return s.scalar(select(func.count()).select_from(model).where(*conditions))
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "read-back"])
+def returning(request, engine, monkeypatch):
+    """Run bulk statements with and without RETURNING."""
+    monkeypatch.setattr(engine.dialect, "delete_returning", request.param)
+    monkeypatch.setattr(engine.dialect, "update_returning", request.param)
+    return request.param
+
+
+def test_delete_where(engine, returning):
+    run_cli("grades", "delete-where", "--value-lt", 55, "--quiet")
+    assert_stats_match()
+    run_cli("grades", "delete-where", "--student-id", 3, "--quiet")
+    assert_stats_match()
+
+
+def test_update_where(engine, returning):
+    run_cli("grades", "update-where", "--value-gt", 90, "--set-value", 60, "--quiet")
+    assert_stats_match()
+    run_cli(
+        "grades",
+        "update-where",
+        "--subject-id",
+        1,
+        "--student-id",
+        4,
+        "--set-subject-id",
+        2,
+        "--quiet",
+    )
+    assert_stats_match()
+    run_cli(
+        "grades", "update-where", "--student-id", 6, "--set-student-id", 8, "--quiet"
+    )
+    assert_stats_match()
+
+
+def test_changes_are_logged(engine, returning):
+    deleted = count(Grade, Grade.value < 30)
+    updated = count(Grade, Grade.student_id == 2, Grade.value >= 30)
+    run_cli("grades", "delete-where", "--value-lt", 30, "--quiet")
+    run_cli("grades", "update-where", "--student-id", 2, "--set-value", 99, "--quiet")
+    assert count(GradeChange, GradeChange.op == "delete") == deleted
+    assert count(GradeChange, GradeChange.op == "update", GradeChange.value == 99) == (
+        updated
+    )
+    assert count(Grade, Grade.student_id == 2, Grade.value != 99) == 0
+
+
+def test_dry_run(engine, capsys):
+    total = count(Grade)
+    matching = count(Grade, Grade.value < 55)
+    run_cli("grades", "delete-where", "--value-lt", 55, "--dry-run")
+    assert capsys.readouterr().out == f"Would delete {matching} grades rows\n"
+    assert count(Grade) == total
+
+
+def test_needs_a_filter(engine):
+    with pytest.raises(SystemExit, match="--all"):
+        run_cli("grades", "delete-where")
+    run_cli("grades", "update-where", "--all", "--set-value", 50, "--quiet")
+    assert count(Grade, Grade.value != 50) == 0
+    assert_stats_match()
+
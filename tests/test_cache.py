@@ -0,0 +1,77 @@
+"""Report caching: TTL, LRU bound and tag invalidation on grade writes."""
+
+import pytest
+from sqlalchemy import update
+
+from app import cache, reports
+from app.cache import MemoryCache, SQLiteCache
+from app.db import SessionLocal
+from app.models import GradeStat
+from tests.helpers import run_cli
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    def make(**options):
+        if request.param == "memory":
+            return MemoryCache(**options)
+        return SQLiteCache(str(tmp_path / "cache.sqlite3"), **options)
+
+    return make
+
+
+def test_invalidate(backend):
+    c = backend()
+    c.set("a", 1, ["grades:subject:1", "students"])
+    c.set("b", 2, ["grades:subject:2"])
+    c.invalidate({"grades:subject:1"})
+    assert c.get("a") == (False, None)
+    assert c.get("b") == (True, 2)
+    c.clear()
+    assert c.get("b") == (False, None)
+
+
+def test_ttl_and_maxsize(backend):
+    expired = backend(ttl=0)
+    expired.set("a", 1, [])
+    assert expired.get("a") == (False, None)
+
+    bounded = backend(maxsize=2)
+    bounded.set("a", 1, [])
+    bounded.set("b", 2, [])
+    bounded.get("a")
+    bounded.set("c", 3, [])
+    assert bounded.get("b") == (False, None)
+    assert bounded.get("a") == (True, 1)
+
+
+def test_sqlite_cache_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    reader, writer = SQLiteCache(path), SQLiteCache(path)
+    reader.set("a", 1, ["grades"])
+    assert writer.get("a") == (True, 1)
+    writer.invalidate({"grades"})
+    assert reader.get("a") == (False, None)
+
+
+def test_default_backend_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    assert isinstance(cache.from_env({"REPORT_CACHE_PATH": path}), SQLiteCache)
+    assert isinstance(cache.from_env({"REPORT_CACHE": "memory"}), MemoryCache)
+    assert cache.from_env({"REPORT_CACHE": "off"}) is None
+
+
+def test_grade_writes_invalidate_reports(engine, tmp_path):
+    cache.configure(SQLiteCache(str(tmp_path / "cache.sqlite3")))
+    assert reports.select_2(1).id != 1
+    other = reports.select_2(2)
+    # behind the cache's back: only a command's invalidation drops entries
+    with SessionLocal.begin() as s:
+        s.execute(
+            update(GradeStat).where(GradeStat.subject_id == 2).values(avg_value=1)
+        )
+
+    for _ in range(20):
+        run_cli("grades", "create", 1, 1, 100)
+    assert reports.select_2(1).id == 1
+    assert reports.select_2(2) == other
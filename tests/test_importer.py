@@ -0,0 +1,71 @@
+"""``grades import``: validation, rejects and grade_stats upkeep."""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from app.importer import Rejected, validate
+from app.models import Grade
+from tests.helpers import assert_stats_match, first_grade, run_cli
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.mark.parametrize("value", [50, 50.0, "50"])
+def test_integral_values(value):
+    row = validate({"student_id": 1, "subject_id": 1, "value": value}, {1}, {1}, NOW)
+    assert row == {"student_id": 1, "subject_id": 1, "value": 50, "created_at": NOW}
+
+
+@pytest.mark.parametrize("value", [50.7, True, None, "5O", 0, 101])
+def test_rejected_values(value):
+    with pytest.raises(Rejected):
+        validate({"student_id": 1, "subject_id": 1, "value": value}, {1}, {1}, NOW)
+
+
+def test_import_ndjson(engine, tmp_path):
+    path = tmp_path / "grades.ndjson"
+    records = [
+        {"student_id": 1, "subject_id": 2, "value": 70},
+        {"student_id": 9, "subject_id": 4, "value": "88"},
+        {"student_id": 9, "subject_id": 4, "value": 50.7},
+        {"student_id": 10_000, "subject_id": 1, "value": 60},
+        {
+            "student_id": 2,
+            "subject_id": 1,
+            "value": 65,
+            "created_at": "2026-03-01T12:00:00+02:00",
+        },
+    ]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + "{oops\n")
+    rejects = tmp_path / "rejects.ndjson"
+    run_cli("grades", "import", path, "--rejects", rejects)
+
+    reasons = [json.loads(line)["reason"] for line in rejects.read_text().splitlines()]
+    assert reasons == [
+        "value is not an integer: 50.7",
+        "unknown student_id 10000",
+        "unparsable record",
+    ]
+    # the UTC offset was applied before storing the naive timestamp
+    imported = first_grade(Grade.created_at == datetime(2026, 3, 1, 10))
+    assert (imported.student_id, imported.value) == (2, 65)
+    assert_stats_match()
+
+
+def test_import_csv(engine, tmp_path):
+    path = tmp_path / "grades.csv"
+    path.write_text(
+        "student_id,subject_id,value,created_at\n"
+        "3,1,91,2026-05-02T08:00:00\n"
+        "3,1,abc,\n"
+        "4,2,12,\n"
+    )
+    rejects = tmp_path / "rejects.ndjson"
+    run_cli("grades", "import", path, "--batch-size", 1, "--rejects", rejects)
+
+    assert len(rejects.read_text().splitlines()) == 1
+    imported = first_grade(Grade.created_at == datetime(2026, 5, 2, 8))
+    assert (imported.student_id, imported.subject_id, imported.value) == (3, 1, 91)
+    assert_stats_match()
@@ -0,0 +1,65 @@
+"""Statement stats stay bounded: IN lists of every length are one statement,
+and past ``MAX_STATEMENTS`` distinct ones share an entry."""
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import instrument
+from app.db import SessionLocal
+from app.models import Student
+
+
+@pytest.fixture
+def recorder(engine, tmp_path):
+    recorder = instrument.Instrumentation(str(tmp_path / "stats.json"), 1000.0, 3)
+    listeners = [
+        (engine, "before_cursor_execute", recorder.before_cursor_execute),
+        (engine, "after_cursor_execute", recorder.after_cursor_execute),
+        (Session, "after_begin", recorder.after_begin),
+        (Session, "after_transaction_end", recorder.after_transaction_end),
+    ]
+    for listener in listeners:
+        event.listen(*listener)
+    yield recorder
+    for listener in listeners:
+        event.remove(*listener)
+
+
+def test_in_lists_are_one_statement(recorder):
+    with SessionLocal() as s:
+        for n in range(1, 6):
+            s.scalars(select(Student.id).where(Student.id.in_(range(n)))).all()
+
+    [(statement, entry)] = recorder.stats["statements"].items()
+    assert "IN (...)" in statement
+    assert entry["count"] == 5
+    [n_plus_one] = recorder.stats["n_plus_one"]
+    assert n_plus_one["count"] == 5
+    assert n_plus_one["statement"] == statement
+
+
+def test_statements_are_capped(recorder, engine, monkeypatch):
+    monkeypatch.setattr(instrument, "MAX_STATEMENTS", 3)
+    with engine.connect() as conn:
+        for i in range(6):
+            conn.exec_driver_sql(f"SELECT {i}")
+        conn.exec_driver_sql("SELECT 0")
+
+    statements = recorder.stats["statements"]
+    other = instrument.OTHER_STATEMENTS
+    assert list(statements) == ["SELECT 0", "SELECT 1", "SELECT 2", other]
+    assert statements["SELECT 0"]["count"] == 2
+    assert statements[other]["count"] == 3
+
+
+def test_merge_collapses_in_lists():
+    old = instrument.empty_stats()
+    for placeholders in ("?", "?, ?", "?, ?, ?"):
+        entry = instrument.new_entry()
+        instrument.add_entry(entry, 1.0, 0)
+        old["statements"][f"SELECT 1 WHERE 1 IN ({placeholders})"] = entry
+
+    merged = instrument.merge_stats(instrument.empty_stats(), old)
+    assert list(merged["statements"]) == ["SELECT 1 WHERE 1 IN (...)"]
+    assert merged["statements"]["SELECT 1 WHERE 1 IN (...)"]["count"] == 3
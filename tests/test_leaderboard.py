@@ -0,0 +1,67 @@
+"""``top`` and ``rank`` on the stats tables follow every grade write."""
+
+import random
+
+import pytest
+from sqlalchemy import func, select
+
+from app import leaderboard
+from app.db import SessionLocal
+from app.models import Grade, Student
+from tests.helpers import SCALE, run_cli
+
+
+def expected_ranking(session, subject_id):
+    """Student ids by average over ``grades``, best first, ties to the
+    higher id."""
+    query = select(Grade.student_id, func.sum(Grade.value), func.count())
+    if subject_id is not None:
+        query = query.where(Grade.subject_id == subject_id)
+    rows = session.execute(query.group_by(Grade.student_id)).all()
+    rows.sort(key=lambda r: (-r[1] / r[2], -r.student_id))
+    return [r.student_id for r in rows]
+
+
+def assert_ranking(subject_id):
+    with SessionLocal() as s:
+        ranking = expected_ranking(s, subject_id)
+        top = leaderboard.top(s, 10, subject_id)
+        assert [row.student_id for row in top] == ranking[:10]
+        for student_id in s.scalars(select(Student.id)):
+            position = leaderboard.rank(s, student_id, subject_id)
+            if student_id in ranking:
+                assert position == ranking.index(student_id) + 1
+            else:
+                assert position is None
+
+
+@pytest.mark.parametrize("subject_id", [None, 2])
+def test_ranking_follows_writes(engine, subject_id):
+    assert_ranking(subject_id)
+    rng = random.Random(0)
+    for _ in range(30):
+        student_id = rng.randint(1, SCALE.students)
+        subject = subject_id or rng.randint(1, SCALE.subjects)
+        if rng.random() < 0.5:
+            run_cli("grades", "create", student_id, subject, rng.randint(1, 100))
+        else:
+            with SessionLocal() as s:
+                grade_id = s.scalar(
+                    select(Grade.id).where(
+                        Grade.student_id == student_id, Grade.subject_id == subject
+                    )
+                )
+            if grade_id is None:
+                continue
+            run_cli("grades", "remove", grade_id)
+        assert_ranking(subject_id)
+
+
+@pytest.mark.parametrize("subject_id", [None, 1])
+def test_ties(ties, subject_id):
+    assert_ranking(subject_id)
+
+
+def test_student_without_grades(engine):
+    run_cli("grades", "delete-where", "--student-id", 7, "--quiet")
+    assert_ranking(None)
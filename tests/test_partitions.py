@@ -0,0 +1,119 @@
+"""``grades archive`` on an unpartitioned table and, on PostgreSQL, from
+the monthly partitions.
+
+The PostgreSQL tests run against the database in ``TEST_POSTGRES_URL``,
+whose ``public`` schema is dropped and migrated to head; they are skipped
+when it is not set.
+"""
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, select, text
+
+from app import cache, db, partitions
+from app.db import SessionLocal, configure_engine
+from app.models import Grade, GradeChange
+from app.seeder import seed_bulk
+from tests.helpers import ANCHOR, SCALE, assert_stats_match, run_cli
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+postgres = pytest.mark.skipif(
+    not POSTGRES_URL, reason="set TEST_POSTGRES_URL to run the PostgreSQL tests"
+)
+
+
+@pytest.fixture
+def pg_engine(monkeypatch):
+    monkeypatch.delitem(db.settings, "replica_urls", raising=False)
+    monkeypatch.setattr(db, "_replicas", None)
+    engine = configure_engine({"url": POSTGRES_URL})
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+        conn.exec_driver_sql("CREATE SCHEMA public")
+    monkeypatch.setenv("DATABASE_URL", POSTGRES_URL)
+    command.upgrade(Config(Path(__file__).parents[1] / "alembic.ini"), "head")
+    previous = db._engine
+    db.use_engine(engine)
+    cache.configure(None)
+    seed_bulk(SCALE)
+    # the seeded months, February to May 2026, get their own partitions
+    with engine.begin() as conn:
+        partitions.ensure_partitions(
+            conn, datetime(2026, 1, 1), datetime(2026, 6, 1)
+        )
+    yield engine
+    db.use_engine(previous)
+    engine.dispose()
+
+
+def count(table, *conditions):
+    with SessionLocal() as s:
+        return s.scalar(select(func.count()).select_from(table).where(*conditions))
+
+
+@pytest.mark.parametrize("drop", [False, True])
+def test_archive(engine, drop):
+    before = ANCHOR - timedelta(days=45)
+    total = count(Grade)
+    old = count(Grade, Grade.created_at < before)
+    assert old
+
+    argv = ["grades", "archive", "--before", before.isoformat()]
+    if drop:
+        argv.append("--drop")
+    run_cli(*argv)
+    assert count(Grade) == total - old
+    assert count(GradeChange, GradeChange.op == "delete") == old
+    assert_stats_match()
+
+    with engine.connect() as conn:
+        archives = partitions.archive_names(conn)
+    archived = sum(count(partitions.grades_like(name)) for name in archives)
+    assert archived == (0 if drop else old)
+    assert bool(archives) != drop
+
+
+@postgres
+def test_archive_partitions(pg_engine):
+    with pg_engine.connect() as conn:
+        assert partitions.is_partitioned(conn)
+        assert "grades_y2026m03" in partitions.partition_names(conn)
+    before_march = count(Grade, Grade.created_at < datetime(2026, 3, 1))
+    mid_march = count(
+        Grade,
+        Grade.created_at >= datetime(2026, 3, 1),
+        Grade.created_at < datetime(2026, 3, 15),
+    )
+    total = count(Grade)
+
+    # moves the rows before the 15th into grades_archive_y2026m03
+    run_cli("grades", "archive", "--before", "2026-03-15")
+    assert count(Grade) == total - before_march - mid_march
+    assert_stats_match()
+
+    # detaches the rest of March and merges it into the same archive table
+    run_cli("grades", "archive", "--before", "2026-04-01")
+    with pg_engine.connect() as conn:
+        names = partitions.partition_names(conn)
+        archives = partitions.archive_names(conn)
+        march = conn.scalar(text("SELECT count(*) FROM grades_archive_y2026m03"))
+        march_total = conn.scalar(
+            text(
+                "SELECT count(*) FROM grades_archive_y2026m03 "
+                "WHERE created_at >= '2026-03-01' AND created_at < '2026-04-01'"
+            )
+        )
+    assert "grades_y2026m03" not in names
+    assert "grades_archive_y2026m03" in archives
+    assert march == march_total > mid_march
+    assert count(Grade, Grade.created_at < datetime(2026, 4, 1)) == 0
+    assert_stats_match()
+
+    run_cli("grades", "create", 1, 1, 90)
+    assert_stats_match()
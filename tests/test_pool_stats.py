@@ -0,0 +1,46 @@
+"""Pool counters of short CLI processes add up in the stats file."""
+
+from sqlalchemy import event
+
+from app import db, instrument
+from app.db import configure_engine
+from tests.helpers import run_cli
+
+
+def run_process(url, path, checkouts):
+    """What one instrumented CLI process records before it exits."""
+    engine = configure_engine({"url": url})
+    recorder = instrument.Instrumentation(str(path), 100.0, 10)
+    recorder._engines.add(engine)
+    event.listen(engine, "before_cursor_execute", recorder.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", recorder.after_cursor_execute)
+    for _ in range(checkouts):
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    recorder.flush()
+    engine.dispose()
+
+
+def test_pool_counters_are_merged(engine, tmp_path, monkeypatch, capsys):
+    url = f"sqlite:///{tmp_path / 'other.sqlite3'}"
+    path = tmp_path / "stats.json"
+    run_process(url, path, 3)
+    run_process(url, path, 2)
+
+    pool = instrument.load_stats(path)["pool"]
+    assert pool["processes"] == 2
+    assert pool["checkouts"] == pool["checkins"] == 5
+    assert pool["connects"] == 2
+
+    monkeypatch.setitem(db.settings, "instrument_stats_path", str(path))
+    run_cli("db", "pool-stats")
+    out = capsys.readouterr().out
+    assert f"2 processes recorded in {path}" in out
+    assert "  checkouts: 5" in out
+
+
+def test_stats_file_without_pool_counters():
+    old = instrument.empty_stats()
+    del old["pool"]
+    merged = instrument.merge_stats(old, instrument.empty_stats())
+    assert merged["pool"] == {"processes": 0}
@@ -0,0 +1,94 @@
+"""Reads go to a healthy replica and fall back to the primary."""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import func, select
+
+from app import cache, db, reports
+from app.cache import MemoryCache
+from app.db import ReadSessionLocal
+from app.models import Grade
+from tests.helpers import SCALE
+
+SEEDED = SCALE.students * SCALE.subjects * SCALE.grades_per_pair
+
+
+@pytest.fixture
+def replicas(engine, tmp_path, monkeypatch):
+    """``replicas(*files)`` points DATABASE_REPLICA_URLS at SQLite files."""
+    made = []
+
+    def configure(*paths):
+        urls = " ".join(f"sqlite:///{path}" for path in paths)
+        monkeypatch.setitem(db.settings, "replica_urls", urls)
+        monkeypatch.setattr(db, "_replicas", None)
+        made.append(db.get_replicas())
+        return made[-1]
+
+    yield configure
+    for replica_set in made:
+        for replica in replica_set._engines.values():
+            replica.dispose()
+
+
+def copy_of(engine, path):
+    """A replica at ``path`` with the primary's current data."""
+    source = sqlite3.connect(engine.url.database)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    return path
+
+
+def grade_count(session):
+    return session.scalar(select(func.count()).select_from(Grade))
+
+
+def test_reads_use_replica(engine, replicas, tmp_path):
+    replica = copy_of(engine, tmp_path / "replica.sqlite3")
+    replicas(replica)
+    with ReadSessionLocal() as s:
+        assert s.get_bind().url.database == str(replica)
+        assert grade_count(s) == SEEDED
+
+
+def test_unavailable_replica_is_skipped(engine, replicas, tmp_path):
+    replica = copy_of(engine, tmp_path / "replica.sqlite3")
+    replica_set = replicas(tmp_path / "missing.sqlite3", replica)
+    for _ in range(3):
+        with ReadSessionLocal() as s:
+            assert s.get_bind().url.database == str(replica)
+    assert [healthy for _, healthy in replica_set.status()] == [False, True]
+    assert not (tmp_path / "missing.sqlite3").exists()
+
+
+def test_failing_replica_falls_back_to_primary(engine, replicas, tmp_path):
+    # connects, but fails every query with "no such table"
+    broken = tmp_path / "empty.sqlite3"
+    sqlite3.connect(broken).close()
+    replica_set = replicas(broken)
+    with ReadSessionLocal() as s:
+        assert grade_count(s) == SEEDED
+        assert s.get_bind() is engine
+    assert replica_set.pick() is None
+    with ReadSessionLocal() as s:
+        assert s.get_bind() is engine
+
+
+def test_no_caching_while_replicas_lag(engine, replicas, tmp_path, monkeypatch):
+    replicas(copy_of(engine, tmp_path / "replica.sqlite3"))
+    memory = MemoryCache()
+    cache.configure(memory)
+    reports.select_4()
+    assert len(memory._entries) == 1
+
+    cache.invalidate("grades")
+    assert cache.replica_lagging(memory)
+    reports.select_4()
+    assert len(memory._entries) == 0
+
+    monkeypatch.setitem(db.settings, "replica_lag_s", "0")
+    reports.select_4()
+    assert len(memory._entries) == 1
@@ -0,0 +1,28 @@
+"""Reports agree across their unbounded, bounded and batch queries."""
+
+from datetime import timedelta
+
+import pytest
+
+from app import reports
+from tests.helpers import ANCHOR, SCALE, run_cli
+
+WINDOWS = {
+    "unbounded": {},
+    "bounded": {"since": ANCHOR - timedelta(days=SCALE.days + 1), "until": ANCHOR},
+}
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS)
+def test_ties_go_to_higher_student_id(ties, window):
+    assert [row.id for row in reports.select_1(**window)] == [10, 9, 8, 7, 6]
+    assert reports.select_2(1, **window).id == 10
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS)
+def test_select_2_batch(ties, window):
+    batch = reports.select_2_batch(**window)
+    assert set(batch) == set(range(1, SCALE.subjects + 1))
+    for subject_id, row in batch.items():
+        single = reports.select_2(subject_id, **window)
+        assert (row.subject_id, *row[1:]) == (subject_id, *single)
@@ -0,0 +1,49 @@
+"""The command line entry points parse arguments without loading SQLAlchemy
+or the models."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app import my_select, reports
+from app.bench import STARTUP_MODULES
+
+ROOT = Path(__file__).parents[1]
+
+ARGV = {
+    "app.cli": ["grades", "list", "--limit", "5"],
+    "app.seed": ["--bulk", "--students", "10"],
+    "app.my_select": ["2", "3", "--since", "2026-01-01"],
+}
+
+LOADED = """
+import sys
+import {module}
+{module}.build_parser().parse_args({argv!r})
+print(*sorted(
+    name for name in sys.modules
+    if name.split(".")[0] == "sqlalchemy" or name in ("app.db", "app.models")
+))
+"""
+
+
+def python(*args):
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_parsing_stays_light(module):
+    assert python("-c", LOADED.format(module=module, argv=ARGV[module])) == "\n"
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_help(module):
+    assert python("-m", module, "--help").startswith("usage:")
+
+
+def test_report_numbers():
+    assert list(my_select.REPORT_NUMBERS) == list(reports.REPORTS)
@@ -0,0 +1,73 @@
+"""``grade_stats`` and ``student_stats`` stay equal to an aggregate of
+``grades`` after every kind of grade write."""
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import reports, stats
+from app.db import SessionLocal
+from app.models import Grade, GradeStat
+from tests.helpers import SCALE, assert_stats_match, first_grade, run_cli
+
+
+def test_seed(engine):
+    assert_stats_match()
+
+
+def test_create_update_remove(engine):
+    run_cli("grades", "create", 1, 1, 99)
+    assert_stats_match()
+
+    grade = first_grade(Grade.student_id == 2)
+    run_cli("grades", "update", grade.id, "--subject_id", 3, "--value", 41)
+    assert_stats_match()
+    run_cli("grades", "update", grade.id, "--student_id", 5)
+    assert_stats_match()
+
+    run_cli("grades", "remove", grade.id)
+    assert_stats_match()
+
+
+def test_remove_last_grade_of_student(engine):
+    with SessionLocal() as s:
+        ids = s.scalars(select(Grade.id).where(Grade.student_id == 7)).all()
+    for grade_id in ids:
+        run_cli("grades", "remove", grade_id)
+    assert_stats_match()
+
+
+def test_apply_without_upsert(engine, monkeypatch):
+    """The UPDATE-then-INSERT path used by dialects without upsert."""
+    monkeypatch.setattr(stats, "_upsert", lambda session, table, keys: None)
+    run_cli("grades", "create", 1, 1, 99)
+    run_cli("grades", "delete-where", "--subject-id", 2, "--quiet")
+    run_cli("grades", "update-where", "--student-id", 3, "--set-value", 77, "--quiet")
+    assert_stats_match()
+
+
+def test_rebuild(engine):
+    with SessionLocal.begin() as s:
+        s.execute(GradeStat.__table__.delete())
+        stats.rebuild(s)
+    assert_stats_match()
+
+
+def test_reports_from_stats(engine):
+    """Unbounded reports read grade_stats; a window covering every grade
+    aggregates ``grades`` instead and must give the same answers."""
+    run_cli("grades", "create", 1, 1, 99)
+    run_cli("grades", "delete-where", "--value-lt", 20, "--quiet")
+    everything = {"since": datetime(2000, 1, 1)}
+    assert reports.select_1() == reports.select_1(**everything)
+    for subject_id in range(1, SCALE.subjects + 1):
+        assert reports.select_2(subject_id) == reports.select_2(
+            subject_id, **everything
+        )
+        assert reports.select_3(subject_id) == reports.select_3(
+            subject_id, **everything
+        )
+    for teacher_id in range(1, SCALE.teachers + 1):
+        assert reports.select_8(teacher_id) == reports.select_8(
+            teacher_id, **everything
+        )
@@ -0,0 +1,83 @@
+"""``grades sync`` gives a downstream copy every insert, update and delete."""
+
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db import SessionLocal
+from app.models import Grade
+from tests.helpers import run_cli
+
+
+def grade_rows():
+    with SessionLocal() as s:
+        rows = s.execute(
+            select(Grade.id, Grade.student_id, Grade.subject_id, Grade.value)
+        ).all()
+    return {r.id: tuple(r[1:]) for r in rows}
+
+
+def max_grade_id():
+    with SessionLocal() as s:
+        return s.scalar(select(func.max(Grade.id)))
+
+
+@pytest.fixture
+def mirror(engine, tmp_path):
+    """A copy of ``grades`` kept up to date by ``sync()``."""
+    state = tmp_path / "sync.json"
+    output = tmp_path / "changes.ndjson"
+    copy = {}
+
+    def sync():
+        run_cli("grades", "sync", "--state", state, "--output", output)
+        for line in output.read_text().splitlines():
+            event = json.loads(line)
+            if event["op"] == "delete":
+                copy.pop(event["id"], None)
+            else:
+                copy[event["id"]] = (
+                    event["student_id"],
+                    event["subject_id"],
+                    event["value"],
+                )
+        return copy
+
+    return sync
+
+
+def test_sync(mirror):
+    assert mirror() == grade_rows()
+    assert mirror() == grade_rows()
+
+    run_cli("grades", "create", 1, 1, 99)
+    run_cli("grades", "update", 5, "--value", 12)
+    run_cli("grades", "remove", 6)
+    run_cli("grades", "delete-where", "--student-id", 3, "--quiet")
+    run_cli("grades", "update-where", "--student-id", 4, "--set-value", 70, "--quiet")
+    assert mirror() == grade_rows()
+
+
+def test_sync_after_deleting_highest_id(mirror):
+    assert mirror() == grade_rows()
+    last = max_grade_id()
+    run_cli("grades", "remove", last)
+    run_cli("grades", "create", 1, 2, 64)
+
+    assert max_grade_id() > last
+    assert mirror() == grade_rows()
+
+
+def test_frame_refresh_after_deleting_highest_id(engine):
+    pytest.importorskip("numpy")
+    from app.analytics import GradeFrame
+
+    frame = GradeFrame.load()
+    run_cli("grades", "remove", max_grade_id())
+    run_cli("grades", "create", 1, 2, 64)
+    frame.refresh()
+
+    rows = grade_rows()
+    assert frame.id.tolist() == sorted(rows)
+    assert frame.value.tolist() == [rows[i][2] for i in sorted(rows)]